@@ -0,0 +1,185 @@
+import os
+import asyncio
+from typing import List, Dict, Any, Optional, Callable, Awaitable
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from render import Format, render, iter_combined_results
+from deadlines import time_left
+
+# Aggregation configuration (overridable through environment variables)
+AGGREGATE_PROVIDER_TIMEOUT = float(os.getenv("AGGREGATE_PROVIDER_TIMEOUT", "8"))
+AGGREGATE_DEADLINE = float(os.getenv("AGGREGATE_DEADLINE", "10"))
+RRF_K = int(os.getenv("AGGREGATE_RRF_K", "60"))
+
+_TRACKING_PARAMS = {"gclid", "fbclid", "msclkid", "mc_cid", "mc_eid", "ref", "ref_src"}
+_DEFAULT_PORTS = {"http": "80", "https": "443"}
+
+# A provider takes (query, num_results) and returns normalized results
+Provider = Callable[[str, int], Awaitable[List[Dict[str, Any]]]]
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Reduce a URL to a canonical form for deduplication.
+
+    Ignores scheme, "www.", default ports, fragments, trailing slashes,
+    tracking parameters and query parameter order.
+    """
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parts.port and str(parts.port) != _DEFAULT_PORTS.get(parts.scheme.lower()):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip("/") or "/"
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in _TRACKING_PARAMS
+    )
+    return urlunsplit(("", host, path, urlencode(query), ""))
+
+
+def google_provider(get_client: Callable[[], Awaitable[Any]]) -> Provider:
+    """Adapt GoogleSearchClient.search (client resolved lazily per call) to the provider interface."""
+    async def search(query: str, num_results: int) -> List[Dict[str, Any]]:
+        client = await get_client()
+        data = await client.search(query, num_results)
+        return [
+            {"title": item.get("title", "No title"), "url": item.get("link"), "snippet": item.get("snippet", "")}
+            for item in data.get("items") or []
+            if item.get("link")
+        ]
+    return search
+
+
+def youcom_provider(get_client: Callable[[], Awaitable[Any]]) -> Provider:
+    """Adapt YouComClient.smart_search (client resolved lazily per call) to the provider interface."""
+    async def search(query: str, num_results: int) -> List[Dict[str, Any]]:
+        client = await get_client()
+        data = await client.smart_search(query)
+        return [
+            {"title": source.get("name", "No title"), "url": source.get("url"), "snippet": source.get("snippet", "")}
+            for source in (data.get("search_results") or [])[:num_results]
+            if source.get("url")
+        ]
+    return search
+
+
+def reciprocal_rank_fusion(ranked_lists: Dict[str, List[Dict[str, Any]]], k: int = RRF_K) -> List[Dict[str, Any]]:
+    """
+    Merge per-provider rankings, deduplicating by canonical URL.
+
+    Args:
+        ranked_lists: Provider name -> results in that provider's rank order
+        k: RRF damping constant
+
+    Returns:
+        Merged results sorted by fused score, each listing its providers
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    for provider, results in ranked_lists.items():
+        seen = set()
+        for rank, result in enumerate(results, 1):
+            key = canonicalize_url(result["url"])
+            if key in seen:
+                continue
+            seen.add(key)
+            entry = merged.get(key)
+            if entry is None:
+                entry = merged[key] = {**result, "score": 0.0, "providers": []}
+            elif not entry.get("snippet") and result.get("snippet"):
+                entry["snippet"] = result["snippet"]
+            entry["score"] += 1.0 / (k + rank)
+            entry["providers"].append(provider)
+    return sorted(merged.values(), key=lambda entry: entry["score"], reverse=True)
+
+
+class SearchAggregator:
+    """
+    Fans a query out to every configured provider concurrently.
+
+    Each provider gets its own timeout. The aggregator returns once a quorum
+    of providers has answered or the overall deadline passes; slower
+    providers are cancelled and reported, and whatever arrived is merged.
+    """
+
+    def __init__(
+        self,
+        providers: Dict[str, Provider],
+        provider_timeout: float = AGGREGATE_PROVIDER_TIMEOUT,
+        deadline: float = AGGREGATE_DEADLINE,
+    ):
+        self.providers = providers
+        self.provider_timeout = provider_timeout
+        self.deadline = deadline
+
+    async def search(
+        self,
+        query: str,
+        num_results: int = 10,
+        providers: Optional[List[str]] = None,
+        quorum: Optional[int] = None,
+        deadline: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        Search all selected providers and fuse their rankings.
+
+        Args:
+            query: The search query string
+            num_results: Number of merged results to return
+            providers: Subset of provider names (default: all configured)
+            quorum: Number of successful providers to wait for (default: all)
+            deadline: Overall time budget in seconds
+
+        Returns:
+            A dictionary with the merged "results" and per-provider "providers" status
+        """
+        names = [name for name in (providers or self.providers) if name in self.providers]
+        if not names:
+            raise ValueError("No configured search providers selected")
+        quorum = min(quorum or len(names), len(names))
+        # Never wait past the deadline of the request being served
+        deadline = time_left(self.deadline if deadline is None else deadline)
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        tasks = {
+            asyncio.ensure_future(asyncio.wait_for(self.providers[name](query, num_results), self.provider_timeout)): name
+            for name in names
+        }
+        ranked: Dict[str, List[Dict[str, Any]]] = {}
+        status: Dict[str, Dict[str, Any]] = {}
+        pending = set(tasks)
+
+        try:
+            while pending and len(ranked) < quorum:
+                remaining = start + deadline - loop.time()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = tasks[task]
+                    latency_ms = round((loop.time() - start) * 1000, 1)
+                    try:
+                        ranked[name] = task.result()
+                        status[name] = {"status": "ok", "count": len(ranked[name]), "latency_ms": latency_ms}
+                    except asyncio.TimeoutError:
+                        status[name] = {"status": "timeout", "latency_ms": latency_ms}
+                    except Exception as e:
+                        status[name] = {"status": "error", "error": str(e), "latency_ms": latency_ms}
+        finally:
+            for task in pending:
+                task.cancel()
+                status[tasks[task]] = {"status": "skipped", "latency_ms": round((loop.time() - start) * 1000, 1)}
+
+        return {
+            "query": query,
+            "results": reciprocal_rank_fusion(ranked)[:num_results],
+            "providers": status,
+            "partial": len(ranked) < len(names),
+            "elapsed_ms": round((loop.time() - start) * 1000, 1),
+        }
+
+
+def format_aggregate_results(data: Dict[str, Any], fmt: Format = "markdown") -> str:
+    """Render merged aggregate results (markdown by default)."""
+    return render(iter_combined_results(data, fmt))
@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import asyncio
+from typing import Dict, Any, AsyncIterator, Awaitable, Callable, Iterable, Union
+from pydantic import ValidationError
+from starlette.requests import ClientDisconnect
+from starlette.responses import StreamingResponse
+from rate_limit import RateLimitExceeded
+
+# Batch execution limits (overridable through environment variables)
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "32"))
+BATCH_MAX_LINE_BYTES = int(os.getenv("BATCH_MAX_LINE_BYTES", str(1024 * 1024)))
+
+
+class InvalidLine:
+    """Placeholder for an input line that could not be parsed."""
+
+    def __init__(self, error: str):
+        self.error = error
+
+
+async def read_body(chunks: AsyncIterator[bytes], body_read: asyncio.Event) -> AsyncIterator[bytes]:
+    """Pass request body chunks through, setting body_read once the body ends or the client leaves."""
+    try:
+        async for chunk in chunks:
+            yield chunk
+    except ClientDisconnect:
+        return
+    finally:
+        body_read.set()
+
+
+async def iter_ndjson(chunks: AsyncIterator[bytes], max_line_bytes: int = BATCH_MAX_LINE_BYTES) -> AsyncIterator[Union[Dict[str, Any], InvalidLine]]:
+    """
+    Parse a streamed NDJSON body one line at a time.
+
+    Only the current line is buffered, so arbitrarily long inputs are read
+    in constant memory. Malformed or oversized lines yield an InvalidLine
+    instead of aborting the whole batch.
+
+    Args:
+        chunks: Raw body chunks, e.g. from Request.stream()
+        max_line_bytes: Longest accepted line
+
+    Returns:
+        An async iterator of parsed objects or InvalidLine markers
+    """
+    buffer = bytearray()
+    skipping = False
+    async for chunk in chunks:
+        buffer.extend(chunk)
+        while True:
+            newline = buffer.find(b"\n")
+            if newline < 0:
+                if len(buffer) > max_line_bytes:
+                    # Drop the rest of this line as it arrives
+                    if not skipping:
+                        yield InvalidLine(f"Line exceeds {max_line_bytes} bytes")
+                    skipping = True
+                    buffer.clear()
+                break
+            line = bytes(buffer[:newline])
+            del buffer[: newline + 1]
+            if skipping:
+                skipping = False
+                continue
+            if line.strip():
+                yield _parse_line(line)
+    if buffer.strip() and not skipping:
+        yield _parse_line(bytes(buffer))
+
+
+def _parse_line(line: bytes) -> Union[Dict[str, Any], InvalidLine]:
+    try:
+        item = json.loads(line)
+    except ValueError as e:
+        return InvalidLine(f"Invalid JSON: {e}")
+    if not isinstance(item, dict):
+        return InvalidLine("Each line must be a JSON object")
+    return item
+
+
+async def _aiter(items: Iterable) -> AsyncIterator:
+    for item in items:
+        yield item
+
+
+async def run_batch(
+    operations: Union[AsyncIterator, Iterable],
+    execute: Callable[[Dict[str, Any]], Awaitable[Any]],
+    concurrency: int = BATCH_CONCURRENCY,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Execute operations concurrently and yield results in completion order.
+
+    Operations are pulled from the input only when a slot frees up, so at
+    most `concurrency` operations (and their results) are held at a time
+    however long the input is. Closing the iterator (client disconnect)
+    cancels the operations still running.
+
+    Args:
+        operations: Operation dicts (or InvalidLine markers), sync or async iterable
+        execute: Coroutine running one operation and returning its result
+        concurrency: Maximum number of operations running at once
+
+    Returns:
+        An async iterator of per-item result dicts, followed by one summary dict
+    """
+    concurrency = max(1, min(concurrency, BATCH_MAX_CONCURRENCY))
+    source = operations.__aiter__() if hasattr(operations, "__aiter__") else _aiter(operations)
+    counts = {"ok": 0, "error": 0, "invalid": 0, "rate_limited": 0}
+    running: Dict[asyncio.Task, Dict[str, Any]] = {}
+    index = 0
+    exhausted = False
+    start = time.perf_counter()
+
+    async def run_one(operation: Dict[str, Any]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            outcome = {"status": "ok", "result": await execute(operation)}
+        except ValidationError as e:
+            outcome = {"status": "invalid", "error": str(e)}
+        except RateLimitExceeded as e:
+            outcome = {"status": "rate_limited", "error": str(e), "retry_after": round(e.retry_after, 1)}
+        except Exception as e:
+            outcome = {"status": "error", "error": str(e)}
+        outcome["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return outcome
+
+    try:
+        while True:
+            while not exhausted and len(running) < concurrency:
+                try:
+                    operation = await source.__anext__()
+                except StopAsyncIteration:
+                    exhausted = True
+                    break
+                header = {"index": index}
+                index += 1
+                if isinstance(operation, InvalidLine):
+                    counts["invalid"] += 1
+                    yield {**header, "status": "invalid", "error": operation.error}
+                    continue
+                header.update(id=operation.get("id"), op=operation.get("op"))
+                running[asyncio.ensure_future(run_one(operation))] = header
+
+            if not running:
+                break
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                outcome = task.result()
+                counts[outcome["status"]] += 1
+                yield {**running.pop(task), **outcome}
+
+        yield {
+            "summary": True,
+            "total": index,
+            **counts,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+    finally:
+        for task in running:
+            task.cancel()
+
+
+async def ndjson_lines(results: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    """Encode result dicts as newline-delimited JSON."""
+    async for result in results:
+        yield json.dumps(result) + "\n"
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that can stream while the request body is still arriving.
+
+    Starlette watches for client disconnects by reading from the same
+    receive channel as Request.stream(), which would swallow the body of an
+    NDJSON upload. Disconnect detection starts only once body_read is set.
+    """
+
+    media_type = "application/x-ndjson"
+
+    def __init__(self, content: AsyncIterator[Dict[str, Any]], body_read: asyncio.Event, **kwargs):
+        super().__init__(ndjson_lines(content), **kwargs)
+        self.body_read = body_read
+
+    async def listen_for_disconnect(self, receive):
+        await self.body_read.wait()
+        await super().listen_for_disconnect(receive)
@@ -0,0 +1,92 @@
+"""
+Benchmark for the local full-text index.
+
+Measures indexing throughput of the batched writer against one commit per
+document (what writing on the request path would cost), then search
+latency over the filled index.
+
+Usage (from the backend directory):
+    python benchmarks/bench_local_index.py --documents 10000,100000
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from local_index import LocalIndex, _UPSERT  # noqa: E402
+
+WORDS = (
+    "solar energy panel battery storage grid wind turbine climate policy market price electric vehicle "
+    "charging network software release security patch database index query cache latency python rust "
+    "football league transfer season coach stadium recipe pasta tomato garlic oven travel flight hotel"
+).split()
+
+
+def make_results(count: int, rng: random.Random):
+    for i in range(count):
+        words = rng.sample(WORDS, 8)
+        yield {
+            "title": " ".join(words[:4]).title(),
+            "url": f"https://site{i % 500}.example.com/{i}",
+            "display_url": f"site{i % 500}.example.com",
+            "snippet": " ".join(words) + f" document {i}",
+        }
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+async def run(count: int, queries: int, rng: random.Random):
+    with tempfile.TemporaryDirectory() as tmp:
+        # One transaction per document, as an inline write would do
+        index = LocalIndex(os.path.join(tmp, "single.db"))
+        results = list(make_results(min(count, 2000), rng))
+        index.add_web_results("google", "bench", results)
+        documents = list(index._pending)
+        index._pending.clear()
+        start = time.perf_counter()
+        for document in documents:
+            with index._write_conn:
+                index._write_conn.execute(_UPSERT, document)
+        single_rate = len(documents) / (time.perf_counter() - start)
+        await index.close()
+
+        index = LocalIndex(os.path.join(tmp, "batched.db"))
+        index.add_web_results("google", "bench", make_results(count, rng))
+        start = time.perf_counter()
+        await index.flush()
+        batched_rate = count / (time.perf_counter() - start)
+
+        latencies, found = [], []
+        for _ in range(queries):
+            query = " ".join(rng.sample(WORDS, rng.choice((1, 2, 3))))
+            start = time.perf_counter()
+            hits = await index.search(query, 10)
+            latencies.append((time.perf_counter() - start) * 1000)
+            found.append(len(hits))
+        await index.close()
+    return single_rate, batched_rate, latencies, found
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", default="10000,100000", help="Comma-separated index sizes")
+    parser.add_argument("--queries", type=int, default=300)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    print(f"{'documents':>10} {'single docs/s':>14} {'batched docs/s':>15} {'search p50 ms':>14} {'p99 ms':>8} {'hits':>5}")
+    for count in (int(n) for n in args.documents.split(",")):
+        single, batched, latencies, found = asyncio.run(run(count, args.queries, rng))
+        print(
+            f"{count:>10} {single:>14.0f} {batched:>15.0f} {statistics.median(latencies):>14.2f} "
+            f"{percentile(latencies, 99):>8.2f} {statistics.mean(found):>5.1f}"
+        )
@@ -0,0 +1,90 @@
+"""
+Benchmark for the Gemini model pool, run against FakeModelClient.
+
+1. Turn preparation: time to get a chat session for the next turn of a long
+   conversation, rebuilding the history every turn (session cache disabled)
+   versus continuing the cached session.
+2. Bursts: N concurrent generations against a fake upstream that serves
+   --capacity calls at full speed and slows down proportionally beyond
+   that, with and without the concurrency cap. Reports latency percentiles
+   and the peak number of calls in flight upstream.
+
+Usage (from the backend directory):
+    python benchmarks/bench_model_pool.py --turns 20,100 --burst 200 --capacity 8
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gemini import GeminiChatbot  # noqa: E402
+from context_window import ContextWindowManager  # noqa: E402
+from model_pool import ModelPool, ModelTier, SessionCache, FakeModelClient  # noqa: E402
+
+SENTENCE = "The battery storage project in the northern grid region doubled its capacity this quarter. "
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def chatbot(client, concurrency, max_sessions=1000):
+    pool = ModelPool([ModelTier(client, 0, concurrency)], SessionCache(max_sessions=max_sessions))
+    return GeminiChatbot(api_key="bench", context_window=ContextWindowManager(token_budget=10 ** 6), model_pool=pool)
+
+
+async def preparation(turns: int, max_sessions: int) -> float:
+    bot = chatbot(FakeModelClient(latency=0), 16, max_sessions)
+    history, timings = [], []
+    for i in range(turns):
+        message = f"Question {i}: " + SENTENCE * 3
+        start = time.perf_counter()
+        chat, tier, prompt, tokens = await bot._start_chat(message, history, None)
+        timings.append((time.perf_counter() - start) * 1e6)
+        response = await chat.send_message_async(prompt)
+        bot._keep_session(chat, tier, message, response.text, history, tokens)
+        history = history + [{"role": "user", "content": message}, {"role": "assistant", "content": response.text}]
+    return statistics.mean(timings[-10:])
+
+
+async def burst(size: int, capacity: int, concurrency: int, latency: float):
+    client = FakeModelClient(latency=latency, capacity=capacity)
+    bot = chatbot(client, concurrency)
+
+    async def one(i):
+        start = time.perf_counter()
+        await bot.get_response(f"burst question {i}", [])
+        return (time.perf_counter() - start) * 1000
+
+    latencies = await asyncio.gather(*(one(i) for i in range(size)))
+    return latencies, client.peak_in_flight
+
+
+async def main(args):
+    print(f"{'turns':>6} {'rebuild µs':>11} {'session µs':>11}")
+    for turns in (int(t) for t in args.turns.split(",")):
+        rebuild = await preparation(turns, 0)
+        cached = await preparation(turns, 1000)
+        print(f"{turns:>6} {rebuild:>11.0f} {cached:>11.0f}")
+
+    print(f"\n{'mode':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'upstream peak':>14}")
+    for mode, concurrency in (("unbounded", args.burst), ("capped", args.capacity)):
+        latencies, peak = await burst(args.burst, args.capacity, concurrency, args.latency_ms / 1000)
+        print(
+            f"{mode:>9} {statistics.median(latencies):>8.0f} {percentile(latencies, 99):>8.0f} "
+            f"{max(latencies):>8.0f} {peak:>14}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", default="20,100", help="Comma-separated conversation lengths")
+    parser.add_argument("--burst", type=int, default=200)
+    parser.add_argument("--capacity", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,87 @@
+"""
+Connection reuse benchmark for HTTPSessionPool.
+
+Starts a local stub server and compares a fresh aiohttp.ClientSession per
+request (the old behaviour) with the shared pooled session.
+
+Usage (from the backend directory):
+    python benchmarks/bench_pool.py --requests 500 --concurrency 20
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import aiohttp
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from http_pool import HTTPSessionPool
+
+
+async def start_stub(host: str = "127.0.0.1", port: int = 0):
+    """Start a stub JSON server that counts distinct client connections."""
+    peers = set()
+
+    async def handler(request):
+        peers.add(request.transport.get_extra_info("peername"))
+        return web.json_response({"items": [{"title": "stub", "link": "http://example.com"}]})
+
+    app = web.Application()
+    app.router.add_get("/customsearch/v1", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound_port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://{host}:{bound_port}/customsearch/v1", peers
+
+
+async def run_fresh_sessions(url: str, total: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(url) as response:
+                    await response.json()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return time.perf_counter() - start
+
+
+async def run_pooled(url: str, total: int, concurrency: int):
+    pool = HTTPSessionPool(limit_per_host=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await pool.request_json("GET", url)
+
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        return time.perf_counter() - start
+    finally:
+        await pool.close()
+
+
+async def main(total: int, concurrency: int):
+    for name, runner_fn in (("fresh-session", run_fresh_sessions), ("pooled", run_pooled)):
+        runner, url, peers = await start_stub()
+        elapsed = await runner_fn(url, total, concurrency)
+        await runner.cleanup()
+        print(
+            f"{name:>14}: {total} requests in {elapsed:.3f}s "
+            f"({total / elapsed:.0f} req/s), {len(peers)} TCP connections opened"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
@@ -0,0 +1,89 @@
+"""
+Benchmark for retrieval-augmented chat turns.
+
+Simulates one turn with a search of --search-ms, a conversation load of
+--history-ms and the fake model, and compares:
+
+- serial: load the conversation, then search, then generate (what the
+  frontend's "search then ask" flow does, minus the second round-trip)
+- prefetch: RetrievalPrefetch started on arrival, so the search overlaps
+  with loading the conversation
+- skipped: a message that does not need context (fetch never started)
+
+Usage (from the backend directory):
+    python benchmarks/bench_rag.py --search-ms 300 --history-ms 20,150,400
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chat_model import FakeChatModel  # noqa: E402
+from rag import RetrievalPrefetch, build_context, RAG_CONTEXT_TOKENS  # noqa: E402
+
+RESULTS = [
+    {"title": f"Result {i}", "url": f"https://example.com/{i}", "snippet": "solar output rose sharply this year " * 6}
+    for i in range(6)
+]
+
+
+def make_search(search_ms: float):
+    async def search(query, num_results):
+        await asyncio.sleep(search_ms / 1000)
+        return {"results": RESULTS[:num_results]}
+    return search
+
+
+async def load_history(history_ms: float):
+    await asyncio.sleep(history_ms / 1000)
+    return []
+
+
+async def serial(model, search, history_ms, message):
+    history = await load_history(history_ms)
+    data = await search(message, 6)
+    build_context(data["results"], RAG_CONTEXT_TOKENS)
+    # The fake model's reply length only depends on the message, as in prefetch()
+    return await model.get_response(message, history)
+
+
+async def prefetch(model, search, history_ms, message):
+    retrieval = RetrievalPrefetch(message, search, mode="auto")
+    try:
+        history = await load_history(history_ms)
+        return await model.get_response(message, history, retrieval)
+    finally:
+        retrieval.cancel()
+
+
+async def timed(flow, runs, *args):
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await flow(*args)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.median(latencies)
+
+
+async def main(args):
+    model = FakeChatModel(token_delay=args.token_ms / 1000)
+    search = make_search(args.search_ms)
+    print(f"{'history ms':>10} {'serial ms':>10} {'prefetch ms':>12} {'skipped ms':>11}")
+    for history_ms in (float(h) for h in args.history_ms.split(",")):
+        serial_ms = await timed(serial, args.runs, model, search, history_ms, "latest solar news 2026")
+        prefetch_ms = await timed(prefetch, args.runs, model, search, history_ms, "latest solar news 2026")
+        skipped_ms = await timed(prefetch, args.runs, model, search, history_ms, "write a poem about cats")
+        print(f"{history_ms:>10.0f} {serial_ms:>10.1f} {prefetch_ms:>12.1f} {skipped_ms:>11.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--search-ms", type=float, default=300)
+    parser.add_argument("--history-ms", default="20,150,400", help="Comma-separated conversation load times")
+    parser.add_argument("--token-ms", type=float, default=5, help="Fake model delay per token")
+    parser.add_argument("--runs", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,93 @@
+"""
+Micro-benchmark for result rendering.
+
+Compares the previous per-call string building (repeated += for You.com
+answers, per-item += plus join for Google results) with the precompiled
+templates in render.py on growing source lists, and checks that the
+markdown output is byte-for-byte identical before timing anything.
+
+Usage (from the backend directory):
+    python benchmarks/bench_render.py --sizes 10,100,1000,10000
+"""
+import os
+import sys
+import json
+import timeit
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from render import render, iter_answer, iter_web_results  # noqa: E402
+
+
+def legacy_answer(query, data):
+    formatted_result = f"## 🔍 Search Results: '{query}'\n\n"
+    formatted_result += data["answer"]
+    if "search_results" in data and data["search_results"]:
+        formatted_result += "\n\n### Sources:\n"
+        for i, source in enumerate(data["search_results"], 1):
+            name = source.get("name", "No title")
+            url = source.get("url", "#")
+            snippet = source.get("snippet", "")
+            formatted_result += f"{i}. [{name}]({url})\n"
+            if snippet:
+                formatted_result += f"   {snippet}\n\n"
+    return formatted_result
+
+
+def legacy_web(query, items):
+    formatted_results = [f"## 🔍 Web Search Results: '{query}'\n"]
+    for i, item in enumerate(items, 1):
+        title = item.get("title", "No title")
+        link = item.get("link", "No link")
+        snippet = item.get("snippet", "No description").replace("\n", " ")
+        displayLink = item.get("displayLink", "")
+        result = f"### {i}. [{title}]({link})\n"
+        result += f"📎 *{displayLink}*\n\n"
+        result += f"{snippet}\n\n"
+        formatted_results.append(result)
+    return "\n".join(formatted_results)
+
+
+def make_data(size):
+    sources = [
+        {"name": f"Source {i}", "url": f"https://example{i}.com/a/b", "snippet": f"Snippet number {i} " * 8}
+        for i in range(size)
+    ]
+    items = [
+        {"title": f"Result {i}", "link": f"https://example{i}.com/", "displayLink": f"example{i}.com", "snippet": f"Line {i}\nmore " * 8}
+        for i in range(size)
+    ]
+    return {"answer": "An answer paragraph. " * 40, "search_results": sources}, items
+
+
+def best_of(fn, repeat, number):
+    return min(timeit.repeat(fn, repeat=repeat, number=number)) / number
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,100,1000,10000", help="Comma-separated source list sizes")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    rows = []
+    print(f"{'case':<8} {'sources':>8} {'legacy µs':>11} {'render µs':>11} {'speedup':>8}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        answer, items = make_data(size)
+        assert legacy_answer("q", answer) == render(iter_answer("smart", "q", answer)), "answer output differs"
+        assert legacy_web("q", items) == render(iter_web_results("q", items)), "web output differs"
+        number = max(1, 20000 // max(size, 1))
+        for case, legacy, new in (
+            ("answer", lambda: legacy_answer("q", answer), lambda: render(iter_answer("smart", "q", answer))),
+            ("web", lambda: legacy_web("q", items), lambda: render(iter_web_results("q", items))),
+        ):
+            old_s = best_of(legacy, args.repeat, number)
+            new_s = best_of(new, args.repeat, number)
+            rows.append({"case": case, "sources": size, "legacy_us": old_s * 1e6, "render_us": new_s * 1e6})
+            print(f"{case:<8} {size:>8} {old_s * 1e6:>11.1f} {new_s * 1e6:>11.1f} {old_s / new_s:>7.2f}x")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(rows, f, indent=2)
@@ -0,0 +1,108 @@
+"""
+Fault-injection benchmark for ResilientCaller.
+
+Runs three scenarios against a local stub that injects errors and tail
+latency: transient 503s with Retry-After, slow outliers (hedging) and a hard
+outage (circuit breaker). Each is compared with a bare request.
+
+Usage (from the backend directory):
+    python benchmarks/bench_resilience.py --requests 200
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from http_pool import HTTPSessionPool
+from resilience import ResilientCaller, CircuitBreaker
+
+
+async def start_stub():
+    """Stub whose behaviour is driven by query parameters: error, slow, down."""
+
+    async def handler(request):
+        error_rate = float(request.query.get("error", 0))
+        slow_rate = float(request.query.get("slow", 0))
+        if request.query.get("down"):
+            return web.Response(status=500, text="down")
+        if random.random() < error_rate:
+            return web.Response(status=503, text="overloaded", headers={"Retry-After": "0"})
+        await asyncio.sleep(1.0 if random.random() < slow_rate else 0.02)
+        return web.json_response({"ok": True})
+
+    app = web.Application()
+    app.router.add_get("/", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/"
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] if ordered else 0.0
+
+
+async def drive(fn, total: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def one():
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await fn()
+            except Exception:
+                failures += 1
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one() for _ in range(total)))
+    return {
+        "success_rate": round(1 - failures / total, 3),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+    }
+
+
+async def main(total: int, concurrency: int):
+    runner, base_url = await start_stub()
+    pool = HTTPSessionPool()
+    try:
+        scenarios = {
+            "transient 30% 503": {"error": "0.3"},
+            "5% slow outliers": {"slow": "0.05"},
+            "hard outage": {"down": "1"},
+        }
+        for name, params in scenarios.items():
+            bare = await drive(lambda: pool.request_json("GET", base_url, params=params), total, concurrency)
+            caller = ResilientCaller(
+                name,
+                attempt_timeout=2,
+                total_timeout=5,
+                base_delay=0.01,
+                hedge_min_samples=10,
+                breaker=CircuitBreaker(name, recovery_timeout=60),
+            )
+            resilient = await drive(
+                lambda: caller.call(lambda: pool.request_json("GET", base_url, params=params)), total, concurrency
+            )
+            print(f"{name}:\n  bare      {bare}\n  resilient {resilient}\n  stats     {caller.stats()}")
+    finally:
+        await pool.close()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
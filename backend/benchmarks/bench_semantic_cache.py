@@ -0,0 +1,81 @@
+"""
+Benchmark for the semantic cache index.
+
+Fills a SemanticIndex with synthetic queries, then looks up near-duplicates
+(the stored words in order, with stop words and one extra word added) and
+unrelated queries. Reports lookup latency of the exact scan and of the LSH
+candidate search, and the LSH recall: the share of lookups whose exact best
+match at or above the threshold the LSH search also returns.
+
+Usage (from the backend directory):
+    python benchmarks/bench_semantic_cache.py --sizes 1000,10000,50000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from semantic_cache import HashingVectorizer, SemanticIndex, SEMANTIC_CACHE_THRESHOLD  # noqa: E402
+
+SYLLABLES = ["ka", "lo", "mi", "ra", "ten", "vor", "sul", "pa", "zin", "dro", "qui", "bel", "nox", "ter", "ux"]
+
+
+def make_vocabulary(size: int, rng: random.Random):
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def near_duplicate(query: str, vocabulary, rng: random.Random) -> str:
+    # Word order is a feature, so paraphrases keep it
+    return "what is the " + query + " " + rng.choice(vocabulary)
+
+
+def timed_lookups(index, vectors, **kwargs):
+    results, latencies = [], []
+    for vector in vectors:
+        start = time.perf_counter()
+        results.append(index.search(vector, 0, **kwargs))
+        latencies.append((time.perf_counter() - start) * 1e6)
+    return results, latencies
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,50000", help="Comma-separated index sizes")
+    parser.add_argument("--lookups", type=int, default=500)
+    parser.add_argument("--threshold", type=float, default=SEMANTIC_CACHE_THRESHOLD)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vectorizer = HashingVectorizer()
+    vocabulary = make_vocabulary(20000, rng)
+    print(f"{'entries':>8} {'exact p50 µs':>13} {'lsh p50 µs':>11} {'candidates':>11} {'near-dup sim':>13} {'lsh recall':>11}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        queries = [" ".join(rng.sample(vocabulary, rng.randint(4, 7))) for _ in range(size)]
+        index = SemanticIndex(dim=vectorizer.dim, max_entries=size, exact_max=size)
+        for i, query in enumerate(queries):
+            index.add(vectorizer.embed(query), 0, query, i, time.time() + 3600)
+
+        probes = [near_duplicate(rng.choice(queries), vocabulary, rng) for _ in range(args.lookups // 2)]
+        probes += [" ".join(rng.sample(vocabulary, 5)) for _ in range(args.lookups - len(probes))]
+        vectors = [vectorizer.embed(probe) for probe in probes]
+
+        exact, exact_us = timed_lookups(index, vectors)
+        index.exact_max = 0  # force the LSH path on the same index
+        lsh, lsh_us = timed_lookups(index, vectors)
+        candidates = statistics.mean(len(index._candidates(v)) for v in vectors[:50])
+
+        relevant = [(e, a) for e, a in zip(exact, lsh) if e and e[1] >= args.threshold]
+        recall = sum(1 for e, a in relevant if a and a[0] == e[0]) / len(relevant) if relevant else float("nan")
+        similarity = statistics.median(e[1] for e in exact[: len(exact) // 2] if e)
+        print(
+            f"{size:>8} {statistics.median(exact_us):>13.0f} {statistics.median(lsh_us):>11.0f} "
+            f"{candidates:>11.0f} {similarity:>13.3f} {recall:>11.3f}"
+        )
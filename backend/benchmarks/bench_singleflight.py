@@ -0,0 +1,103 @@
+"""
+Request coalescing check for SingleFlight.
+
+Fires many concurrent identical searches at a slow local stub through
+GoogleSearchClient and YouComClient and asserts exactly one upstream hit per
+distinct call. Also checks that cancelled callers do not abort the shared
+call and that upstream errors reach every waiter.
+
+Usage (from the backend directory):
+    python benchmarks/bench_singleflight.py --requests 500
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+async def start_stub(delay: float):
+    """Start a stub emulating Google CSE and You.com that counts hits per path."""
+    hits = {}
+
+    async def handler(request):
+        hits[request.path] = hits.get(request.path, 0) + 1
+        await asyncio.sleep(delay)
+        if request.path == "/error":
+            return web.Response(status=503, text="unavailable")
+        return web.json_response({"items": [{"title": "stub"}], "answer": "stub answer", "search_results": []})
+
+    app = web.Application()
+    app.router.add_route("*", "/{tail:.*}", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}", hits
+
+
+async def main(total: int, delay: float):
+    runner, base_url, hits = await start_stub(delay)
+    os.environ.update({
+        "GOOGLE_API_KEY": os.getenv("GOOGLE_API_KEY", "bench"),
+        "GOOGLE_CSE_ID": os.getenv("GOOGLE_CSE_ID", "bench"),
+        "YOU_API_KEY": os.getenv("YOU_API_KEY", "bench"),
+        "GOOGLE_SEARCH_URL": f"{base_url}/customsearch/v1",
+        "YOU_SMART_API_URL": f"{base_url}/smart",
+        "YOU_RESEARCH_API_URL": f"{base_url}/research",
+    })
+
+    from http_pool import HTTPSessionPool
+    from singleflight import SingleFlight
+    from google_search import GoogleSearchClient
+    from youcom_api import YouComClient
+
+    pool = HTTPSessionPool()
+    flight = SingleFlight()
+    google = GoogleSearchClient(session_pool=pool, single_flight=flight)
+    youcom = YouComClient(session_pool=pool, single_flight=flight)
+
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(google.search("viral query") for _ in range(total)),
+            *(youcom.smart_search("viral query") for _ in range(total)),
+            *(youcom.research("viral query") for _ in range(total)),
+        )
+        elapsed = time.perf_counter() - start
+        print(f"{3 * total} concurrent calls in {elapsed:.3f}s, upstream hits: {hits}")
+        assert hits == {"/customsearch/v1": 1, "/smart": 1, "/research": 1}, hits
+
+        # Cancelling some waiters must not abort the shared call for the rest
+        tasks = [asyncio.ensure_future(google.search("cancel query")) for _ in range(10)]
+        await asyncio.sleep(delay / 2)
+        for task in tasks[:5]:
+            task.cancel()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        assert all(isinstance(r, asyncio.CancelledError) for r in results[:5])
+        assert all(isinstance(r, dict) for r in results[5:])
+
+        # Upstream errors propagate to every waiter
+        errors = await asyncio.gather(
+            *(flight.do("error", lambda: pool.request_json("GET", f"{base_url}/error")) for _ in range(20)),
+            return_exceptions=True,
+        )
+        assert all("HTTP Error 503" in str(e) for e in errors)
+        assert hits["/error"] == 1
+        assert flight.in_flight() == 0
+        print(f"cancellation and error propagation OK, stats: {flight.stats()}")
+    finally:
+        await pool.close()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--delay", type=float, default=0.2, help="stub response delay in seconds")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.delay))
@@ -0,0 +1,83 @@
+"""
+Cold-start benchmark for the API server.
+
+Spawns `python serve.py` repeatedly and measures the time until
+/health/live answers (process accepting requests) and until /health/ready
+reports every provider initialized. Uses CHAT_MODEL=fake unless
+--real-gemini is given (which then needs GEMINI_API_KEY for readiness).
+
+Usage (from the backend directory):
+    python benchmarks/bench_startup.py --runs 5 --workers 1
+"""
+import os
+import sys
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url: str, start: float, timeout: float = 60.0) -> float:
+    while time.perf_counter() - start < timeout:
+        try:
+            with urllib.request.urlopen(url, timeout=5) as response:
+                if response.status == 200:
+                    return time.perf_counter() - start
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        time.sleep(0.01)
+    raise RuntimeError(f"{url} not healthy after {timeout:.0f}s")
+
+
+def one_run(workers: int, real_gemini: bool):
+    port = free_port()
+    env = {
+        **os.environ,
+        "GEMINI_API_KEY": os.getenv("GEMINI_API_KEY", "bench"),
+        "GOOGLE_API_KEY": "bench",
+        "GOOGLE_CSE_ID": "bench",
+        "YOU_API_KEY": "bench",
+        "LOG_LEVEL": "WARNING",
+    }
+    if not real_gemini:
+        env["CHAT_MODEL"] = "fake"
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers)],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        live = wait_for(f"http://127.0.0.1:{port}/health/live", start)
+        ready = wait_for(f"http://127.0.0.1:{port}/health/ready", start)
+    finally:
+        process.terminate()
+        process.wait()
+    return live, ready
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--real-gemini", action="store_true", help="Initialize the Gemini SDK instead of the fake model")
+    args = parser.parse_args()
+
+    samples = [one_run(args.workers, args.real_gemini) for _ in range(args.runs)]
+    live = [s[0] * 1000 for s in samples]
+    ready = [s[1] * 1000 for s in samples]
+    print(f"live:  median {statistics.median(live):.0f} ms  (min {min(live):.0f}, max {max(live):.0f})")
+    print(f"ready: median {statistics.median(ready):.0f} ms  (min {min(ready):.0f}, max {max(ready):.0f})")
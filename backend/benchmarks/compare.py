@@ -0,0 +1,73 @@
+"""
+Compare two load-test result files and flag regressions.
+
+Matches results by scenario, mode and load level. Latency, error-rate and
+memory increases, or throughput drops, beyond the threshold are reported
+as regressions and make the script exit with status 1, so it can gate CI.
+
+Usage (from the backend directory):
+    python benchmarks/compare.py benchmarks/results/base.json benchmarks/results/head.json --threshold 0.10
+"""
+import sys
+import json
+import argparse
+from typing import Dict, Any, Tuple
+
+# Metric -> True when a larger value is better
+METRICS = {
+    "throughput_rps": True,
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "error_rate": False,
+    "peak_rss_mb": False,
+}
+
+# Differences below these absolute amounts are noise, whatever the ratio
+NOISE_FLOOR = {"p50_ms": 2.0, "p95_ms": 5.0, "p99_ms": 10.0, "error_rate": 0.005, "peak_rss_mb": 5.0, "throughput_rps": 1.0}
+
+
+def load(path: str) -> Dict[Tuple[str, str, float], Dict[str, Any]]:
+    with open(path) as f:
+        report = json.load(f)
+    return {(r["scenario"], r["mode"], float(r["level"])): r for r in report["results"]}
+
+
+def compare(base: Dict, head: Dict, threshold: float):
+    """
+    Yield one row per matched result and metric.
+
+    Returns:
+        An iterator of (key, metric, base value, head value, relative change, regressed)
+    """
+    for key in sorted(base.keys() & head.keys()):
+        for metric, higher_is_better in METRICS.items():
+            old, new = base[key].get(metric), head[key].get(metric)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else (0.0 if new == old else float("inf"))
+            worse = -change if higher_is_better else change
+            regressed = worse > threshold and abs(new - old) > NOISE_FLOOR.get(metric, 0.0)
+            yield key, metric, old, new, change, regressed
+
+
+def main(args) -> int:
+    base, head = load(args.base), load(args.head)
+    regressions = 0
+    print(f"{'scenario':<13} {'mode':<11} {'level':>6}  {'metric':<15} {'base':>10} {'head':>10} {'change':>8}")
+    for (scenario, mode, level), metric, old, new, change, regressed in compare(base, head, args.threshold):
+        regressions += regressed
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{scenario:<13} {mode:<11} {level:>6g}  {metric:<15} {old:>10g} {new:>10g} {change:>+8.1%}{flag}")
+    for key in sorted(base.keys() ^ head.keys()):
+        print(f"only in {'base' if key in base else 'head'}: {key}")
+    print(f"{regressions} regression(s) beyond {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base", help="Result file of the baseline commit")
+    parser.add_argument("head", help="Result file of the commit under test")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative change before flagging")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,301 @@
+"""
+Offline load test of the API against local upstream stubs.
+
+Starts benchmarks/stubs.py and the backend (uvicorn main:app with
+CHAT_MODEL=fake) as subprocesses, drives each scenario at fixed
+concurrency levels (closed loop) and fixed request rates (open loop), and
+writes p50/p95/p99 latency, throughput, error counts and the server's peak
+memory and socket usage to a JSON file. Compare two result files with
+benchmarks/compare.py.
+
+Usage (from the backend directory):
+    python benchmarks/load_test.py --concurrency 1 10 50 --rps 20 --duration 10 \\
+        --output benchmarks/results/$(git rev-parse --short HEAD).json
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Callable
+import aiohttp
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+
+from stubs import LatencyProfile, stub_env, add_profile_arguments
+
+# Endpoint and request body for every scenario; {q} is replaced per request
+SCENARIOS: Dict[str, Dict[str, Any]] = {
+    "chat": {"path": "/api/chat", "body": {"message": "Tell me about {q}"}},
+    "search": {"path": "/api/search", "body": {"query": "{q}", "num_results": 5}},
+    "search-30": {"path": "/api/search", "body": {"query": "{q}", "num_results": 30}},
+    "smart-search": {"path": "/api/you/smart-search", "body": {"query": "{q}"}},
+    "research": {"path": "/api/you/research", "body": {"query": "{q}", "depth": "basic"}},
+    "aggregate": {"path": "/api/search/aggregate", "body": {"query": "{q}", "num_results": 10}},
+}
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] if ordered else 0.0
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def process_usage(pid: int) -> Dict[str, Optional[float]]:
+    """Resident memory (MB) and open socket count of a process, read from /proc."""
+    usage: Dict[str, Optional[float]] = {"rss_mb": None, "sockets": None}
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    usage["rss_mb"] = int(line.split()[1]) / 1024
+        fd_dir = f"/proc/{pid}/fd"
+        usage["sockets"] = sum(1 for fd in os.listdir(fd_dir) if os.readlink(os.path.join(fd_dir, fd)).startswith("socket:"))
+    except OSError:
+        # Not Linux, or the process is gone
+        pass
+    return usage
+
+
+async def wait_ready(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(url) as response:
+                    if response.status < 500:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready within {timeout:.0f}s")
+
+
+def start_processes(args, workdir: str):
+    """Launch the stub server and the backend; returns (stub, server, base_url)."""
+    stub_port, api_port = free_port(), free_port()
+    stub = subprocess.Popen(
+        [sys.executable, os.path.join(BENCH_DIR, "stubs.py"), "--port", str(stub_port),
+         "--google", args.google, "--smart", args.smart, "--research", args.research],
+        stdout=subprocess.DEVNULL,
+    )
+    env = {
+        **os.environ,
+        **stub_env(f"http://127.0.0.1:{stub_port}"),
+        "CHAT_MODEL": "fake",
+        "FAKE_CHAT_TOKEN_DELAY": str(args.token_delay),
+        "GEMINI_API_KEY": "bench",
+        "GOOGLE_API_KEY": "bench",
+        "GOOGLE_CSE_ID": "bench",
+        "YOU_API_KEY": "bench",
+        # Measure the server, not our own rate limits
+        "GOOGLE_RATE_PER_MINUTE": "1000000",
+        "YOU_RATE_PER_MINUTE": "1000000",
+        "GEMINI_RATE_PER_MINUTE": "1000000",
+        "QUOTA_SQLITE_PATH": os.path.join(workdir, "quota.db"),
+        "LOG_LEVEL": "WARNING",
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(api_port),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+    return stub, server, f"http://127.0.0.1:{api_port}"
+
+
+class Run:
+    """Latency samples and resource peaks for one scenario at one load level."""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.latencies: List[float] = []
+        self.statuses: Dict[str, int] = {}
+        self.errors = 0
+        self.peak_rss_mb = 0.0
+        self.peak_sockets = 0
+
+    def record(self, latency: float, status: str, ok: bool):
+        self.latencies.append(latency)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if not ok:
+            self.errors += 1
+
+    async def sample_usage(self, interval: float = 0.25):
+        while True:
+            usage = process_usage(self.pid)
+            self.peak_rss_mb = max(self.peak_rss_mb, usage["rss_mb"] or 0.0)
+            self.peak_sockets = max(self.peak_sockets, int(usage["sockets"] or 0))
+            await asyncio.sleep(interval)
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        completed = len(self.latencies)
+        return {
+            "requests": completed,
+            "errors": self.errors,
+            "error_rate": round(self.errors / completed, 4) if completed else 0.0,
+            "throughput_rps": round(completed / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(percentile(self.latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(self.latencies, 95) * 1000, 1),
+            "p99_ms": round(percentile(self.latencies, 99) * 1000, 1),
+            "max_ms": round(max(self.latencies, default=0.0) * 1000, 1),
+            "peak_rss_mb": round(self.peak_rss_mb, 1),
+            "peak_sockets": self.peak_sockets,
+            "statuses": self.statuses,
+        }
+
+
+def make_body_factory(scenario: Dict[str, Any], distinct: int) -> Callable[[], Dict[str, Any]]:
+    """Request bodies cycling through `distinct` queries (0 makes every query unique)."""
+    counter = iter(range(sys.maxsize))
+    run_id = f"{time.time():.0f}"
+
+    def body() -> Dict[str, Any]:
+        n = next(counter)
+        query = f"query {n % distinct}" if distinct else f"query {run_id}-{n}"
+        return {key: value.replace("{q}", query) if isinstance(value, str) else value for key, value in scenario["body"].items()}
+
+    return body
+
+
+async def send(session: aiohttp.ClientSession, url: str, body: Dict[str, Any], run: Run, scheduled: float):
+    try:
+        async with session.post(url, json=body) as response:
+            payload = await response.read()
+            ok = response.status == 200 and b'"success":false' not in payload
+            run.record(time.perf_counter() - scheduled, str(response.status), ok)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        run.record(time.perf_counter() - scheduled, type(e).__name__, False)
+
+
+async def closed_loop(session, url, body, run: Run, concurrency: int, duration: float):
+    """`concurrency` workers each sending back-to-back requests until the duration is up."""
+    stop_at = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < stop_at:
+            await send(session, url, body(), run, time.perf_counter())
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def open_loop(session, url, body, run: Run, rps: float, duration: float):
+    """
+    Fire requests on a fixed schedule regardless of response times.
+
+    Latency is measured from the scheduled send time, so a stalled server
+    is not hidden by the load generator slowing down (coordinated omission).
+    """
+    start = time.perf_counter()
+    tasks = []
+    for i in range(int(rps * duration)):
+        scheduled = start + i / rps
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.ensure_future(send(session, url, body(), run, scheduled)))
+    await asyncio.gather(*tasks)
+
+
+async def run_level(base_url: str, pid: int, name: str, mode: str, level: float, args) -> Dict[str, Any]:
+    scenario = SCENARIOS[name]
+    url = base_url + scenario["path"]
+    body = make_body_factory(scenario, args.distinct)
+    timeout = aiohttp.ClientTimeout(total=args.request_timeout)
+    connector = aiohttp.TCPConnector(limit=int(level) if mode == "concurrency" else 0)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        # Warm up connections and caches so they do not skew the first samples
+        await closed_loop(session, url, body, Run(pid), min(int(level), 10) or 1, args.warmup)
+
+        run = Run(pid)
+        sampler = asyncio.ensure_future(run.sample_usage())
+        start = time.perf_counter()
+        try:
+            if mode == "concurrency":
+                await closed_loop(session, url, body, run, int(level), args.duration)
+            else:
+                await open_loop(session, url, body, run, level, args.duration)
+        finally:
+            elapsed = time.perf_counter() - start
+            sampler.cancel()
+    return {"scenario": name, "mode": mode, "level": level, **run.summary(elapsed)}
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main(args):
+    with tempfile.TemporaryDirectory() as workdir:
+        stub, server, base_url = start_processes(args, workdir)
+        results = []
+        try:
+            await wait_ready(base_url + "/")
+            for name in args.scenarios:
+                levels = [("concurrency", c) for c in args.concurrency] + [("rps", r) for r in args.rps]
+                for mode, level in levels:
+                    result = await run_level(base_url, server.pid, name, mode, level, args)
+                    results.append(result)
+                    print(
+                        f"{name:<13} {mode:<11} {level:>6}  {result['throughput_rps']:>8.1f} req/s  "
+                        f"p50 {result['p50_ms']:>7.1f}  p95 {result['p95_ms']:>7.1f}  p99 {result['p99_ms']:>7.1f} ms  "
+                        f"errors {result['errors']:>4}  rss {result['peak_rss_mb']:>6.1f} MB  sockets {result['peak_sockets']}"
+                    )
+        finally:
+            server.terminate()
+            stub.terminate()
+            server.wait()
+            stub.wait()
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "duration": args.duration,
+            "distinct_queries": args.distinct,
+            "profiles": {
+                "google": LatencyProfile.parse(args.google).to_dict(),
+                "smart": LatencyProfile.parse(args.smart).to_dict(),
+                "research": LatencyProfile.parse(args.research).to_dict(),
+            },
+        },
+        "results": results,
+    }
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=["chat", "search", "smart-search", "research"])
+    parser.add_argument("--concurrency", nargs="*", type=int, default=[1, 10, 50])
+    parser.add_argument("--rps", nargs="*", type=float, default=[20])
+    parser.add_argument("--duration", type=float, default=10, help="Seconds measured per load level")
+    parser.add_argument("--warmup", type=float, default=1, help="Seconds of unmeasured warm-up per level")
+    parser.add_argument("--distinct", type=int, default=0, help="Cycle through N queries (0: all unique, no cache hits)")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="Fake chat model delay per token in seconds")
+    parser.add_argument("--request-timeout", type=float, default=120)
+    parser.add_argument("--output", default=os.path.join(BENCH_DIR, "results", "latest.json"))
+    add_profile_arguments(parser)
+    asyncio.run(main(parser.parse_args()))
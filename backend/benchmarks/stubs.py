@@ -0,0 +1,155 @@
+"""
+Local stand-ins for the upstream APIs used by the backend.
+
+Serves Google Custom Search (GET /customsearch/v1) and You.com Smart and
+Research (POST /smart, POST /research) with configurable latency
+distributions and error rates, so the API can be load tested offline.
+Point the backend at it with GOOGLE_SEARCH_URL, YOU_SMART_API_URL and
+YOU_RESEARCH_API_URL; CHAT_MODEL=fake replaces Gemini.
+
+Usage (from the backend directory):
+    python benchmarks/stubs.py --port 8100 --google "median=80,p99=400,error=0.01"
+"""
+import math
+import random
+import asyncio
+import argparse
+from typing import Dict
+from aiohttp import web
+
+
+class LatencyProfile:
+    """
+    Log-normal latency distribution with an injected error rate.
+
+    The distribution is parameterised by its median and p99 (in ms), which
+    is how upstream latency is usually reported; errors are answered with
+    a 503 and a Retry-After of 0, or a 429 when `throttle` is set.
+    """
+
+    def __init__(self, median: float = 50.0, p99: float = 200.0, error: float = 0.0, throttle: float = 0.0):
+        self.median = median
+        self.p99 = max(p99, median)
+        self.error = error
+        self.throttle = throttle
+        # p99 of a log-normal is median * exp(2.326 * sigma)
+        self.sigma = math.log(self.p99 / self.median) / 2.326 if self.median > 0 else 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyProfile":
+        """Build a profile from "median=80,p99=400,error=0.01,throttle=0"."""
+        values: Dict[str, float] = {}
+        for part in filter(None, (p.strip() for p in spec.split(","))):
+            name, _, value = part.partition("=")
+            values[name.strip()] = float(value)
+        return cls(**values)
+
+    def sample_seconds(self) -> float:
+        if self.median <= 0:
+            return 0.0
+        return random.lognormvariate(math.log(self.median), self.sigma) / 1000
+
+    def to_dict(self) -> Dict[str, float]:
+        return {"median": self.median, "p99": self.p99, "error": self.error, "throttle": self.throttle}
+
+
+def _injected_failure(profile: LatencyProfile):
+    roll = random.random()
+    if roll < profile.throttle:
+        return web.json_response({"error": "rate limited"}, status=429, headers={"Retry-After": "1"})
+    if roll < profile.throttle + profile.error:
+        return web.json_response({"error": "overloaded"}, status=503, headers={"Retry-After": "0"})
+    return None
+
+
+def _sources(query: str, count: int):
+    return [
+        {"name": f"{query} source {i}", "url": f"https://example.com/{i}?q={query}", "snippet": f"Snippet {i} for {query}."}
+        for i in range(1, count + 1)
+    ]
+
+
+def build_app(google: LatencyProfile, smart: LatencyProfile, research: LatencyProfile) -> web.Application:
+    """Create the stub application; request counts are kept in app["hits"]."""
+    hits = {"google": 0, "smart": 0, "research": 0}
+
+    async def google_handler(request):
+        hits["google"] += 1
+        await asyncio.sleep(google.sample_seconds())
+        failure = _injected_failure(google)
+        if failure is not None:
+            return failure
+        query = request.query.get("q", "")
+        start = int(request.query.get("start", 1))
+        num = int(request.query.get("num", 10))
+        items = [
+            {
+                "title": f"{query} result {rank}",
+                "link": f"https://example.com/{rank}?q={query}",
+                "displayLink": "example.com",
+                "snippet": f"Result {rank} about {query}.",
+            }
+            for rank in range(start, start + num)
+        ]
+        next_page = [{"startIndex": start + num}] if start + num <= 100 else []
+        return web.json_response({"items": items, "queries": {"nextPage": next_page}})
+
+    def you_handler(name: str, profile: LatencyProfile, sources: int):
+        async def handler(request):
+            hits[name] += 1
+            payload = await request.json()
+            await asyncio.sleep(profile.sample_seconds())
+            failure = _injected_failure(profile)
+            if failure is not None:
+                return failure
+            query = payload.get("query", "")
+            answer = " ".join(f"Sentence {i} answering {query}." for i in range(1, 8))
+            return web.json_response({"answer": answer, "search_results": _sources(query, sources)})
+
+        return handler
+
+    async def stats_handler(request):
+        return web.json_response(hits)
+
+    app = web.Application()
+    app["hits"] = hits
+    app.router.add_get("/customsearch/v1", google_handler)
+    app.router.add_post("/smart", you_handler("smart", smart, 5))
+    app.router.add_post("/research", you_handler("research", research, 10))
+    app.router.add_get("/stats", stats_handler)
+    return app
+
+
+async def start_app(app: web.Application, host: str = "127.0.0.1", port: int = 0):
+    """Serve a stub app in the running event loop; returns (runner, base URL)."""
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://{host}:{port}"
+
+
+def stub_env(base_url: str) -> Dict[str, str]:
+    """Environment variables pointing the backend at a stub server."""
+    return {
+        "GOOGLE_SEARCH_URL": f"{base_url}/customsearch/v1",
+        "YOU_SMART_API_URL": f"{base_url}/smart",
+        "YOU_RESEARCH_API_URL": f"{base_url}/research",
+    }
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--google", default="median=80,p99=400", help="Google CSE latency/error profile")
+    parser.add_argument("--smart", default="median=300,p99=1500", help="You.com Smart API profile")
+    parser.add_argument("--research", default="median=800,p99=4000", help="You.com Research API profile")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    app = build_app(LatencyProfile.parse(args.google), LatencyProfile.parse(args.smart), LatencyProfile.parse(args.research))
+    web.run_app(app, host=args.host, port=args.port, access_log=None)
@@ -0,0 +1,270 @@
+import os
+import re
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable, Awaitable, Tuple
+from http_pool import UpstreamHTTPError
+
+# Response cache configuration (overridable through environment variables)
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "600"))
+RESPONSE_CACHE_NEGATIVE_TTL = float(os.getenv("RESPONSE_CACHE_NEGATIVE_TTL", "30"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+RESPONSE_CACHE_SQLITE_PATH = os.getenv("RESPONSE_CACHE_SQLITE_PATH")
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Lower-case a query and collapse runs of whitespace."""
+    return _WHITESPACE.sub(" ", query.strip().lower())
+
+
+def make_cache_key(namespace: str, **parts: Any) -> str:
+    """
+    Build a stable cache key from a namespace and request parameters.
+
+    Args:
+        namespace: Upstream operation name, e.g. "google" or "you-smart"
+        **parts: Request parameters (query, num_results, instructions, depth, ...)
+
+    Returns:
+        A key string safe to use in every cache tier
+    """
+    normalized = {}
+    for name, value in parts.items():
+        if isinstance(value, str):
+            value = normalize_query(value)
+        normalized[name] = value
+    digest = hashlib.sha256(json.dumps(normalized, sort_keys=True).encode("utf-8")).hexdigest()
+    return f"{namespace}:{digest}"
+
+
+class CacheBackend(ABC):
+    """A single cache tier storing JSON-encoded payloads with an expiry time."""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Tuple[str, float]]:
+        """Return (payload, expires_at) or None when the key is missing."""
+
+    @abstractmethod
+    async def set(self, key: str, payload: str, expires_at: float):
+        """Store a payload until the given wall-clock time."""
+
+    @abstractmethod
+    async def delete(self, key: str):
+        """Remove a key if present."""
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class MemoryLRUCache(CacheBackend):
+    """In-process LRU tier bounded by the total UTF-8 size of the stored payloads."""
+
+    def __init__(self, max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.evictions = 0
+        # key -> (payload, expires_at, size in bytes)
+        self._entries: "OrderedDict[str, Tuple[str, float, int]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Tuple[str, float]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.time():
+            await self.delete(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry[0], entry[1]
+
+    async def set(self, key: str, payload: str, expires_at: float):
+        # The bound is in bytes; len(payload) would count characters
+        size = len(payload.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        await self.delete(key)
+        self._entries[key] = (payload, expires_at, size)
+        self.current_bytes += size
+        while self.current_bytes > self.max_bytes:
+            _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            self.current_bytes -= evicted_size
+            self.evictions += 1
+
+    async def delete(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= entry[2]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+        }
+
+
+class SQLiteCache(CacheBackend):
+    """On-disk tier that survives restarts. Queries run in a worker thread."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache ("
+            "key TEXT PRIMARY KEY, payload TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._lock = asyncio.Lock()
+
+    def _get(self, key: str):
+        return self._conn.execute(
+            "SELECT payload, expires_at FROM response_cache WHERE key = ? AND expires_at > ?",
+            (key, time.time()),
+        ).fetchone()
+
+    def _set(self, key: str, payload: str, expires_at: float):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO response_cache (key, payload, expires_at) VALUES (?, ?, ?)",
+            (key, payload, expires_at),
+        )
+        self._conn.commit()
+
+    def _delete(self, key: str):
+        self._conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+        self._conn.commit()
+
+    def purge_expired(self) -> int:
+        """Delete expired rows and return how many were removed."""
+        cursor = self._conn.execute("DELETE FROM response_cache WHERE expires_at <= ?", (time.time(),))
+        self._conn.commit()
+        return cursor.rowcount
+
+    async def get(self, key: str) -> Optional[Tuple[str, float]]:
+        async with self._lock:
+            row = await asyncio.to_thread(self._get, key)
+        return (row[0], row[1]) if row else None
+
+    async def set(self, key: str, payload: str, expires_at: float):
+        async with self._lock:
+            await asyncio.to_thread(self._set, key, payload, expires_at)
+
+    async def delete(self, key: str):
+        async with self._lock:
+            await asyncio.to_thread(self._delete, key)
+
+    def stats(self) -> Dict[str, Any]:
+        entries = self._conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+        return {"path": self.path, "entries": entries}
+
+    def close(self):
+        self._conn.close()
+
+
+class ResponseCache:
+    """
+    Two-tier async cache for raw upstream JSON responses.
+
+    Lookups hit the in-process LRU first and fall back to the optional
+    SQLite tier, promoting disk hits into memory. Empty results and upstream
+    HTTP errors are stored with a shorter TTL.
+    """
+
+    def __init__(
+        self,
+        memory: Optional[MemoryLRUCache] = None,
+        disk: Optional[CacheBackend] = None,
+        ttl: float = RESPONSE_CACHE_TTL,
+        negative_ttl: float = RESPONSE_CACHE_NEGATIVE_TTL,
+    ):
+        self.memory = memory or MemoryLRUCache()
+        self.disk = disk
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+    @classmethod
+    def from_env(cls) -> "ResponseCache":
+        """Build a cache using the RESPONSE_CACHE_* environment variables."""
+        disk = SQLiteCache(RESPONSE_CACHE_SQLITE_PATH) if RESPONSE_CACHE_SQLITE_PATH else None
+        return cls(disk=disk)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = await self.memory.get(key)
+        if entry is None and self.disk is not None:
+            entry = await self.disk.get(key)
+            if entry is not None:
+                self.disk_hits += 1
+                await self.memory.set(key, entry[0], entry[1])
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(entry[0])
+
+    async def set(self, key: str, value: Dict[str, Any], ttl: Optional[float] = None):
+        payload = json.dumps(value)
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        await self.memory.set(key, payload, expires_at)
+        if self.disk is not None:
+            await self.disk.set(key, payload, expires_at)
+
+    async def get_or_fetch(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[Dict[str, Any]]],
+        is_negative: Optional[Callable[[Dict[str, Any]], bool]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Return the cached response for a key or fetch and store it.
+
+        Args:
+            key: Cache key from make_cache_key
+            fetch: Coroutine factory performing the upstream request
+            is_negative: Predicate marking empty responses for the short TTL
+
+        Returns:
+            The raw upstream JSON response
+        """
+        cached = await self.get(key)
+        if cached is not None:
+            error = cached.get("__upstream_error__")
+            if error is not None:
+                raise UpstreamHTTPError(error["status"], error["text"])
+            return cached
+
+        try:
+            value = await fetch()
+        except UpstreamHTTPError as e:
+            # Rate limiting is transient; everything else is remembered briefly
+            if e.status != 429:
+                await self.set(key, {"__upstream_error__": {"status": e.status, "text": e.text}}, self.negative_ttl)
+            raise
+
+        negative = is_negative(value) if is_negative else not value
+        await self.set(key, value, self.negative_ttl if negative else self.ttl)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory": self.memory.stats(),
+            "disk": self.disk.stats() if self.disk is not None else None,
+        }
+
+    async def close(self):
+        if isinstance(self.disk, SQLiteCache):
+            self.disk.close()
@@ -0,0 +1,66 @@
+import asyncio
+from abc import ABC, abstractmethod
+from typing import List, Dict, AsyncIterator, Optional
+from rag import RetrievalPrefetch
+
+
+class ChatModel(ABC):
+    """Interface for chat backends used by the API endpoints."""
+
+    @abstractmethod
+    async def get_response(
+        self, message: str, conversation_history: List[Dict[str, str]], retrieval: Optional[RetrievalPrefetch] = None
+    ) -> str:
+        """
+        Generate a complete reply to a message.
+
+        Args:
+            message: The new user message
+            conversation_history: Previous messages as {"role", "content"} dicts
+            retrieval: Web retrieval started for this turn; its context is
+                awaited once the history is prepared
+
+        Returns:
+            The reply text
+        """
+
+    @abstractmethod
+    def stream_response(
+        self, message: str, conversation_history: List[Dict[str, str]], retrieval: Optional[RetrievalPrefetch] = None
+    ) -> AsyncIterator[str]:
+        """
+        Generate a reply incrementally.
+
+        Args:
+            message: The new user message
+            conversation_history: Previous messages as {"role", "content"} dicts
+            retrieval: Web retrieval started for this turn
+
+        Returns:
+            An async iterator of text chunks in generation order
+        """
+
+
+class FakeChatModel(ChatModel):
+    """Offline model that echoes the message back token by token."""
+
+    def __init__(self, token_delay: float = 0.01, reply_template: str = "You said: {message}"):
+        self.token_delay = token_delay
+        self.reply_template = reply_template
+
+    async def get_response(
+        self, message: str, conversation_history: List[Dict[str, str]], retrieval: Optional[RetrievalPrefetch] = None
+    ) -> str:
+        chunks = [chunk async for chunk in self.stream_response(message, conversation_history, retrieval)]
+        return "".join(chunks)
+
+    async def stream_response(
+        self, message: str, conversation_history: List[Dict[str, str]], retrieval: Optional[RetrievalPrefetch] = None
+    ) -> AsyncIterator[str]:
+        context = await retrieval.context(conversation_history) if retrieval is not None else None
+        reply = self.reply_template.format(
+            message=message, turns=len(conversation_history), sources=len(context.sources) if context else 0
+        )
+        for i, token in enumerate(reply.split(" ")):
+            await asyncio.sleep(self.token_delay)
+            yield token if i == 0 else " " + token
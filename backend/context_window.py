@@ -0,0 +1,183 @@
+import os
+import re
+import time
+import hashlib
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Callable, Awaitable, Tuple
+
+# Context window configuration (overridable through environment variables)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "8000"))
+CONTEXT_KEEP_RECENT = int(os.getenv("CONTEXT_KEEP_RECENT", "6"))
+CONTEXT_SUMMARY_TOKENS = int(os.getenv("CONTEXT_SUMMARY_TOKENS", "600"))
+CONTEXT_SUMMARY_CACHE_SIZE = int(os.getenv("CONTEXT_SUMMARY_CACHE_SIZE", "1024"))
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+Summarizer = Callable[[Optional[str], List[Dict[str, str]], int], Awaitable[str]]
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of model tokens in a text without a tokenizer.
+
+    Words longer than four characters are counted as several sub-word pieces,
+    which tracks SentencePiece-style tokenizers closely enough for budgeting.
+    """
+    count = 0
+    for piece in _TOKEN_PATTERN.findall(text):
+        count += 1 + (len(piece) - 1) // 4
+    return count
+
+
+def message_tokens(message: Dict[str, str]) -> int:
+    # A few tokens of per-message framing (role markers, separators)
+    return estimate_tokens(message["content"]) + 4
+
+
+async def extractive_summarizer(previous: Optional[str], messages: List[Dict[str, str]], max_tokens: int) -> str:
+    """
+    Local summarizer folding messages into the previous summary.
+
+    Keeps the first sentence of every message and trims the oldest lines
+    until the summary fits the token budget.
+    """
+    lines = previous.split("\n") if previous else []
+    for msg in messages:
+        first_sentence = re.split(r"(?<=[.!?])\s", msg["content"].strip(), maxsplit=1)[0]
+        lines.append(f"{msg['role']}: {first_sentence[:300]}")
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+class ContextWindowManager:
+    """
+    Fits conversation history into a token budget for each model call.
+
+    The most recent turns are always kept verbatim. Older turns are folded
+    into a rolling summary that is cached per conversation prefix and only
+    extended with the turns that slid out of the window since the last call.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = CONTEXT_TOKEN_BUDGET,
+        keep_recent: int = CONTEXT_KEEP_RECENT,
+        summary_tokens: int = CONTEXT_SUMMARY_TOKENS,
+        summarizer: Summarizer = extractive_summarizer,
+        cache_size: int = CONTEXT_SUMMARY_CACHE_SIZE,
+    ):
+        self.token_budget = token_budget
+        self.keep_recent = keep_recent
+        self.summary_tokens = summary_tokens
+        self.summarizer = summarizer
+        self.cache_size = cache_size
+        # prefix hash -> (number of summarized messages, summary text)
+        self._summaries: "OrderedDict[str, Tuple[int, str]]" = OrderedDict()
+        self.last_metrics: Dict[str, Any] = {}
+        self.summaries_computed = 0
+        self.summary_cache_hits = 0
+
+    @staticmethod
+    def _prefix_hashes(messages: List[Dict[str, str]]) -> List[str]:
+        # hashes[i] identifies messages[:i + 1]
+        hashes = []
+        digest = hashlib.sha1()
+        for msg in messages:
+            digest.update(msg["role"].encode("utf-8") + b"\0" + msg["content"].encode("utf-8") + b"\0")
+            hashes.append(digest.copy().hexdigest())
+        return hashes
+
+    def _split_point(self, history: List[Dict[str, str]], reserved: int) -> int:
+        # Walk back from the newest message while the verbatim tail fits
+        budget = self.token_budget - reserved - self.summary_tokens
+        used = 0
+        split = len(history)
+        while split > 0:
+            cost = message_tokens(history[split - 1])
+            if len(history) - split >= self.keep_recent and used + cost > budget:
+                break
+            used += cost
+            split -= 1
+        return split
+
+    async def _summary_for(self, older: List[Dict[str, str]]) -> str:
+        hashes = self._prefix_hashes(older)
+        key = hashes[-1]
+        cached = self._summaries.get(key)
+        if cached is not None:
+            self._summaries.move_to_end(key)
+            self.summary_cache_hits += 1
+            return cached[1]
+
+        # Reuse the longest cached summary of a prefix and fold in the rest
+        start, previous = 0, None
+        for i in range(len(hashes) - 2, -1, -1):
+            entry = self._summaries.get(hashes[i])
+            if entry is not None:
+                start, previous = entry
+                break
+
+        summary = await self.summarizer(previous, older[start:], self.summary_tokens)
+        self.summaries_computed += 1
+        self._summaries[key] = (len(older), summary)
+        while len(self._summaries) > self.cache_size:
+            self._summaries.popitem(last=False)
+        return summary
+
+    async def build(self, history: List[Dict[str, str]], message: str, reserve_tokens: int = 0) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+        """
+        Return the history to send to the model for a new message.
+
+        Args:
+            history: Full conversation as {"role", "content"} dicts
+            message: The new user message (its tokens are reserved up front)
+            reserve_tokens: Extra prompt tokens to leave room for (e.g. retrieved context)
+
+        Returns:
+            The trimmed history (led by a summary message when turns were
+            compacted) and the prompt-size metrics of this turn
+        """
+        start = time.perf_counter()
+        reserved = estimate_tokens(message) + reserve_tokens
+        full_tokens = sum(message_tokens(m) for m in history) + reserved
+
+        if full_tokens <= self.token_budget:
+            window = list(history)
+            summarized = 0
+        else:
+            split = self._split_point(history, reserved)
+            # Keep user/assistant pairs together at the window edge
+            if split < len(history) and history[split]["role"] == "assistant":
+                split += 1
+            older, recent = history[:split], history[split:]
+            window = list(recent)
+            summarized = len(older)
+            if older:
+                summary = await self._summary_for(older)
+                window = [
+                    {"role": "user", "content": f"Summary of the earlier conversation:\n{summary}"},
+                    {"role": "assistant", "content": "Understood, I will keep that context in mind."},
+                ] + window
+
+        prompt_tokens = sum(message_tokens(m) for m in window) + reserved
+        metrics = {
+            "history_messages": len(history),
+            "summarized_messages": summarized,
+            "full_prompt_tokens": full_tokens,
+            "prompt_tokens": prompt_tokens,
+            "tokens_saved": full_tokens - prompt_tokens,
+            "build_ms": (time.perf_counter() - start) * 1000,
+        }
+        self.last_metrics = metrics
+        return window, metrics
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "token_budget": self.token_budget,
+            "keep_recent": self.keep_recent,
+            "cached_summaries": len(self._summaries),
+            "summaries_computed": self.summaries_computed,
+            "summary_cache_hits": self.summary_cache_hits,
+            "last_turn": self.last_metrics,
+        }
@@ -0,0 +1,294 @@
+import os
+import time
+import uuid
+import asyncio
+import sqlite3
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, Optional
+
+# Conversation store configuration (overridable through environment variables)
+CONVERSATION_STORE = os.getenv("CONVERSATION_STORE", "memory")
+CONVERSATION_SQLITE_PATH = os.getenv("CONVERSATION_SQLITE_PATH", os.path.join(os.getenv("DATA_DIR", "."), "conversations.db"))
+CONVERSATION_MAX_SESSIONS = int(os.getenv("CONVERSATION_MAX_SESSIONS", "10000"))
+CONVERSATION_MAX_BYTES = int(os.getenv("CONVERSATION_MAX_BYTES", str(64 * 1024 * 1024)))
+CONVERSATION_IDLE_TTL = float(os.getenv("CONVERSATION_IDLE_TTL", str(24 * 3600)))
+
+
+class ConversationNotFound(Exception):
+    """Raised when appending to a conversation that is unknown, expired or evicted."""
+
+    def __init__(self, conversation_id: str):
+        super().__init__(f"Conversation {conversation_id} not found or expired")
+        self.conversation_id = conversation_id
+
+
+def _message_size(message: Dict[str, str]) -> int:
+    return len(message["role"].encode("utf-8")) + len(message["content"].encode("utf-8"))
+
+
+class _ConversationLocks:
+    """Per-conversation asyncio locks, dropped again once nobody holds or awaits them."""
+
+    def __init__(self):
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._users: Dict[str, int] = {}
+
+    @asynccontextmanager
+    async def hold(self, conversation_id: str):
+        lock = self._locks.setdefault(conversation_id, asyncio.Lock())
+        self._users[conversation_id] = self._users.get(conversation_id, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._users[conversation_id] -= 1
+            if not self._users[conversation_id]:
+                del self._users[conversation_id], self._locks[conversation_id]
+
+
+class ConversationStore(ABC):
+    """
+    Server-side storage of chat transcripts keyed by conversation ID.
+
+    Backends only need create/get/append/delete, so a Redis-compatible
+    implementation can be plugged in alongside the in-memory and SQLite ones.
+    """
+
+    @abstractmethod
+    async def create(self) -> str:
+        """Start an empty conversation and return its ID."""
+
+    @abstractmethod
+    async def get(self, conversation_id: str) -> Optional[List[Dict[str, str]]]:
+        """Return the messages of a conversation, or None if unknown or evicted."""
+
+    @abstractmethod
+    async def append(self, conversation_id: str, messages: List[Dict[str, str]]):
+        """
+        Append messages to an existing conversation; raises ConversationNotFound if it is gone.
+
+        Appends to one conversation are serialized, so the messages of a call
+        stay contiguous and in order.
+        """
+
+    @abstractmethod
+    async def delete(self, conversation_id: str):
+        """Forget a conversation."""
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+    async def close(self):
+        pass
+
+
+class _Conversation:
+    __slots__ = ("messages", "size", "last_access")
+
+    def __init__(self):
+        self.messages: List[Dict[str, str]] = []
+        self.size = 0
+        self.last_access = time.monotonic()
+
+
+class InMemoryConversationStore(ConversationStore):
+    """LRU conversation store bounded by session count, total bytes and idle time."""
+
+    def __init__(
+        self,
+        max_sessions: int = CONVERSATION_MAX_SESSIONS,
+        max_bytes: int = CONVERSATION_MAX_BYTES,
+        idle_ttl: float = CONVERSATION_IDLE_TTL,
+    ):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.current_bytes = 0
+        self.evictions = 0
+        self._conversations: "OrderedDict[str, _Conversation]" = OrderedDict()
+        self._append_locks = _ConversationLocks()
+
+    def _evict(self):
+        # Entries are kept in access order, so idle ones sit at the front
+        cutoff = time.monotonic() - self.idle_ttl
+        while self._conversations:
+            oldest_id, oldest = next(iter(self._conversations.items()))
+            if (
+                oldest.last_access >= cutoff
+                and len(self._conversations) <= self.max_sessions
+                and self.current_bytes <= self.max_bytes
+            ):
+                break
+            self._remove(oldest_id)
+            self.evictions += 1
+
+    def _remove(self, conversation_id: str):
+        conversation = self._conversations.pop(conversation_id, None)
+        if conversation is not None:
+            self.current_bytes -= conversation.size
+
+    def _touch(self, conversation_id: str) -> Optional[_Conversation]:
+        conversation = self._conversations.get(conversation_id)
+        if conversation is None:
+            return None
+        if conversation.last_access < time.monotonic() - self.idle_ttl:
+            self._remove(conversation_id)
+            self.evictions += 1
+            return None
+        conversation.last_access = time.monotonic()
+        self._conversations.move_to_end(conversation_id)
+        return conversation
+
+    async def create(self) -> str:
+        conversation_id = uuid.uuid4().hex
+        self._conversations[conversation_id] = _Conversation()
+        self._evict()
+        return conversation_id
+
+    async def get(self, conversation_id: str) -> Optional[List[Dict[str, str]]]:
+        conversation = self._touch(conversation_id)
+        return list(conversation.messages) if conversation is not None else None
+
+    async def append(self, conversation_id: str, messages: List[Dict[str, str]]):
+        async with self._append_locks.hold(conversation_id):
+            conversation = self._touch(conversation_id)
+            if conversation is None:
+                raise ConversationNotFound(conversation_id)
+            added = sum(_message_size(m) for m in messages)
+            conversation.messages.extend(messages)
+            conversation.size += added
+            self.current_bytes += added
+            self._evict()
+
+    async def delete(self, conversation_id: str):
+        self._remove(conversation_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "sessions": len(self._conversations),
+            "bytes": self.current_bytes,
+            "max_sessions": self.max_sessions,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+        }
+
+
+class SQLiteConversationStore(ConversationStore):
+    """Persistent conversation store. Queries run in a worker thread."""
+
+    def __init__(
+        self,
+        path: str = CONVERSATION_SQLITE_PATH,
+        max_sessions: int = CONVERSATION_MAX_SESSIONS,
+        idle_ttl: float = CONVERSATION_IDLE_TTL,
+    ):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS conversations (
+                id TEXT PRIMARY KEY, last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS conversations_last_access ON conversations (last_access);
+            CREATE TABLE IF NOT EXISTS conversation_messages (
+                conversation_id TEXT NOT NULL, seq INTEGER NOT NULL,
+                role TEXT NOT NULL, content TEXT NOT NULL,
+                PRIMARY KEY (conversation_id, seq)
+            );
+            """
+        )
+        self._lock = asyncio.Lock()
+        self._append_locks = _ConversationLocks()
+
+    async def _run(self, fn, *args):
+        async with self._lock:
+            return await asyncio.to_thread(fn, *args)
+
+    def _create(self) -> str:
+        conversation_id = uuid.uuid4().hex
+        now = time.time()
+        with self._conn:
+            self._conn.execute("INSERT INTO conversations (id, last_access) VALUES (?, ?)", (conversation_id, now))
+            self._evict(now)
+        return conversation_id
+
+    def _evict(self, now: float):
+        stale = [row[0] for row in self._conn.execute(
+            "SELECT id FROM conversations WHERE last_access < ? OR id IN "
+            "(SELECT id FROM conversations ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (now - self.idle_ttl, self.max_sessions),
+        )]
+        for conversation_id in stale:
+            self._delete(conversation_id)
+
+    def _get(self, conversation_id: str) -> Optional[List[Dict[str, str]]]:
+        now = time.time()
+        with self._conn:
+            updated = self._conn.execute(
+                "UPDATE conversations SET last_access = ? WHERE id = ? AND last_access >= ?",
+                (now, conversation_id, now - self.idle_ttl),
+            ).rowcount
+        if not updated:
+            return None
+        rows = self._conn.execute(
+            "SELECT role, content FROM conversation_messages WHERE conversation_id = ? ORDER BY seq",
+            (conversation_id,),
+        )
+        return [{"role": role, "content": content} for role, content in rows]
+
+    def _append(self, conversation_id: str, messages: List[Dict[str, str]]):
+        with self._conn:
+            # Take the write lock before reading MAX(seq), so appends from other worker processes serialize here
+            self._conn.execute("BEGIN IMMEDIATE")
+            if self._conn.execute("SELECT 1 FROM conversations WHERE id = ?", (conversation_id,)).fetchone() is None:
+                raise ConversationNotFound(conversation_id)
+            start = self._conn.execute(
+                "SELECT COALESCE(MAX(seq), -1) + 1 FROM conversation_messages WHERE conversation_id = ?",
+                (conversation_id,),
+            ).fetchone()[0]
+            self._conn.executemany(
+                "INSERT INTO conversation_messages (conversation_id, seq, role, content) VALUES (?, ?, ?, ?)",
+                [(conversation_id, start + i, m["role"], m["content"]) for i, m in enumerate(messages)],
+            )
+            self._conn.execute("UPDATE conversations SET last_access = ? WHERE id = ?", (time.time(), conversation_id))
+
+    def _delete(self, conversation_id: str):
+        self._conn.execute("DELETE FROM conversation_messages WHERE conversation_id = ?", (conversation_id,))
+        self._conn.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
+
+    def _delete_committed(self, conversation_id: str):
+        with self._conn:
+            self._delete(conversation_id)
+
+    async def create(self) -> str:
+        return await self._run(self._create)
+
+    async def get(self, conversation_id: str) -> Optional[List[Dict[str, str]]]:
+        return await self._run(self._get, conversation_id)
+
+    async def append(self, conversation_id: str, messages: List[Dict[str, str]]):
+        async with self._append_locks.hold(conversation_id):
+            await self._run(self._append, conversation_id, messages)
+
+    async def delete(self, conversation_id: str):
+        await self._run(self._delete_committed, conversation_id)
+
+    def stats(self) -> Dict[str, Any]:
+        sessions = self._conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+        return {"backend": "sqlite", "path": self.path, "sessions": sessions, "max_sessions": self.max_sessions}
+
+    async def close(self):
+        self._conn.close()
+
+
+def create_conversation_store() -> ConversationStore:
+    """Build the conversation store selected by CONVERSATION_STORE."""
+    if CONVERSATION_STORE == "sqlite":
+        return SQLiteConversationStore()
+    return InMemoryConversationStore()
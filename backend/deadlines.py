@@ -0,0 +1,208 @@
+import os
+import json
+import math
+import time
+import asyncio
+import logging
+import contextvars
+from typing import Dict, Optional
+from metrics import REQUEST_CANCELLATIONS, DEADLINE_SKIPS
+from tracing import current_trace
+
+logger = logging.getLogger(__name__)
+
+# Seconds the client is willing to wait, e.g. "X-Request-Timeout: 8"
+DEADLINE_HEADER = os.getenv("DEADLINE_HEADER", "X-Request-Timeout").lower().encode("latin-1")
+# Upper bound for header-supplied budgets
+DEADLINE_MAX = float(os.getenv("DEADLINE_MAX", "300"))
+# Default budget per route; other routes only get one from the header
+DEFAULT_DEADLINES: Dict[str, float] = {
+    "/api/chat": float(os.getenv("DEADLINE_CHAT", "60")),
+    "/api/chat/stream": float(os.getenv("DEADLINE_CHAT_STREAM", "120")),
+    "/api/search": float(os.getenv("DEADLINE_SEARCH", "20")),
+    "/api/search/aggregate": float(os.getenv("DEADLINE_AGGREGATE", "20")),
+    "/api/you/smart-search": float(os.getenv("DEADLINE_YOU_SMART", "45")),
+    "/api/you/research": float(os.getenv("DEADLINE_YOU_RESEARCH", "90")),
+}
+# A fallback call is only started with at least this many seconds left
+DEADLINE_FALLBACK_MIN = float(os.getenv("DEADLINE_FALLBACK_MIN", "5"))
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request's time budget runs out before its work is done."""
+
+    def __init__(self, operation: str, timeout: Optional[float] = None):
+        budget = f" of {timeout:g}s" if timeout is not None and math.isfinite(timeout) else ""
+        super().__init__(f"Request deadline{budget} exceeded during {operation}")
+        self.operation = operation
+
+
+class Deadline:
+    """
+    Time budget of one request.
+
+    Also records why the request's work was cancelled ("disconnect" or
+    "deadline"), so code unwinding from the cancellation can attribute it.
+    """
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.timeout = timeout if timeout is not None else math.inf
+        self.expires_at = time.monotonic() + self.timeout
+        self.cancel_reason: Optional[str] = None
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+_current_deadline: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar("request_deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current_deadline.get()
+
+
+def without_deadline() -> contextvars.Context:
+    """
+    A copy of the current context with no request deadline.
+
+    Work shared by several requests (coalesced upstream calls, background
+    audits) runs in it, so one client's short budget cannot cut the call
+    short for everybody else; each request still stops waiting at its own
+    deadline.
+    """
+    context = contextvars.copy_context()
+    context.run(_current_deadline.set, None)
+    return context
+
+
+def time_left(cap: float = math.inf) -> float:
+    """Seconds left in the current request's budget, at most cap (cap outside requests)."""
+    deadline = _current_deadline.get()
+    return cap if deadline is None else min(cap, deadline.remaining())
+
+
+def has_budget(seconds: float, operation: str) -> bool:
+    """Whether at least `seconds` are left for an optional step; counts the skip otherwise."""
+    if time_left() >= seconds:
+        return True
+    DEADLINE_SKIPS.inc(operation=operation)
+    logger.info("Skipping %s: %.1fs left in the request budget", operation, time_left())
+    return False
+
+
+def cancel_reason() -> str:
+    """Why the current request's work is being cancelled ("abandoned" when it is not)."""
+    deadline = _current_deadline.get()
+    return deadline.cancel_reason if deadline is not None and deadline.cancel_reason else "abandoned"
+
+
+def request_timeout(path: str, headers) -> Optional[float]:
+    """The request's budget: the deadline header (capped at DEADLINE_MAX), else the route default."""
+    for name, value in headers:
+        if name == DEADLINE_HEADER:
+            try:
+                timeout = float(value.decode("latin-1"))
+            except ValueError:
+                break
+            if timeout > 0:
+                return min(timeout, DEADLINE_MAX)
+            break
+    return DEFAULT_DEADLINES.get(path)
+
+
+class DeadlineMiddleware:
+    """
+    ASGI middleware enforcing request deadlines and cancelling on disconnect.
+
+    The handler runs in its own task with the request's Deadline in
+    context, so upstream clients can size their timeouts and skip optional
+    calls. Once the request body has been read the middleware watches for
+    the client disconnecting; on a disconnect or when the deadline passes
+    the handler task is cancelled, which cancels every upstream call it is
+    awaiting. A deadline hit before the response started answers 504; a
+    response already streaming is ended.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        deadline = Deadline(request_timeout(scope["path"], scope.get("headers") or []))
+        token = _current_deadline.set(deadline)
+        body_read = asyncio.Event()
+        disconnected = asyncio.Event()
+        started = False
+        finished = False
+
+        async def receive_request():
+            if body_read.is_set():
+                # The watcher owns the channel now; relay the disconnect
+                await disconnected.wait()
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                disconnected.set()
+            elif not message.get("more_body", False):
+                body_read.set()
+            return message
+
+        async def send_response(message):
+            nonlocal started, finished
+            if message["type"] == "http.response.start":
+                started = True
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                finished = True
+            await send(message)
+
+        async def watch_disconnect():
+            await body_read.wait()
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            disconnected.set()
+
+        handler = asyncio.create_task(self.app(scope, receive_request, send_response))
+        watcher = asyncio.create_task(watch_disconnect())
+        try:
+            timeout = deadline.remaining() if math.isfinite(deadline.timeout) else None
+            done, _ = await asyncio.wait({handler, watcher}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if handler in done or finished:
+                # Servers also report a disconnect once the response is complete
+                await handler
+                return
+
+            deadline.cancel_reason = "disconnect" if disconnected.is_set() else "deadline"
+            trace = current_trace()
+            REQUEST_CANCELLATIONS.inc(route=(trace.route if trace and trace.route else scope["path"]), reason=deadline.cancel_reason)
+            handler.cancel()
+            try:
+                await handler
+            except asyncio.CancelledError:
+                pass
+            if deadline.cancel_reason == "deadline":
+                await self._timed_out(send, deadline, started, finished)
+        finally:
+            # Also reached when this middleware itself is cancelled (e.g. on shutdown)
+            handler.cancel()
+            watcher.cancel()
+            _current_deadline.reset(token)
+
+    @staticmethod
+    async def _timed_out(send, deadline: Deadline, started: bool, finished: bool):
+        if not started:
+            body = json.dumps({"success": False, "error": f"Request deadline of {deadline.timeout:g}s exceeded"})
+            await send({
+                "type": "http.response.start",
+                "status": 504,
+                "headers": [(b"content-type", b"application/json")],
+            })
+            await send({"type": "http.response.body", "body": body.encode("utf-8")})
+        elif not finished:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
@@ -1,19 +1,96 @@
 import google.generativeai as genai
 import os
-from dotenv import load_dotenv
-from typing import List, Dict, Any
+import logging
+import time
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
+from chat_model import ChatModel
+from context_window import ContextWindowManager, estimate_tokens, message_tokens
+from model_pool import ModelClient, ModelPool, ModelTier, CachedSession, history_key, GEMINI_MODEL
+from resilience import ResilientCaller
+from rate_limit import ProviderRateLimiter
+from semantic_cache import SemanticCache
+from rag import RetrievalPrefetch
 
-# Load environment variables
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-# Configure the Gemini API
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+class GeminiModelClient(ModelClient):
+    """ModelClient backed by a google.generativeai GenerativeModel."""
+    
+    def __init__(self, name: str):
+        self.name = name
+        self.model = genai.GenerativeModel(name)
+    
+    def start_chat(self, history: List[Any]):
+        return self.model.start_chat(history=history)
+    
+    async def generate(self, prompt: str) -> str:
+        response = await self.model.generate_content_async(prompt)
+        return response.text
 
-class GeminiChatbot:
-    def __init__(self, model_name="gemini-2.0-flash"):
-        self.model = genai.GenerativeModel(model_name)
+class GeminiChatbot(ChatModel):
+    def __init__(
+        self,
+        model_name=GEMINI_MODEL,
+        context_window: Optional[ContextWindowManager] = None,
+        resilience: Optional[ResilientCaller] = None,
+        rate_limiter: Optional[ProviderRateLimiter] = None,
+        api_key: Optional[str] = None,
+        semantic_cache: Optional[SemanticCache] = None,
+        model_pool: Optional[ModelPool] = None,
+    ):
+        api_key = api_key or os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise ValueError("Gemini API Key must be set in environment variables as GEMINI_API_KEY")
+        # Configured here rather than on import so a missing key only disables chat
+        genai.configure(api_key=api_key)
+        # Model tiers with concurrency caps, and live sessions of ongoing conversations
+        self.model_pool = model_pool or ModelPool.from_env(GeminiModelClient, default_model=model_name)
+        self.context_window = context_window
+        # Generations are expensive, so they are retried but never hedged
+        self.resilience = resilience or ResilientCaller("gemini", hedge=False)
+        # The SDK is configured with a single global key, so this only paces and counts requests
+        self.rate_limiter = rate_limiter
+        # First-turn questions are answered from similar recent questions when possible
+        self.semantic_cache = semantic_cache
+    
+    async def _send(self, chat, message: str, **kwargs):
+        # Admitted once per generation, outside the timed attempts
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire()
+        return await self.resilience.call(lambda: chat.send_message_async(message, **kwargs))
     
-    async def get_response(self, message: str, conversation_history: List[Dict[str, str]]):
+    async def _prepare_history(
+        self, message: str, conversation_history: List[Dict[str, str]], reserve_tokens: int = 0
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        # Trim the history to the token budget before converting it
+        if self.context_window is not None:
+            conversation_history, metrics = await self.context_window.build(conversation_history, message, reserve_tokens)
+            logger.info("Context window built", extra={"context": metrics})
+        tokens = sum(message_tokens(msg) for msg in conversation_history)
+        return self._to_gemini_history(conversation_history), tokens
+    
+    async def summarize(self, previous: Optional[str], messages: List[Dict[str, str]], max_tokens: int) -> str:
+        """
+        Fold messages into a rolling conversation summary using the model.
+        
+        Args:
+            previous: The summary so far, if any
+            messages: Messages that slid out of the context window
+            max_tokens: Target summary length
+            
+        Returns:
+            The updated summary
+        """
+        transcript = "\n".join(f"{msg['role']}: {msg['content']}" for msg in messages)
+        prompt = (
+            f"Update the conversation summary in at most {max_tokens} tokens, keeping facts, "
+            f"decisions and open questions.\n\nCurrent summary:\n{previous or '(none)'}\n\n"
+            f"New messages:\n{transcript}"
+        )
+        return await self.model_pool.generate(prompt, estimate_tokens(prompt))
+    
+    @staticmethod
+    def _to_gemini_history(conversation_history: List[Dict[str, str]]) -> List[Dict[str, Any]]:
         # Convert conversation history to Gemini's format
         gemini_history = []
         for msg in conversation_history:
@@ -21,12 +98,104 @@ class GeminiChatbot:
                 gemini_history.append({"role": "user", "parts": [msg["content"]]})
             elif msg["role"] == "assistant":
                 gemini_history.append({"role": "model", "parts": [msg["content"]]})
+        return gemini_history
+    
+    async def _start_chat(
+        self, message: str, conversation_history: List[Dict[str, str]], retrieval: Optional[RetrievalPrefetch]
+    ) -> Tuple[Any, ModelTier, str, int]:
+        """
+        Pick the model and chat session for a turn.
         
-        # Start a chat session
-        chat = self.model.start_chat(history=gemini_history)
+        A conversation continued from the last reply reuses its live session
+        (only the new turn is added) while the prompt stays within the context
+        window budget; otherwise the history is trimmed and converted again.
         
-        # Generate a response
-        response = await chat.send_message_async(message)
+        Returns:
+            The session, the tier to generate on, the prompt to send and the
+            estimated size of the session history (without the prompt)
+        """
+        # The retrieval fetch has been running since the request arrived; the
+        # history is prepared meanwhile, with room left for the context block
+        reserve = retrieval.budget_tokens if retrieval is not None else 0
+        budget = self.context_window.token_budget if self.context_window is not None else None
+        cached = self.model_pool.sessions.take(history_key(conversation_history)) if conversation_history else None
+        if cached is not None and budget is not None and cached.tokens + estimate_tokens(message) + reserve > budget:
+            cached = None
+        if cached is not None:
+            history, tokens = cached.session.history, cached.tokens
+        else:
+            history, tokens = await self._prepare_history(message, conversation_history, reserve)
         
+        context = await retrieval.context(conversation_history) if retrieval is not None else None
+        prompt = context.prompt(message) if context is not None else message
+        tier = self.model_pool.select(tokens + estimate_tokens(prompt), preferred=cached.model if cached is not None else None)
+        if cached is not None and cached.model == tier.name:
+            return cached.session, tier, prompt, tokens
+        return tier.client.start_chat(history), tier, prompt, tokens
+    
+    def _keep_session(
+        self, chat, tier: ModelTier, message: str, prompt: str, reply: str, conversation_history: List[Dict[str, str]], tokens: int
+    ):
+        new_turn = [{"role": "user", "content": message}, {"role": "assistant", "content": reply}]
+        if prompt != message:
+            # The session recorded the retrieval-augmented prompt; keep the question as the
+            # client sent it, so the session matches what the context window would rebuild
+            history = list(chat.history)
+            chat.history = history[:-2] + [{"role": "user", "parts": [message]}, history[-1]]
+        # Stored under the conversation as the client will send it next turn
+        self.model_pool.sessions.put(
+            history_key(conversation_history + new_turn),
+            CachedSession(chat, tier.name, tokens + sum(message_tokens(msg) for msg in new_turn)),
+        )
+    
+    async def get_response(
+        self, message: str, conversation_history: List[Dict[str, str]], retrieval: Optional[RetrievalPrefetch] = None
+    ):
+        # Follow-up turns depend on the conversation, so only standalone questions are cached
+        if self.semantic_cache is not None and not conversation_history:
+            return await self.semantic_cache.get_or_fetch(
+                "gemini",
+                message,
+                lambda: self._generate(message, [], retrieval),
+                scope="rag" if retrieval is not None else None,
+            )
+        return await self._generate(message, conversation_history, retrieval)
+    
+    async def _generate(
+        self, message: str, conversation_history: List[Dict[str, str]], retrieval: Optional[RetrievalPrefetch] = None
+    ) -> str:
+        # Start (or continue) a chat session
+        chat, tier, prompt, tokens = await self._start_chat(message, conversation_history, retrieval)
+        
+        # Generate a response, holding one of the model's slots throughout
+        start = time.perf_counter()
+        await tier.slot()
+        try:
+            response = await self._send(chat, prompt)
+        finally:
+            tier.semaphore.release()
+        logger.info("Gemini response", extra={"model": tier.name, "latency_ms": round((time.perf_counter() - start) * 1000, 1)})
+        
+        self._keep_session(chat, tier, message, prompt, response.text, conversation_history, tokens)
         # Return the text response
-        return response.text
\ No newline at end of file
+        return response.text
+    
+    async def stream_response(
+        self, message: str, conversation_history: List[Dict[str, str]], retrieval: Optional[RetrievalPrefetch] = None
+    ) -> AsyncIterator[str]:
+        chat, tier, prompt, tokens = await self._start_chat(message, conversation_history, retrieval)
+        
+        # Yield text chunks as the model produces them
+        # Only the request is retried; chunks already sent cannot be replayed
+        chunks = []
+        await tier.slot()
+        try:
+            response = await self._send(chat, prompt, stream=True)
+            async for chunk in response:
+                if chunk.text:
+                    chunks.append(chunk.text)
+                    yield chunk.text
+        finally:
+            tier.semaphore.release()
+        # Only a completed stream leaves the session in a reusable state
+        self._keep_session(chat, tier, message, prompt, "".join(chunks), conversation_history, tokens)
@@ -1,87 +1,232 @@
 import os
 import json
-import aiohttp
-from dotenv import load_dotenv
-from typing import List, Dict, Any, Optional
+import asyncio
+import logging
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
+from http_pool import HTTPSessionPool
+from cache import ResponseCache, make_cache_key
+from singleflight import SingleFlight
+from resilience import ResilientCaller
+from rate_limit import ProviderRateLimiter, RateLimitExceeded
+from deadlines import DeadlineExceeded
+from tracing import stage
+from local_index import LocalIndex
+from render import Format, render, iter_message, iter_web_results, iter_web_items, web_results_header, web_results_footer
 
-# Load environment variables
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-# Google Custom Search API configuration
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-GOOGLE_CSE_ID = os.getenv("GOOGLE_CSE_ID")
+# Google Custom Search API configuration (keys are read when the client is created)
+GOOGLE_SEARCH_URL = os.getenv("GOOGLE_SEARCH_URL", "https://www.googleapis.com/customsearch/v1")
+GOOGLE_PAGE_CONCURRENCY = int(os.getenv("GOOGLE_PAGE_CONCURRENCY", "4"))
+GOOGLE_PAGE_SIZE = 10  # Google CSE API allows max 10 results per request
+GOOGLE_MAX_RESULTS = 100  # ...and at most 100 results per query across pages
 
 class GoogleSearchClient:
-    def __init__(self):
-        self.api_key = GOOGLE_API_KEY
-        self.cse_id = GOOGLE_CSE_ID
-        self.base_url = "https://www.googleapis.com/customsearch/v1"
+    def __init__(
+        self,
+        session_pool: Optional[HTTPSessionPool] = None,
+        cache: Optional[ResponseCache] = None,
+        single_flight: Optional[SingleFlight] = None,
+        resilience: Optional[ResilientCaller] = None,
+        rate_limiter: Optional[ProviderRateLimiter] = None,
+        local_index: Optional[LocalIndex] = None,
+    ):
+        self.api_key = os.getenv("GOOGLE_API_KEY")
+        self.cse_id = os.getenv("GOOGLE_CSE_ID")
+        self.base_url = GOOGLE_SEARCH_URL
+        self.session_pool = session_pool or HTTPSessionPool()
+        self.cache = cache
+        self.single_flight = single_flight or SingleFlight()
+        self.resilience = resilience or ResilientCaller("google")
+        self.rate_limiter = rate_limiter
+        self.local_index = local_index
         
-        if not self.api_key or not self.cse_id:
+        if not (self.api_key or self.rate_limiter) or not self.cse_id:
             raise ValueError("Google API Key and CSE ID must be set in environment variables")
     
+    @staticmethod
+    def _page_plan(num_results: int) -> List[Tuple[int, int]]:
+        # (start, num) for every page needed, using CSE's 1-based start index
+        total = max(1, min(num_results, GOOGLE_MAX_RESULTS))
+        return [
+            (start, min(GOOGLE_PAGE_SIZE, total - start + 1))
+            for start in range(1, total + 1, GOOGLE_PAGE_SIZE)
+        ]
+
     async def search(self, query: str, num_results: int = 5) -> Dict[str, Any]:
         """
         Perform a Google search query and return the results.
         
         Args:
             query: The search query string
-            num_results: Number of results to return (max 10)
+            num_results: Number of results to return (max 100, fetched 10 per page)
             
         Returns:
             A dictionary containing search results
         """
+        merged: Optional[Dict[str, Any]] = None
+        async for _, page in self.search_pages(query, num_results):
+            if merged is None:
+                merged = dict(page)
+                merged["items"] = list(page.get("items") or [])
+            else:
+                merged["items"].extend(page.get("items") or [])
+        return merged
+
+    async def search_pages(self, query: str, num_results: int = 5) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Fetch the result pages of a query concurrently and yield them in order.
+        
+        Every page is requested up front (bounded by GOOGLE_PAGE_CONCURRENCY),
+        so the first page can be consumed while later ones are still in flight.
+        
+        Args:
+            query: The search query string
+            num_results: Number of results to return (max 100)
+            
+        Returns:
+            An async iterator of (start index, page response) tuples
+        """
+        semaphore = asyncio.Semaphore(GOOGLE_PAGE_CONCURRENCY)
+
+        async def fetch(start: int, num: int) -> Dict[str, Any]:
+            async with semaphore:
+                return await self._search_page(query, start, num)
+
+        tasks = [asyncio.ensure_future(fetch(start, num)) for start, num in self._page_plan(num_results)]
+        try:
+            for i, task in enumerate(tasks):
+                try:
+                    page = await task
+                except (RateLimitExceeded, DeadlineExceeded):
+                    # Out of quota or time: the caller must answer 429/504, not a partial result
+                    raise
+                except Exception as e:
+                    if i == 0:
+                        raise
+                    # Later pages are best effort: keep what we already have
+                    logger.warning("Error fetching Google results page %d: %s", i + 1, e)
+                    return
+                yield i * GOOGLE_PAGE_SIZE + 1, page
+                queries = page.get("queries")
+                if not page.get("items") or (queries is not None and "nextPage" not in queries):
+                    # No further results upstream
+                    return
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _search_page(self, query: str, start: int, num: int) -> Dict[str, Any]:
+        key = make_cache_key("google", query=query, start=start, num=num)
+
+        async def fetch():
+            if self.cache is None:
+                return await self._fetch_search(query, start, num)
+            return await self.cache.get_or_fetch(
+                key,
+                lambda: self._fetch_search(query, start, num),
+                is_negative=lambda data: not data.get("items"),
+            )
+
+        # Concurrent identical searches share one upstream call
+        return await self.single_flight.do(key, fetch)
+
+    async def _fetch_search(self, query: str, start: int, num: int) -> Dict[str, Any]:
         params = {
             "key": self.api_key,
             "cx": self.cse_id,
             "q": query,
-            "num": min(num_results, 10)  # Google CSE API allows max 10 results per request
+            "num": num,
         }
+        if start > 1:
+            params["start"] = start
         
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(self.base_url, params=params) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        raise Exception(f"HTTP Error {response.status}: {error_text}")
-                    
-                    return await response.json()
-        except aiohttp.ClientError as e:
-            raise Exception(f"Request Error: {str(e)}")
+        # Admitted once per search, outside the timed attempts: a token wait must not
+        # count towards attempt latency, the hedge delay or the breaker
+        if self.rate_limiter is not None:
+            params["key"] = await self.rate_limiter.acquire()
+        
+        # Timeouts, retries, hedging and circuit breaking around the raw request
+        data = await self.resilience.call(lambda: self.session_pool.request_json("GET", self.base_url, params=params))
+        if self.local_index is not None:
+            # Queued only; the index writes in batches off the request path
+            self.local_index.add_web_results("google", query, [
+                {"title": item.get("title"), "url": item.get("link"), "display_url": item.get("displayLink"), "snippet": item.get("snippet")}
+                for item in data.get("items") or []
+            ])
+        return data
 
-    async def format_search_results(self, query: str, num_results: int = 5) -> str:
+    async def render_search_results(self, query: str, num_results: int = 5, fmt: Format = "markdown") -> str:
         """
-        Perform a search and format the results in a human-readable format.
+        Perform a search and format the results, raising upstream errors.
         
         Args:
             query: The search query string
             num_results: Number of results to return
+            fmt: Output format ("markdown", "text" or "json")
             
         Returns:
             A formatted string with search results
         """
-        try:
-            search_data = await self.search(query, num_results)
-            
-            if "items" not in search_data or not search_data["items"]:
-                return f"No results found for query: '{query}'"
-            
-            formatted_results = [f"## 🔍 Web Search Results: '{query}'\n"]
-            
-            for i, item in enumerate(search_data["items"], 1):
-                title = item.get("title", "No title")
-                link = item.get("link", "No link")
-                snippet = item.get("snippet", "No description").replace("\n", " ")
-                displayLink = item.get("displayLink", "")
-                
-                # Format with clickable links and better formatting
-                result = f"### {i}. [{title}]({link})\n"
-                result += f"📎 *{displayLink}*\n\n"
-                result += f"{snippet}\n\n"
-                
-                formatted_results.append(result)
+        search_data = await self.search(query, num_results)
+        with stage("formatting"):
+            return render(iter_web_results(query, search_data.get("items") or [], fmt))
+
+    async def format_search_results(self, query: str, num_results: int = 5, fmt: Format = "markdown") -> str:
+        """
+        Like render_search_results, but renders upstream errors as an error message.
+        
+        Args:
+            query: The search query string
+            num_results: Number of results to return
+            fmt: Output format ("markdown", "text" or "json")
             
-            return "\n".join(formatted_results)
+        Returns:
+            A formatted string with search results or the error
+        """
+        try:
+            return await self.render_search_results(query, num_results, fmt)
+        
+        except (RateLimitExceeded, DeadlineExceeded):
+            raise
+        except Exception as e:
+            return render(iter_message("error", f"Error performing search: {str(e)}", fmt))
+
+    async def stream_search_results(self, query: str, num_results: int = 5, fmt: Format = "markdown") -> AsyncIterator[str]:
+        """
+        Like format_search_results, but yields each page as soon as it arrives.
         
+        Args:
+            query: The search query string
+            num_results: Number of results to return
+            fmt: Output format ("markdown", "text" or "json")
+            
+        Returns:
+            An async iterator of formatted chunks; concatenated they equal
+            the format_search_results output
+        """
+        found = False
+        try:
+            async for start, page in self.search_pages(query, num_results):
+                items = page.get("items") or []
+                if not found and items:
+                    found = True
+                    yield web_results_header(query, fmt)
+                for chunk in iter_web_items(items, fmt, start):
+                    yield chunk
+        except (RateLimitExceeded, DeadlineExceeded):
+            raise
         except Exception as e:
-            return f"Error performing search: {str(e)}"
\ No newline at end of file
+            error = f"Error performing search: {str(e)}"
+            if found:
+                yield web_results_footer(fmt, error)
+            else:
+                yield render(iter_message("error", error, fmt))
+            return
+        
+        if found:
+            footer = web_results_footer(fmt)
+            if footer:
+                yield footer
+        else:
+            yield render(iter_message("empty", f"No results found for query: '{query}'", fmt))
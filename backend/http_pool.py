@@ -0,0 +1,134 @@
+import os
+import asyncio
+import aiohttp
+from typing import Dict, Any, Optional
+from urllib.parse import urlsplit
+
+# Connection pool configuration (overridable through environment variables)
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "20"))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30"))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+
+
+class UpstreamHTTPError(Exception):
+    """Raised when an upstream API answers with a non-200 status."""
+
+    def __init__(self, status: int, text: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(f"HTTP Error {status}: {text}")
+        self.status = status
+        self.text = text
+        self.headers = headers or {}
+
+
+class HTTPSessionPool:
+    """
+    Owns one pooled aiohttp.ClientSession per upstream host.
+
+    Sessions are created lazily inside the running event loop and reuse
+    TCP/TLS connections (keep-alive) and DNS lookups across requests.
+    """
+
+    def __init__(
+        self,
+        limit: int = HTTP_POOL_LIMIT,
+        limit_per_host: int = HTTP_POOL_LIMIT_PER_HOST,
+        keepalive_timeout: float = HTTP_KEEPALIVE_TIMEOUT,
+        ttl_dns_cache: int = HTTP_DNS_CACHE_TTL,
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.ttl_dns_cache = ttl_dns_cache
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _host_key(url: str) -> str:
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    async def get_session(self, url: str) -> aiohttp.ClientSession:
+        """
+        Return the shared session for the host of the given URL.
+
+        Args:
+            url: Any URL on the upstream host
+
+        Returns:
+            A pooled aiohttp.ClientSession
+        """
+        key = self._host_key(url)
+        session = self._sessions.get(key)
+        if session is not None and not session.closed:
+            return session
+
+        async with self._lock:
+            session = self._sessions.get(key)
+            if session is None or session.closed:
+                connector = aiohttp.TCPConnector(
+                    limit=self.limit,
+                    limit_per_host=self.limit_per_host,
+                    keepalive_timeout=self.keepalive_timeout,
+                    ttl_dns_cache=self.ttl_dns_cache,
+                )
+                session = aiohttp.ClientSession(connector=connector)
+                self._sessions[key] = session
+            return session
+
+    async def request_json(self, method: str, url: str, **kwargs) -> Dict[str, Any]:
+        """
+        Send a request through the pooled session and decode the JSON body.
+
+        Args:
+            method: HTTP method
+            url: Request URL
+            **kwargs: Passed through to aiohttp (params, headers, json, ...)
+
+        Returns:
+            The decoded JSON response
+        """
+        session = await self.get_session(url)
+        try:
+            async with session.request(method, url, **kwargs) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    raise UpstreamHTTPError(response.status, error_text, dict(response.headers))
+                return await response.json()
+        except aiohttp.ClientError as e:
+            raise Exception(f"Request Error: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return open/idle connection counts for every pooled host."""
+        stats = {}
+        for key, session in self._sessions.items():
+            connector = session.connector
+            if connector is None or session.closed:
+                continue
+            stats[key] = {
+                **self._connection_counts(connector),
+                "limit": connector.limit,
+                "limit_per_host": connector.limit_per_host,
+            }
+        return stats
+
+    @staticmethod
+    def _connection_counts(connector: aiohttp.BaseConnector) -> Dict[str, int]:
+        # aiohttp has no public API for these; leave them out if its internals change
+        try:
+            return {
+                "acquired": len(connector._acquired),
+                "idle": sum(len(conns) for conns in connector._conns.values()),
+            }
+        except (AttributeError, TypeError):
+            return {}
+
+    async def close(self):
+        """Close every pooled session."""
+        sessions = list(self._sessions.values())
+        self._sessions.clear()
+        for session in sessions:
+            if not session.closed:
+                await session.close()
+        # Give the SSL transports a moment to shut down cleanly
+        await asyncio.sleep(0.25 if sessions else 0)
@@ -0,0 +1,341 @@
+import os
+import json
+import time
+import uuid
+import heapq
+import asyncio
+import sqlite3
+from typing import Dict, Any, Optional, List, Callable, Awaitable, AsyncIterator, Tuple
+from cache import make_cache_key
+
+# Job queue configuration (overridable through environment variables)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_MAX_QUEUED = int(os.getenv("JOB_MAX_QUEUED", "1000"))
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", "3600"))
+JOB_SQLITE_PATH = os.getenv("JOB_SQLITE_PATH", os.path.join(os.getenv("DATA_DIR", "."), "jobs.db"))
+# Client-supplied priorities are clamped to this range; above 0 a client can
+# jump ahead of everyone else, so raising the ceiling needs trusted clients
+JOB_MIN_PRIORITY = int(os.getenv("JOB_MIN_PRIORITY", "-10"))
+JOB_MAX_PRIORITY = int(os.getenv("JOB_MAX_PRIORITY", "0"))
+# How often subscribers re-read jobs owned by another worker process
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+
+TERMINAL_STATES = ("done", "failed", "cancelled")
+
+
+class JobQueueFull(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+class Job:
+    """A queued or running unit of work plus the events published about it."""
+
+    def __init__(self, kind: str, payload: Dict[str, Any], client_id: str, priority: int, key: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.payload = payload
+        self.client_id = client_id
+        self.priority = priority
+        self.key = key
+        self.status = "queued"
+        self.progress: Optional[str] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.expires_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self.finished = asyncio.Event()
+        self._subscribers: List[asyncio.Queue] = []
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "jobId": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "createdAt": self.created_at,
+            "updatedAt": self.updated_at,
+            "expiresAt": self.expires_at,
+        }
+
+    def publish(self, event: str):
+        self.updated_at = time.time()
+        # One dict per subscriber: deduplicated jobs are watched by several clients
+        for queue in self._subscribers:
+            queue.put_nowait((event, self.to_dict()))
+
+
+class JobStore:
+    """
+    Job states persisted in SQLite until their TTL expires. Queries run in a worker thread.
+
+    Every state change is written, so workers sharing the database can
+    serve polls for (and deduplicate against) jobs owned by another worker.
+    """
+
+    def __init__(self, path: str = JOB_SQLITE_PATH):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, key TEXT NOT NULL, status TEXT NOT NULL, data TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key, expires_at)")
+        self._conn.commit()
+        self._lock = asyncio.Lock()
+
+    def _save(self, job: Job):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO jobs (id, key, status, data, expires_at) VALUES (?, ?, ?, ?, ?)",
+            (job.id, job.key, job.status, json.dumps(job.to_dict()), job.expires_at),
+        )
+        self._conn.execute("DELETE FROM jobs WHERE expires_at <= ?", (time.time(),))
+        self._conn.commit()
+
+    def _get(self, job_id: str):
+        return self._conn.execute(
+            "SELECT data FROM jobs WHERE id = ? AND expires_at > ?", (job_id, time.time())
+        ).fetchone()
+
+    def _find_reusable(self, key: str):
+        return self._conn.execute(
+            "SELECT data FROM jobs WHERE key = ? AND status IN ('queued', 'running', 'done') AND expires_at > ? "
+            "ORDER BY expires_at DESC LIMIT 1",
+            (key, time.time()),
+        ).fetchone()
+
+    async def save(self, job: Job):
+        async with self._lock:
+            await asyncio.to_thread(self._save, job)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        async with self._lock:
+            row = await asyncio.to_thread(self._get, job_id)
+        return json.loads(row[0]) if row else None
+
+    async def find_reusable(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a pending or successfully finished job with the same dedup key, if any."""
+        async with self._lock:
+            row = await asyncio.to_thread(self._find_reusable, key)
+        return json.loads(row[0]) if row else None
+
+    def close(self):
+        self._conn.close()
+
+
+class JobQueue:
+    """
+    Bounded worker pool for long-running requests.
+
+    Jobs are ordered by priority, then by start-time fair queuing across
+    clients: each client's next job is stamped one "round" after its last,
+    so a client submitting hundreds of jobs cannot starve one submitting a
+    single job at the same priority. Identical jobs (same kind and payload)
+    that are queued, running or finished within the TTL share one job.
+    """
+
+    def __init__(
+        self,
+        runner: Callable[[Job, Callable[[str], None]], Awaitable[Any]],
+        workers: int = JOB_WORKERS,
+        max_queued: int = JOB_MAX_QUEUED,
+        store: Optional[JobStore] = None,
+        result_ttl: float = JOB_RESULT_TTL,
+    ):
+        self.runner = runner
+        self.workers = workers
+        self.max_queued = max_queued
+        self.store = store or JobStore()
+        self.result_ttl = result_ttl
+        self._heap: List[Tuple[int, float, int, Job]] = []
+        self._seq = 0
+        self._virtual_time = 0.0
+        self._client_finish: Dict[str, float] = {}
+        self._jobs: Dict[str, Job] = {}
+        self._by_key: Dict[str, Job] = {}
+        self._ready = asyncio.Semaphore(0)
+        self._workers: List[asyncio.Task] = []
+        self.submitted = 0
+        self.deduplicated = 0
+        self.completed = 0
+        self.failed = 0
+
+    def start(self):
+        """Start the worker tasks (needs a running event loop)."""
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def close(self):
+        for worker in self._workers:
+            worker.cancel()
+        for job in list(self._jobs.values()):
+            if job.task is not None:
+                job.task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        # Do not leave pending rows behind for other workers to deduplicate against
+        for job in list(self._jobs.values()):
+            await self._finish(job, "cancelled", error="Server shut down")
+        self.store.close()
+
+    def queued(self) -> int:
+        return sum(1 for *_, job in self._heap if job.status == "queued")
+
+    async def submit(self, kind: str, payload: Dict[str, Any], client_id: str = "anonymous", priority: int = 0) -> Dict[str, Any]:
+        """
+        Queue a job, or return the identical job already queued, running or finished.
+
+        Args:
+            kind: Job type understood by the runner, e.g. "research"
+            payload: Job parameters; together with kind they form the dedup key
+            client_id: Submitting client, used for fair scheduling
+            priority: Higher values run first (clamped to JOB_MIN_PRIORITY..JOB_MAX_PRIORITY)
+
+        Returns:
+            The job state as a dict. Raises JobQueueFull when at capacity.
+        """
+        key = make_cache_key(f"job:{kind}", **payload)
+        existing = self._by_key.get(key)
+        if existing is not None:
+            self.deduplicated += 1
+            return existing.to_dict()
+        # Finished here earlier, or pending in another worker process
+        stored = await self.store.find_reusable(key)
+        if stored is not None:
+            self.deduplicated += 1
+            return stored
+        if self.queued() >= self.max_queued:
+            raise JobQueueFull(f"Job queue is full ({self.max_queued} queued)")
+
+        priority = max(JOB_MIN_PRIORITY, min(JOB_MAX_PRIORITY, priority))
+        job = Job(kind, payload, client_id, priority, key)
+        start = max(self._virtual_time, self._client_finish.get(client_id, 0.0))
+        self._client_finish[client_id] = start + 1
+        self._seq += 1
+        heapq.heappush(self._heap, (-priority, start, self._seq, job))
+        self._jobs[job.id] = job
+        self._by_key[key] = job
+        self.submitted += 1
+        job.expires_at = time.time() + self.result_ttl
+        await self.store.save(job)
+        self._ready.release()
+        return job.to_dict()
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        return await self.store.get(job_id)
+
+    async def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancel a queued or running job; finished jobs and jobs of other workers are returned unchanged."""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return await self.store.get(job_id)
+        if job.task is not None:
+            job.task.cancel()
+            await job.finished.wait()
+        else:
+            # Still in the heap: the worker skips it when popped
+            await self._finish(job, "cancelled", error="Cancelled before it started")
+        return job.to_dict()
+
+    async def subscribe(self, job_id: str) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Yield (event, job state) pairs until the job reaches a final state.
+
+        The first event is always the current state, so late subscribers
+        (including ones arriving after completion) see the result.
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            # Finished, or owned by another worker: follow the stored state
+            stored = await self.store.get(job_id)
+            while stored is not None:
+                yield stored["status"], stored
+                if stored["status"] in TERMINAL_STATES:
+                    return
+                previous = stored
+                while stored is not None and stored["updatedAt"] == previous["updatedAt"]:
+                    await asyncio.sleep(JOB_POLL_INTERVAL)
+                    stored = await self.store.get(job_id)
+            return
+
+        queue: asyncio.Queue = asyncio.Queue()
+        job._subscribers.append(queue)
+        try:
+            yield job.status, job.to_dict()
+            if job.status in TERMINAL_STATES:
+                return
+            while True:
+                event, state = await queue.get()
+                yield event, state
+                if state["status"] in TERMINAL_STATES:
+                    return
+        finally:
+            job._subscribers.remove(queue)
+
+    async def _work(self):
+        while True:
+            await self._ready.acquire()
+            _, start, _, job = heapq.heappop(self._heap)
+            if job.status != "queued":
+                continue
+            self._virtual_time = max(self._virtual_time, start)
+            if len(self._client_finish) > 10000:
+                # Clients with nothing scheduled ahead of the clock need no entry
+                self._client_finish = {c: t for c, t in self._client_finish.items() if t > self._virtual_time}
+            job.status = "running"
+            job.publish("running")
+            await self.store.save(job)
+
+            def progress(message: str, job: Job = job):
+                job.progress = message
+                job.publish("progress")
+
+            job.task = asyncio.ensure_future(self.runner(job, progress))
+            try:
+                result = await job.task
+            except asyncio.CancelledError:
+                if job.task.cancelled() and not self._is_closing():
+                    await self._finish(job, "cancelled", error="Cancelled")
+                    continue
+                raise
+            except Exception as e:
+                self.failed += 1
+                await self._finish(job, "failed", error=str(e))
+            else:
+                self.completed += 1
+                await self._finish(job, "done", result=result)
+
+    def _is_closing(self) -> bool:
+        task = asyncio.current_task()
+        return task is not None and task.cancelling() > 0
+
+    async def _finish(self, job: Job, status: str, result: Any = None, error: Optional[str] = None):
+        job.status = status
+        job.result = result
+        job.error = error
+        job.expires_at = time.time() + self.result_ttl
+        await self.store.save(job)
+        self._jobs.pop(job.id, None)
+        if self._by_key.get(job.key) is job:
+            del self._by_key[job.key]
+        job.finished.set()
+        job.publish(status)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "queued": self.queued(),
+            "running": sum(1 for job in self._jobs.values() if job.status == "running"),
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "completed": self.completed,
+            "failed": self.failed,
+            "clients": len({job.client_id for job in self._jobs.values()}),
+        }
@@ -0,0 +1,274 @@
+import os
+import re
+import time
+import asyncio
+import sqlite3
+import logging
+import threading
+from collections import deque
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+from cache import normalize_query
+from semantic_cache import STOPWORDS
+
+logger = logging.getLogger(__name__)
+
+# Local index configuration (overridable through environment variables)
+LOCAL_INDEX_ENABLED = os.getenv("LOCAL_INDEX", "1") == "1"
+LOCAL_INDEX_PATH = os.getenv("LOCAL_INDEX_PATH", os.path.join(os.getenv("DATA_DIR", "."), "local_index.db"))
+LOCAL_INDEX_BATCH_SIZE = int(os.getenv("LOCAL_INDEX_BATCH_SIZE", "500"))
+LOCAL_INDEX_FLUSH_INTERVAL = float(os.getenv("LOCAL_INDEX_FLUSH_INTERVAL", "1.0"))
+LOCAL_INDEX_MAX_PENDING = int(os.getenv("LOCAL_INDEX_MAX_PENDING", "20000"))
+# Documents older than this are stale for local-first answers (still listed by /api/search/local)
+LOCAL_INDEX_MAX_AGE = float(os.getenv("LOCAL_INDEX_MAX_AGE", "86400"))
+
+_WORD = re.compile(r"\w+")
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS documents ("
+    "id INTEGER PRIMARY KEY, key TEXT NOT NULL UNIQUE, kind TEXT NOT NULL, source TEXT NOT NULL, "
+    "query TEXT NOT NULL, title TEXT NOT NULL, url TEXT, display_url TEXT, snippet TEXT NOT NULL, "
+    "fetched_at REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS documents_fetched_at ON documents (fetched_at)",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5("
+    "title, snippet, query, content='documents', content_rowid='id', tokenize='porter unicode61')",
+    # External-content FTS tables are kept in sync by triggers
+    "CREATE TRIGGER IF NOT EXISTS documents_ai AFTER INSERT ON documents BEGIN "
+    "INSERT INTO documents_fts (rowid, title, snippet, query) VALUES (new.id, new.title, new.snippet, new.query); END",
+    "CREATE TRIGGER IF NOT EXISTS documents_ad AFTER DELETE ON documents BEGIN "
+    "INSERT INTO documents_fts (documents_fts, rowid, title, snippet, query) "
+    "VALUES ('delete', old.id, old.title, old.snippet, old.query); END",
+    "CREATE TRIGGER IF NOT EXISTS documents_au AFTER UPDATE ON documents BEGIN "
+    "INSERT INTO documents_fts (documents_fts, rowid, title, snippet, query) "
+    "VALUES ('delete', old.id, old.title, old.snippet, old.query); "
+    "INSERT INTO documents_fts (rowid, title, snippet, query) VALUES (new.id, new.title, new.snippet, new.query); END",
+)
+
+_UPSERT = (
+    "INSERT INTO documents (key, kind, source, query, title, url, display_url, snippet, fetched_at) "
+    "VALUES (:key, :kind, :source, :query, :title, :url, :display_url, :snippet, :fetched_at) "
+    "ON CONFLICT(key) DO UPDATE SET kind = excluded.kind, source = excluded.source, query = excluded.query, "
+    "title = excluded.title, url = excluded.url, display_url = excluded.display_url, "
+    "snippet = excluded.snippet, fetched_at = excluded.fetched_at"
+)
+
+# bm25 weights per column (title, snippet, query): title matches rank highest
+_SEARCH = (
+    "SELECT d.kind, d.source, d.query, d.title, d.url, d.display_url, "
+    "CASE WHEN d.kind = 'answer' THEN snippet(documents_fts, 1, '', '', '…', 48) ELSE d.snippet END, "
+    "d.fetched_at, bm25(documents_fts, 4.0, 1.0, 2.0) AS score "
+    "FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid "
+    "WHERE documents_fts MATCH ? AND d.fetched_at > ? {kind_filter}"
+    "ORDER BY score LIMIT ?"
+)
+
+_COLUMNS = ("kind", "source", "query", "title", "url", "display_url", "snippet", "fetched_at", "score")
+
+
+def match_expression(query: str) -> Optional[str]:
+    """
+    Turn free text into an FTS5 query requiring every content word.
+
+    Words are quoted so user input can never be parsed as FTS5 syntax.
+
+    Returns:
+        The MATCH expression, or None when the query has no content words
+    """
+    words = [w for w in _WORD.findall(normalize_query(query)) if w not in STOPWORDS]
+    if not words:
+        return None
+    return " ".join('"' + w.replace('"', '""') + '"' for w in dict.fromkeys(words))
+
+
+class LocalIndex:
+    """
+    SQLite FTS5 index of every search result and answer fetched upstream.
+
+    Clients hand documents to add_web_results()/add_answer(), which only
+    append to an in-memory queue; a background task writes them in batches
+    (one transaction per batch, in a worker thread) so request latency is
+    unaffected. When more than max_pending documents are waiting the oldest
+    are dropped. Results are keyed by URL (answers by source and query), so
+    re-fetching refreshes a document instead of duplicating it.
+
+    Searches use a per-thread read connection; WAL lets them run while a
+    batch is being written, also across worker processes.
+    """
+
+    def __init__(
+        self,
+        path: str = LOCAL_INDEX_PATH,
+        batch_size: int = LOCAL_INDEX_BATCH_SIZE,
+        flush_interval: float = LOCAL_INDEX_FLUSH_INTERVAL,
+        max_pending: int = LOCAL_INDEX_MAX_PENDING,
+    ):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: "deque[Dict[str, Any]]" = deque()
+        self._wakeup = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+        self._closing = False
+        self._local = threading.local()
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.last_batch_ms = 0.0
+        self._write_conn = self._connect()
+        for statement in _SCHEMA:
+            self._write_conn.execute(statement)
+        self._write_conn.commit()
+
+    @classmethod
+    def from_env(cls) -> Optional["LocalIndex"]:
+        """Build an index from the LOCAL_INDEX_* environment variables (None when disabled)."""
+        return cls() if LOCAL_INDEX_ENABLED else None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def start(self):
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._write_loop())
+
+    def _enqueue(self, document: Dict[str, Any]):
+        if len(self._pending) >= self.max_pending:
+            self._pending.popleft()
+            self.dropped += 1
+        self._pending.append(document)
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    def add_web_results(self, source: str, query: str, results: Iterable[Dict[str, Any]]):
+        """
+        Queue web results for indexing.
+
+        Args:
+            source: Provider name, e.g. "google" or "you"
+            query: The query that returned the results
+            results: Dicts with title, url and optional display_url/snippet
+        """
+        now = time.time()
+        for result in results:
+            url = result.get("url")
+            if not url:
+                continue
+            self._enqueue({
+                "key": url,
+                "kind": "web",
+                "source": source,
+                "query": query,
+                "title": result.get("title") or url,
+                "url": url,
+                "display_url": result.get("display_url") or "",
+                "snippet": (result.get("snippet") or "").replace("\n", " "),
+                "fetched_at": now,
+            })
+
+    def add_answer(self, source: str, query: str, answer: str):
+        """Queue a generated answer (e.g. You.com smart/research) for indexing."""
+        if not answer:
+            return
+        self._enqueue({
+            "key": f"{source}:{normalize_query(query)}",
+            "kind": "answer",
+            "source": source,
+            "query": query,
+            "title": query,
+            "url": None,
+            "display_url": source,
+            "snippet": answer,
+            "fetched_at": time.time(),
+        })
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        with self._write_conn:
+            self._write_conn.executemany(_UPSERT, batch)
+
+    async def flush(self):
+        """Write everything queued so far."""
+        while self._pending:
+            batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+            start = time.perf_counter()
+            try:
+                await asyncio.to_thread(self._write, batch)
+            except sqlite3.Error as e:
+                self.dropped += len(batch)
+                logger.warning("Local index batch write failed: %s", e)
+                continue
+            self.last_batch_ms = round((time.perf_counter() - start) * 1000, 2)
+            self.written += len(batch)
+            self.batches += 1
+
+    async def _write_loop(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def _search(self, expression: str, limit: int, min_fetched_at: float, kinds: Optional[Tuple[str, ...]]) -> List[Dict[str, Any]]:
+        kind_filter = f"AND d.kind IN ({', '.join('?' * len(kinds))}) " if kinds else ""
+        params = [expression, min_fetched_at, *(kinds or ()), limit]
+        rows = self._reader().execute(_SEARCH.format(kind_filter=kind_filter), params).fetchall()
+        return [dict(zip(_COLUMNS, row)) for row in rows]
+
+    async def search(
+        self,
+        query: str,
+        limit: int = 10,
+        max_age: Optional[float] = None,
+        kinds: Optional[Iterable[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Find indexed documents containing every content word of a query.
+
+        Args:
+            query: Free-text query
+            limit: Maximum number of documents
+            max_age: Ignore documents fetched more than this many seconds ago
+            kinds: Restrict to "web" and/or "answer" documents
+
+        Returns:
+            Documents ordered by BM25 relevance, each with kind, source,
+            query, title, url, display_url, snippet, fetched_at and score
+        """
+        expression = match_expression(query)
+        if expression is None:
+            return []
+        min_fetched_at = time.time() - max_age if max_age is not None else 0.0
+        return await asyncio.to_thread(self._search, expression, limit, min_fetched_at, tuple(kinds) if kinds else None)
+
+    def stats(self) -> Dict[str, Any]:
+        documents = self._reader().execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        return {
+            "path": self.path,
+            "documents": documents,
+            "pending": len(self._pending),
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "last_batch_ms": self.last_batch_ms,
+        }
+
+    async def close(self):
+        # Let the writer finish its current batch instead of cancelling it mid-write
+        self._closing = True
+        self._wakeup.set()
+        if self._writer is not None:
+            await self._writer
+            self._writer = None
+        await self.flush()
+        self._write_conn.close()
@@ -1,13 +1,111 @@
-from fastapi import FastAPI, HTTPException
+import os
+import asyncio
+from dotenv import load_dotenv
+
+# Load .env once, before the modules below read their configuration
+load_dotenv()
+
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
 from pydantic import BaseModel
-from typing import List, Optional, Literal
-from gemini import GeminiChatbot
+from typing import List, Optional, Literal, Dict, Any
+from contextlib import asynccontextmanager
+from chat_model import ChatModel, FakeChatModel
 from google_search import GoogleSearchClient
-from youcom_api import YouComClient  # Import our new You.com client
+from youcom_api import YouComClient
+from http_pool import HTTPSessionPool
+from cache import ResponseCache
+from semantic_cache import SemanticCache, SEMANTIC_CACHE_CHAT
+from local_index import LocalIndex, LOCAL_INDEX_MAX_AGE
+from model_pool import ModelPool, FakeModelClient
+from rag import RetrievalPrefetch, RAG_PROVIDERS, RAG_FETCH_TIMEOUT
+from singleflight import SingleFlight
+from streaming import stream_chat_events, format_sse, start_stream
+from conversation_store import ConversationStore, ConversationNotFound, create_conversation_store
+from context_window import ContextWindowManager
+from resilience import ResilientCaller
+from rate_limit import QuotaCounter, RateLimitExceeded, keys_from_env, limiter_from_env
+from aggregate import SearchAggregator, google_provider, youcom_provider, format_aggregate_results
+from render import Format, MEDIA_TYPES, render, iter_web_results
+from batch import BATCH_CONCURRENCY, NDJSONStreamingResponse, iter_ndjson, read_body, run_batch
+from jobs import JobQueue, JobQueueFull
+from providers import LazyProvider, ProviderUnavailable, warm_up
+from logging_setup import configure_logging
+from metrics import REGISTRY, LOCAL_INDEX_LOOKUPS, set_gauges
+from tracing import TimedRoute, MetricsMiddleware
+from deadlines import DeadlineMiddleware, DeadlineExceeded
+
+# Structured logs written off the event loop by a queue listener thread
+configure_logging()
+
+# Shared pooled HTTP transport for all upstream API clients
+http_pool = HTTPSessionPool()
+
+# Answers reused for near-duplicate queries (SEMANTIC_CACHE=0 disables it)
+semantic_cache = SemanticCache.from_env()
+
+# Coalesces identical in-flight upstream calls across concurrent requests
+single_flight = SingleFlight()
+
+# Directory for the SQLite files below (quota, jobs, local index, and the
+# response cache and conversation store when they are SQLite-backed)
+DATA_DIR = os.getenv("DATA_DIR", ".")
+
+# Stores backed by SQLite files are opened by the startup hook, so importing
+# this module creates nothing on disk:
+# - shared cache of raw upstream responses (formatted again on every read)
+response_cache: Optional[ResponseCache] = None
+# - full-text index of every fetched result and answer (LOCAL_INDEX=0 disables it)
+local_index: Optional[LocalIndex] = None
+# - server-side transcripts so clients only send the new message each turn
+conversation_store: Optional[ConversationStore] = None
+# - per-provider token buckets with persistent daily quota accounting
+quota_counter: Optional[QuotaCounter] = None
+# - bounded, fair worker pool for research requests submitted in async mode
+job_queue: Optional[JobQueue] = None
+
+def open_stores():
+    global response_cache, local_index, conversation_store, quota_counter, job_queue
+    os.makedirs(DATA_DIR, exist_ok=True)
+    response_cache = ResponseCache.from_env()
+    local_index = LocalIndex.from_env()
+    conversation_store = create_conversation_store()
+    quota_counter = QuotaCounter()
+    job_queue = JobQueue(run_job)
+
+# Initialize providers in the background at startup instead of on the first request
+PROVIDER_WARMUP = os.getenv("PROVIDER_WARMUP", "1") == "1"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    open_stores()
+    job_queue.start()
+    if local_index is not None:
+        local_index.start()
+    warmup = asyncio.create_task(warm_up(providers)) if PROVIDER_WARMUP else None
+    yield
+    if warmup is not None:
+        warmup.cancel()
+    await job_queue.close()
+    # Close pooled upstream connections on shutdown
+    await http_pool.close()
+    await response_cache.close()
+    if local_index is not None:
+        await local_index.close()
+    if semantic_cache is not None:
+        await semantic_cache.close()
+    await conversation_store.close()
+    quota_counter.close()
 
 # Initialize FastAPI app
-app = FastAPI(title="Chatbot API")
+app = FastAPI(title="Chatbot API", lifespan=lifespan)
+# Split every route's time into validation / handler / serialization stages
+app.router.route_class = TimedRoute
+
+# Per-request deadlines and cancellation on client disconnect; innermost, so
+# 504s still get CORS headers and request metrics
+app.add_middleware(DeadlineMiddleware)
 
 # Add CORS middleware
 app.add_middleware(
@@ -16,12 +114,152 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
-# Initialize the chatbot and API clients
-chatbot = GeminiChatbot()
-search_client = GoogleSearchClient()
-youcom_client = YouComClient()  # Initialize You.com client
+# Request counts, latency histograms and the Server-Timing header
+app.add_middleware(MetricsMiddleware)
+
+@app.exception_handler(ProviderUnavailable)
+async def provider_unavailable(request, exc: ProviderUnavailable):
+    return JSONResponse(status_code=503, content={"success": False, "error": str(exc)}, headers={"Retry-After": "30"})
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded(request, exc: DeadlineExceeded):
+    return JSONResponse(status_code=504, content={"success": False, "error": str(exc)})
+
+@app.exception_handler(ConversationNotFound)
+async def conversation_not_found(request, exc: ConversationNotFound):
+    # Evicted between loading the history and saving the turn; same answer as an unknown ID
+    return JSONResponse(status_code=404, content={"detail": "Conversation not found or expired"})
+
+@app.exception_handler(RateLimitExceeded)
+async def rate_limit_exceeded(request, exc: RateLimitExceeded):
+    # Same envelope as ChatResponse errors, but with a real 429 status
+    return JSONResponse(
+        status_code=429,
+        content={"success": False, "error": str(exc)},
+        headers={"Retry-After": str(max(1, int(exc.retry_after + 0.999)))},
+    )
+
+# Token-budgeted history with a rolling summary of older turns
+context_window = ContextWindowManager()
+
+# Upstream clients are built on first use (or by the startup warm-up), so a
+# missing key disables one provider instead of failing the import
+def build_chatbot() -> ChatModel:
+    # CHAT_MODEL=fake swaps in an offline token-emitting model for local testing
+    if os.getenv("CHAT_MODEL") == "fake":
+        return FakeChatModel(token_delay=float(os.getenv("FAKE_CHAT_TOKEN_DELAY", "0.01")))
+    # Imported here: the Gemini SDK accounts for most of the import time
+    from gemini import GeminiChatbot
+    model_pool = None
+    if os.getenv("CHAT_MODEL") == "fake-client":
+        # The real chatbot (sessions, tiers, concurrency caps) over offline model clients
+        latency = float(os.getenv("FAKE_MODEL_LATENCY", "0.05"))
+        model_pool = ModelPool.from_env(lambda name: FakeModelClient(name, latency))
+    chatbot = GeminiChatbot(
+        context_window=context_window,
+        resilience=ResilientCaller("gemini", hedge=False),
+        rate_limiter=limiter_from_env("gemini", [os.getenv("GEMINI_API_KEY", "")], 60, None, quota_counter),
+        # First-turn replies are only served from the semantic cache when opted in
+        semantic_cache=semantic_cache if SEMANTIC_CACHE_CHAT else None,
+        model_pool=model_pool,
+    )
+    if os.getenv("CONTEXT_SUMMARIZER") == "model":
+        context_window.summarizer = chatbot.summarize
+    return chatbot
+
+def build_search_client() -> GoogleSearchClient:
+    return GoogleSearchClient(
+        session_pool=http_pool,
+        cache=response_cache,
+        single_flight=single_flight,
+        resilience=ResilientCaller("google"),
+        rate_limiter=limiter_from_env("google", keys_from_env("GOOGLE_API_KEYS", "GOOGLE_API_KEY"), 100, None, quota_counter),
+        local_index=local_index,
+    )
+
+def build_youcom_client() -> YouComClient:
+    return YouComClient(
+        session_pool=http_pool,
+        cache=response_cache,
+        single_flight=single_flight,
+        resilience=ResilientCaller("you", total_timeout=60, attempt_timeout=45),
+        rate_limiter=limiter_from_env("you", keys_from_env("YOU_API_KEYS", "YOU_API_KEY"), 60, None, quota_counter),
+        semantic_cache=semantic_cache,
+        local_index=local_index,
+    )
+
+chatbot_provider = LazyProvider("gemini", build_chatbot)
+search_provider = LazyProvider("google", build_search_client)
+you_provider = LazyProvider("you", build_youcom_client)
+providers = {"gemini": chatbot_provider, "google": search_provider, "you": you_provider}
+
+# Concurrent fan-out over every configured search provider
+search_aggregator = SearchAggregator({
+    "google": google_provider(search_provider.get),
+    "you": youcom_provider(you_provider.get),
+})
+
+async def run_job(job, progress):
+    """Execute a queued job; research is the only long-running kind so far"""
+    if job.kind == "research":
+        youcom_client = await you_provider.get()
+        progress("Researching with the You.com Research API")
+        # Failures raise, so the job ends "failed" and is not reused for resubmissions
+        return await youcom_client.render_research_results(
+            job.payload["query"], job.payload["depth"], job.payload.get("format", "markdown")
+        )
+    raise ValueError(f"Unknown job kind: {job.kind}")
+
+
+def initialized_clients() -> Dict[str, Any]:
+    """Providers that have been built so far; stats never trigger initialization"""
+    return {name: provider.instance for name, provider in providers.items() if provider.instance is not None}
+
+def collect_stored_metrics():
+    """Copy cache, index, conversation and limiter stats into gauges; these run SQLite queries"""
+    set_gauges("response_cache", response_cache.stats())
+    if local_index is not None:
+        set_gauges("local_index", local_index.stats())
+    set_gauges("conversation_store", conversation_store.stats())
+    for client in initialized_clients().values():
+        limiter = getattr(client, "rate_limiter", None)
+        if limiter is not None:
+            limiter_stats = limiter.stats()
+            for key_id, key_stats in limiter_stats.pop("keys").items():
+                set_gauges("rate_limit_key", key_stats, {"provider": limiter.provider, "key_id": key_id})
+            set_gauges("rate_limit", limiter_stats, {"provider": limiter.provider})
+
+def collect_component_metrics():
+    """Copy in-memory pool, single-flight, job and breaker stats into gauges at scrape time"""
+    if semantic_cache is not None:
+        # Per-namespace hit and audit counts are exported as labelled counters
+        set_gauges("semantic_cache", semantic_cache.index.stats())
+    set_gauges("single_flight", single_flight.stats())
+    set_gauges("jobs", job_queue.stats())
+    for host, pool_stats in http_pool.stats().items():
+        set_gauges("http_pool", pool_stats, {"host": str(host)})
+    for name, provider in providers.items():
+        REGISTRY.gauge("provider_ready", "1 once the provider client is initialized", ("provider",)).set(
+            int(provider.instance is not None), provider=name
+        )
+    for client in initialized_clients().values():
+        model_pool = getattr(client, "model_pool", None)
+        if model_pool is not None:
+            for model, model_stats in model_pool.stats()["models"].items():
+                set_gauges("model_pool", model_stats, {"model": model})
+            set_gauges("chat_sessions", model_pool.sessions.stats())
+        resilience = getattr(client, "resilience", None)
+        if resilience is not None:
+            resilience_stats = resilience.stats()
+            set_gauges("resilience", resilience_stats, {"provider": resilience.name})
+            REGISTRY.gauge("circuit_breaker_open", "1 while the provider's circuit is open", ("provider",)).set(
+                int(resilience_stats["breaker"]["state"] == "open"), provider=resilience.name
+            )
+
+REGISTRY.add_collector(collect_component_metrics)
 
 # Define data models
 class Message(BaseModel):
@@ -31,72 +269,373 @@ class Message(BaseModel):
 class ChatRequest(BaseModel):
     message: str
     conversationHistory: Optional[List[Message]] = []
+    conversationId: Optional[str] = None
+    retrieval: Literal["off", "auto", "always"] = "off"  # inject web search context into the prompt
 
 class SearchRequest(BaseModel):
     query: str
-    num_results: Optional[int] = 5
+    num_results: Optional[int] = 5  # up to 100, fetched concurrently in pages of 10
     instructions: Optional[str] = None
+    stream: bool = False
+    format: Format = "markdown"  # markdown, text, or json (structured results for the frontend)
+    local_first: bool = False  # answer from the local index when it has enough fresh results
 
 class ResearchRequest(BaseModel):
     query: str
     depth: Optional[Literal["basic", "comprehensive"]] = "comprehensive"
+    mode: Literal["sync", "async"] = "sync"  # async returns a job ID immediately
+    priority: int = 0  # clamped server-side; by default clients can only lower it
+    format: Format = "markdown"
+
+class JobResponse(BaseModel):
+    success: bool
+    jobId: Optional[str] = None
+    kind: Optional[str] = None
+    status: Optional[str] = None
+    progress: Optional[str] = None
+    reply: Optional[str] = None
+    error: Optional[str] = None
+    createdAt: Optional[float] = None
+    updatedAt: Optional[float] = None
+    expiresAt: Optional[float] = None
+
+class AggregateSearchRequest(BaseModel):
+    query: str
+    num_results: Optional[int] = 10
+    providers: Optional[List[str]] = None
+    quorum: Optional[int] = None
+    deadline: Optional[float] = None
+    format: Format = "markdown"
+
+class BatchOperation(BaseModel):
+    op: Literal["search", "smart-search", "research", "chat"]
+    id: Optional[str] = None
+    query: Optional[str] = None
+    num_results: Optional[int] = 5
+    instructions: Optional[str] = None
+    depth: Optional[Literal["basic", "comprehensive"]] = "comprehensive"
+    message: Optional[str] = None
+    conversationHistory: Optional[List[Message]] = []
+    format: Format = "markdown"
+
+class LocalSearchRequest(BaseModel):
+    query: str
+    num_results: Optional[int] = 10
+    max_age: Optional[float] = None  # seconds; older documents are skipped
+    kinds: Optional[List[Literal["web", "answer"]]] = None
+    format: Format = "markdown"
+
+class LocalSearchResponse(BaseModel):
+    success: bool
+    reply: Optional[str] = None
+    results: Optional[List[Dict[str, Any]]] = None
+    error: Optional[str] = None
+
+class AggregateSearchResponse(BaseModel):
+    success: bool
+    reply: Optional[str] = None
+    results: Optional[List[Dict[str, Any]]] = None
+    providers: Optional[Dict[str, Dict[str, Any]]] = None
+    partial: bool = False
+    error: Optional[str] = None
 
 class ChatResponse(BaseModel):
     success: bool
     reply: Optional[str] = None
     conversationHistory: Optional[List[Message]] = None
+    conversationId: Optional[str] = None
+    sources: Optional[List[Dict[str, Any]]] = None  # web sources cited by a retrieval-augmented reply
     error: Optional[str] = None
 
+class ConversationResponse(BaseModel):
+    conversationId: str
+    conversationHistory: List[Message] = []
+
+async def load_history(request: ChatRequest) -> List[dict]:
+    """Return the prior messages of a turn, from the store when a conversationId is given"""
+    if request.conversationId is None:
+        # Convert Pydantic models to dictionaries for the chatbot service
+        return [msg.dict() for msg in request.conversationHistory]
+    
+    history = await conversation_store.get(request.conversationId)
+    if history is None:
+        raise HTTPException(status_code=404, detail="Conversation not found or expired")
+    return history
+
+@app.post("/api/conversations", response_model=ConversationResponse)
+async def create_conversation():
+    """Start a server-side conversation; chat turns then only send the new message"""
+    conversation_id = await conversation_store.create()
+    return ConversationResponse(conversationId=conversation_id)
+
+@app.get("/api/conversations/stats")
+async def conversation_stats():
+    return await asyncio.to_thread(conversation_store.stats)
+
+@app.get("/api/conversations/{conversation_id}", response_model=ConversationResponse)
+async def get_conversation(conversation_id: str):
+    history = await conversation_store.get(conversation_id)
+    if history is None:
+        raise HTTPException(status_code=404, detail="Conversation not found or expired")
+    return ConversationResponse(conversationId=conversation_id, conversationHistory=history)
+
+@app.delete("/api/conversations/{conversation_id}")
+async def delete_conversation(conversation_id: str):
+    await conversation_store.delete(conversation_id)
+    return {"success": True}
+
+def start_retrieval(request: ChatRequest) -> Optional[RetrievalPrefetch]:
+    """Start the web search for a retrieval-augmented turn before anything else runs"""
+    if request.retrieval == "off":
+        return None
+    return RetrievalPrefetch(
+        request.message,
+        lambda query, num_results: search_aggregator.search(
+            query, num_results, providers=RAG_PROVIDERS, deadline=RAG_FETCH_TIMEOUT
+        ),
+        mode=request.retrieval,
+    )
+
 @app.post("/api/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
+    # The search overlaps with loading the conversation and preparing the history
+    retrieval = start_retrieval(request)
+    try:
+        # Unknown conversations surface as 404 so the client can start a new one
+        history_dicts = await load_history(request)
+    except BaseException:
+        if retrieval is not None:
+            retrieval.cancel()
+        raise
+    
     try:
         user_message = request.message
-        conversation_history = request.conversationHistory
-        
-        # Convert Pydantic models to dictionaries for the chatbot service
-        history_dicts = [msg.dict() for msg in conversation_history]
         
         # Get response from the chatbot
-        reply = await chatbot.get_response(user_message, history_dicts)
+        chatbot = await chatbot_provider.get()
+        reply = await chatbot.get_response(user_message, history_dicts, retrieval)
+        sources = None
+        if retrieval is not None:
+            sources = retrieval.used.sources if retrieval.used is not None else []
         
-        # Update conversation history
-        updated_history = conversation_history + [
-            Message(role="user", content=user_message),
-            Message(role="assistant", content=reply)
+        new_messages = [
+            {"role": "user", "content": user_message},
+            {"role": "assistant", "content": reply}
         ]
         
+        if request.conversationId is not None:
+            # Server-side conversations only return the new turn
+            await conversation_store.append(request.conversationId, new_messages)
+            return ChatResponse(
+                success=True,
+                reply=reply,
+                conversationHistory=new_messages,
+                conversationId=request.conversationId,
+                sources=sources
+            )
+        
+        # Update conversation history
+        updated_history = history_dicts + new_messages
+        
         return ChatResponse(
             success=True,
             reply=reply,
-            conversationHistory=updated_history
+            conversationHistory=updated_history,
+            sources=sources
         )
         
+    except (RateLimitExceeded, DeadlineExceeded, ConversationNotFound):
+        raise
     except Exception as e:
         return ChatResponse(
             success=False,
             error=str(e)
         )
+    finally:
+        # A cached reply or a failure leaves the speculative search unused
+        if retrieval is not None:
+            retrieval.cancel()
+
+@app.post("/api/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Stream the reply as server-sent events, ending with the updated history"""
+    retrieval = start_retrieval(request)
+    try:
+        history_dicts = await load_history(request)
+        chatbot = await chatbot_provider.get()
+    except BaseException:
+        # The event stream never starts, so nothing else would cancel the search
+        if retrieval is not None:
+            retrieval.cancel()
+        raise
+    on_complete = None
+    
+    if request.conversationId is not None:
+        async def on_complete(new_messages):
+            # Server-side conversations only return the new turn
+            await conversation_store.append(request.conversationId, new_messages)
+            return new_messages
+    
+    return StreamingResponse(
+        stream_chat_events(chatbot, request.message, history_dicts, on_complete=on_complete, retrieval=retrieval),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def local_items(documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Shape local index documents like CSE items so they render as web results"""
+    return [
+        {"title": d["title"], "link": d["url"] or "#", "displayLink": d["display_url"] or d["source"], "snippet": d["snippet"]}
+        for d in documents
+    ]
+
+async def search_local_first(request: SearchRequest) -> Optional[List[Dict[str, Any]]]:
+    """Fresh local web results for a query, or None when there are fewer than requested"""
+    if local_index is None:
+        return None
+    documents = await local_index.search(request.query, request.num_results, max_age=LOCAL_INDEX_MAX_AGE, kinds=["web"])
+    enough = len(documents) >= request.num_results
+    LOCAL_INDEX_LOOKUPS.inc(mode="local_first", outcome="hit" if enough else "miss")
+    return documents if enough else None
 
 @app.post("/api/search", response_model=ChatResponse)
-async def search(request: SearchRequest):
+async def search(request: SearchRequest, response: Response):
+    documents = await search_local_first(request) if request.local_first else None
+    source = {"X-Search-Source": "local" if documents is not None else "upstream"}
+    if request.stream:
+        if documents is not None:
+            return StreamingResponse(
+                iter_web_results(request.query, local_items(documents), request.format),
+                media_type=MEDIA_TYPES[request.format],
+                headers=source,
+            )
+        search_client = await search_provider.get()
+        # Emit the first page of results while later pages are still loading; the
+        # first page is awaited here so rate limits and deadlines still get 429/504
+        chunks = await start_stream(search_client.stream_search_results(request.query, request.num_results, request.format))
+        return StreamingResponse(
+            chunks,
+            media_type=MEDIA_TYPES[request.format],
+            headers=source,
+        )
+    response.headers.update(source)
+    if documents is not None:
+        return ChatResponse(success=True, reply=render(iter_web_results(request.query, local_items(documents), request.format)))
+    
     try:
         query = request.query
         num_results = request.num_results
         
         # Perform search and format results
-        search_results = await search_client.format_search_results(query, num_results)
+        search_client = await search_provider.get()
+        search_results = await search_client.format_search_results(query, num_results, request.format)
         
         return ChatResponse(
             success=True,
             reply=search_results
         )
         
+    except (RateLimitExceeded, DeadlineExceeded):
+        raise
     except Exception as e:
         return ChatResponse(
             success=False,
             error=str(e)
         )
 
+@app.post("/api/search/local", response_model=LocalSearchResponse)
+async def search_local(request: LocalSearchRequest):
+    """Search previously fetched results and answers without calling any upstream API"""
+    if local_index is None:
+        raise HTTPException(status_code=404, detail="Local index is disabled")
+    documents = await local_index.search(request.query, request.num_results, max_age=request.max_age, kinds=request.kinds)
+    LOCAL_INDEX_LOOKUPS.inc(mode="local", outcome="hit" if documents else "miss")
+    return LocalSearchResponse(
+        success=True,
+        reply=render(iter_web_results(request.query, local_items(documents), request.format)),
+        results=documents,
+    )
+
+async def execute_batch_operation(raw: Dict[str, Any]) -> str:
+    """Run one /api/batch item through the same clients (and caches) as the single endpoints"""
+    # The render_* variants raise, so upstream failures get the "error" status instead of "ok"
+    operation = BatchOperation.parse_obj(raw)
+    if operation.op == "chat":
+        if not operation.message:
+            raise ValueError("chat operations require a message")
+        history = [msg.dict() for msg in operation.conversationHistory or []]
+        chatbot = await chatbot_provider.get()
+        return await chatbot.get_response(operation.message, history)
+    if not operation.query:
+        raise ValueError(f"{operation.op} operations require a query")
+    if operation.op == "search":
+        search_client = await search_provider.get()
+        return await search_client.render_search_results(operation.query, operation.num_results, operation.format)
+    youcom_client = await you_provider.get()
+    if operation.op == "smart-search":
+        return await youcom_client.render_smart_results(operation.query, operation.instructions, operation.format)
+    return await youcom_client.render_research_results(operation.query, operation.depth, operation.format)
+
+@app.post("/api/batch")
+async def batch(request: Request, concurrency: int = Query(BATCH_CONCURRENCY, ge=1)):
+    """
+    Run many search/smart-search/research/chat operations in one request.
+
+    The body is either {"operations": [...]} JSON or NDJSON (one operation per
+    line, Content-Type application/x-ndjson), which is read incrementally.
+    Results stream back as NDJSON in completion order, one line per item with
+    its index, id and status, followed by a summary line.
+    """
+    body_read = asyncio.Event()
+    if "ndjson" in request.headers.get("content-type", ""):
+        operations = iter_ndjson(read_body(request.stream(), body_read))
+    else:
+        body_read.set()
+        try:
+            body = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Request body must be JSON (or NDJSON with an application/x-ndjson content type)")
+        operations = body.get("operations", []) if isinstance(body, dict) else body
+        if not isinstance(operations, list):
+            raise HTTPException(status_code=422, detail="operations must be a list")
+        concurrency = body.get("concurrency", concurrency) if isinstance(body, dict) else concurrency
+        if isinstance(concurrency, bool) or not isinstance(concurrency, int) or concurrency < 1:
+            raise HTTPException(status_code=422, detail="concurrency must be a positive integer")
+
+    return NDJSONStreamingResponse(
+        run_batch(operations, execute_batch_operation, concurrency),
+        body_read,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/api/search/aggregate", response_model=AggregateSearchResponse)
+async def search_aggregate(request: AggregateSearchRequest):
+    try:
+        # Query all providers concurrently and merge with reciprocal rank fusion
+        data = await search_aggregator.search(
+            request.query,
+            request.num_results,
+            providers=request.providers,
+            quorum=request.quorum,
+            deadline=request.deadline,
+        )
+        
+        return AggregateSearchResponse(
+            success=bool(data["results"]) or not data["partial"],
+            reply=format_aggregate_results(data, request.format),
+            results=data["results"],
+            providers=data["providers"],
+            partial=data["partial"],
+        )
+        
+    except (RateLimitExceeded, DeadlineExceeded):
+        raise
+    except Exception as e:
+        return AggregateSearchResponse(
+            success=False,
+            error=str(e)
+        )
+
 # You.com Smart Search API endpoint
 @app.post("/api/you/smart-search", response_model=ChatResponse)
 async def you_smart_search(request: SearchRequest):
@@ -105,13 +644,16 @@ async def you_smart_search(request: SearchRequest):
         instructions = request.instructions
         
         # Perform You.com smart search and format results
-        search_results = await youcom_client.format_smart_results(query, instructions)
+        youcom_client = await you_provider.get()
+        search_results = await youcom_client.format_smart_results(query, instructions, request.format)
         
         return ChatResponse(
             success=True,
             reply=search_results
         )
         
+    except (RateLimitExceeded, DeadlineExceeded):
+        raise
     except Exception as e:
         return ChatResponse(
             success=False,
@@ -119,26 +661,87 @@ async def you_smart_search(request: SearchRequest):
         )
 
 # You.com Research API endpoint
+def job_response(state: Dict[str, Any]) -> JobResponse:
+    # States can be shared (e.g. one published snapshot per subscriber), so never mutate them
+    fields = {name: value for name, value in state.items() if name != "result"}
+    return JobResponse(success=state["status"] != "failed", reply=state.get("result"), **fields)
+
 @app.post("/api/you/research", response_model=ChatResponse)
-async def you_research(request: ResearchRequest):
+async def you_research(request: ResearchRequest, http_request: Request):
+    if request.mode == "async":
+        # Queue the research and answer straight away; poll or subscribe for the result
+        client_id = http_request.headers.get("x-client-id") or (http_request.client.host if http_request.client else "anonymous")
+        try:
+            state = await job_queue.submit(
+                "research",
+                {"query": request.query, "depth": request.depth, "format": request.format},
+                client_id,
+                request.priority,
+            )
+        except JobQueueFull as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+        return JSONResponse(
+            status_code=202,
+            content=job_response(state).dict(),
+            headers={"Location": f"/api/jobs/{state['jobId']}"},
+        )
+
     try:
         query = request.query
         depth = request.depth
         
         # Perform You.com research and format results
-        research_results = await youcom_client.format_research_results(query, depth)
+        youcom_client = await you_provider.get()
+        research_results = await youcom_client.format_research_results(query, depth, request.format)
         
         return ChatResponse(
             success=True,
             reply=research_results
         )
         
+    except (RateLimitExceeded, DeadlineExceeded):
+        raise
     except Exception as e:
         return ChatResponse(
             success=False,
             error=str(e)
         )
 
+@app.get("/api/jobs/stats")
+async def job_stats():
+    """Queue depth, worker usage and dedup counters of the job queue"""
+    return job_queue.stats()
+
+@app.get("/api/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    state = await job_queue.get(job_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job_response(state)
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Stream job state changes as server-sent events until the job finishes"""
+    if await job_queue.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+
+    async def events():
+        async for event, state in job_queue.subscribe(job_id):
+            yield format_sse(event, job_response(state).dict())
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.delete("/api/jobs/{job_id}", response_model=JobResponse)
+async def cancel_job(job_id: str):
+    state = await job_queue.cancel(job_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job_response(state)
+
 @app.get("/test-you-api")
 async def test_you_api():
     """Test the You.com API connection directly"""
@@ -150,6 +753,11 @@ async def test_you_api():
         "research_api_result": ""
     }
     
+    try:
+        youcom_client = await you_provider.get()
+    except ProviderUnavailable as e:
+        return {**results, "success": False, "smart_api_status": f"Error: {e}", "research_api_status": f"Error: {e}"}
+    
     # Test Smart API
     try:
         search_result = await youcom_client.smart_search("latest technology news")
@@ -188,10 +796,83 @@ async def test_you_api():
     
     return results
 
+@app.get("/api/chat/context/stats")
+async def context_stats():
+    """Prompt-size savings and rolling-summary cache counters"""
+    return context_window.stats()
+
+@app.get("/api/chat/models/stats")
+async def model_pool_stats():
+    """Routing, concurrency and queueing per model tier, and chat session cache counters"""
+    model_pool = getattr(chatbot_provider.instance, "model_pool", None)
+    if model_pool is None:
+        return {"enabled": False}
+    return model_pool.stats()
+
+@app.get("/api/resilience/stats")
+async def resilience_stats():
+    """Retry, hedging and circuit breaker state per upstream provider"""
+    return {
+        name: client.resilience.stats()
+        for name, client in initialized_clients().items()
+        if getattr(client, "resilience", None) is not None
+    }
+
+@app.get("/api/rate-limits/stats")
+async def rate_limit_stats():
+    """Admission, queueing and daily quota usage per provider and key"""
+    limiters = {
+        name: client.rate_limiter
+        for name, client in initialized_clients().items()
+        if getattr(client, "rate_limiter", None) is not None
+    }
+    # Quota counts and shared buckets are read from SQLite
+    return await asyncio.to_thread(lambda: {name: limiter.stats() for name, limiter in limiters.items()})
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """Hit/miss/eviction counters for the upstream response cache"""
+    return await asyncio.to_thread(response_cache.stats)
+
+@app.get("/api/search/local/stats")
+async def local_index_stats():
+    """Document count and batched-write counters of the local full-text index"""
+    if local_index is None:
+        return {"enabled": False}
+    return {"enabled": True, **await asyncio.to_thread(local_index.stats)}
+
+@app.get("/api/cache/semantic/stats")
+async def semantic_cache_stats():
+    """Hit rates, false-hit audits per similarity band and index size of the semantic cache"""
+    if semantic_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **semantic_cache.stats()}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition of request, upstream and component metrics"""
+    # COUNT(*) queries run in a worker thread; the in-memory collectors stay on the loop
+    await asyncio.to_thread(collect_stored_metrics)
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/health/live")
+async def health_live():
+    """Liveness: the process is up and serving requests"""
+    return {"status": "ok"}
+
+@app.get("/health/ready")
+async def health_ready():
+    """Readiness: 200 once every provider required by HEALTH_REQUIRED_PROVIDERS has initialized"""
+    required = [name for name in os.getenv("HEALTH_REQUIRED_PROVIDERS", ",".join(providers)).split(",") if name]
+    statuses = await warm_up({name: providers[name] for name in required if name in providers})
+    ready = all(status["state"] == "ready" for status in statuses.values())
+    body = {"status": "ready" if ready else "unavailable", "providers": {name: p.status() for name, p in providers.items()}}
+    return JSONResponse(status_code=200 if ready else 503, content=body)
+
 @app.get("/")
 async def root():
     return {"message": "Chatbot API is running"}
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
+    from serve import main as serve
+    serve()
\ No newline at end of file
@@ -0,0 +1,226 @@
+import bisect
+import threading
+from typing import Dict, Any, List, Tuple, Callable, Iterable, Optional
+
+# Latency buckets in seconds, from cache hits up to slow research calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing value per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, or be set at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in sorted(self._values.items())]
+
+
+class Histogram(_Metric):
+    """Cumulative bucketed observations with sum and count per label set."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            state[index] += 1
+            state[-1] += value
+
+    def count(self, **labels) -> float:
+        state = self._values.get(self._key(labels))
+        return sum(state[:-1]) if state else 0.0
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, state in sorted(self._values.items()):
+            cumulative = 0.0
+            for bound, observed in zip(self.buckets + (float("inf"),), state[:-1]):
+                cumulative += observed
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = _format_labels(self.labelnames, key, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {state[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """
+    Collection of metrics rendered in the Prometheus text exposition format.
+
+    Collectors are callbacks run at scrape time, used to copy stats that live
+    elsewhere (cache, connection pool, breakers) into gauges.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._metrics.get(name) or self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._metrics.get(name) or self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._metrics.get(name) or self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], None]):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            collector()
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# API endpoint metrics
+HTTP_REQUESTS = REGISTRY.counter("http_requests_total", "HTTP requests handled", ("method", "route", "status"))
+HTTP_ERRORS = REGISTRY.counter("http_request_errors_total", "HTTP requests answered with an error", ("method", "route"))
+HTTP_LATENCY = REGISTRY.histogram("http_request_duration_seconds", "HTTP request latency", ("method", "route"))
+HTTP_IN_FLIGHT = REGISTRY.gauge("http_requests_in_flight", "HTTP requests currently being handled", ("route",))
+STAGE_LATENCY = REGISTRY.histogram("http_request_stage_duration_seconds", "Time spent per request stage", ("route", "stage"))
+
+# Upstream provider metrics
+UPSTREAM_REQUESTS = REGISTRY.counter("upstream_requests_total", "Upstream attempts by outcome", ("provider", "outcome"))
+UPSTREAM_LATENCY = REGISTRY.histogram("upstream_request_duration_seconds", "Upstream attempt latency", ("provider",))
+UPSTREAM_IN_FLIGHT = REGISTRY.gauge("upstream_requests_in_flight", "Upstream attempts currently in flight", ("provider",))
+
+# Semantic cache metrics (similarity of the best match feeds threshold tuning)
+SEMANTIC_CACHE_LOOKUPS = REGISTRY.counter("semantic_cache_lookups_total", "Semantic cache lookups by outcome", ("namespace", "outcome"))
+SEMANTIC_CACHE_SIMILARITY = REGISTRY.histogram(
+    "semantic_cache_best_similarity",
+    "Cosine similarity of the closest cached query",
+    ("namespace", "outcome"),
+    buckets=(0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.925, 0.95, 0.975, 0.99, 1.0),
+)
+SEMANTIC_CACHE_AUDITS = REGISTRY.counter("semantic_cache_audits_total", "Audited semantic hits by result", ("namespace", "result"))
+
+# Local full-text index lookups (mode is "local" or "local_first"; a local_first miss goes upstream)
+LOCAL_INDEX_LOOKUPS = REGISTRY.counter("local_index_lookups_total", "Local index lookups by outcome", ("mode", "outcome"))
+
+# Retrieval-augmented chat: what happened to each prefetch, and how long the turn waited for it
+RAG_PREFETCH = REGISTRY.counter("rag_prefetch_total", "Chat retrieval prefetches by outcome", ("outcome",))
+RAG_CONTEXT_WAIT = REGISTRY.histogram("rag_context_wait_seconds", "Time a chat turn waited for retrieval after its history was ready")
+
+# Model pool: which tier served each generation (and why), and time spent waiting for a slot
+MODEL_ROUTED = REGISTRY.counter("model_routed_total", "Generations routed per model tier", ("model", "reason"))
+MODEL_QUEUE_WAIT = REGISTRY.histogram("model_queue_wait_seconds", "Time a generation waited for a model slot", ("model",))
+
+# Request deadlines: handlers cancelled (client disconnect or deadline), upstream time spent on
+# cancelled attempts, and optional work (fallbacks, retries) skipped for lack of budget
+REQUEST_CANCELLATIONS = REGISTRY.counter("request_cancellations_total", "Requests whose work was cancelled", ("route", "reason"))
+UPSTREAM_WASTED = REGISTRY.counter(
+    "upstream_wasted_seconds_total", "Upstream time spent on attempts that were cancelled", ("provider", "reason")
+)
+DEADLINE_SKIPS = REGISTRY.counter("deadline_skips_total", "Optional upstream work skipped for lack of request budget", ("operation",))
+
+
+def set_gauges(prefix: str, stats: Dict[str, Any], labels: Optional[Dict[str, str]] = None):
+    """
+    Copy numeric values of a (nested) stats dict into gauges.
+
+    Args:
+        prefix: Metric name prefix, e.g. "response_cache"
+        stats: Stats dictionary as returned by the components' stats() methods
+        labels: Labels applied to every gauge
+    """
+    labels = labels or {}
+    for name, value in stats.items():
+        metric_name = f"{prefix}_{name}"
+        if isinstance(value, dict):
+            set_gauges(metric_name, value, labels)
+        elif isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        else:
+            gauge = REGISTRY.gauge(metric_name, f"{prefix} {name}", tuple(labels))
+            gauge.set(value, **labels)
@@ -0,0 +1,363 @@
+import os
+import time
+import asyncio
+import hashlib
+import logging
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from typing import Dict, Any, List, Optional, Callable
+from metrics import MODEL_QUEUE_WAIT, MODEL_ROUTED
+
+logger = logging.getLogger(__name__)
+
+# Model pool configuration (overridable through environment variables)
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+# Comma-separated "name[:max_prompt_tokens[:concurrency]]", cheapest first, e.g.
+# "gemini-2.0-flash-lite:1500:32,gemini-2.0-flash"; empty means GEMINI_MODEL only
+GEMINI_MODEL_TIERS = os.getenv("GEMINI_MODEL_TIERS", "")
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "16"))
+GEMINI_SESSION_CACHE_SIZE = int(os.getenv("GEMINI_SESSION_CACHE_SIZE", "1000"))
+GEMINI_SESSION_TTL = float(os.getenv("GEMINI_SESSION_TTL", "1800"))
+
+
+def history_key(messages: List[Dict[str, str]]) -> str:
+    """Identify a conversation by the exact sequence of its messages."""
+    digest = hashlib.sha1()
+    for msg in messages:
+        digest.update(msg["role"].encode("utf-8") + b"\0" + msg["content"].encode("utf-8") + b"\0")
+    return digest.hexdigest()
+
+
+class ModelClient(ABC):
+    """
+    Interface for a generative model backend.
+
+    Chat sessions follow the Gemini SDK's ChatSession: they expose a history
+    list and send_message_async(message, stream=False), which returns a
+    response with a text attribute (or, when streaming, an async iterator
+    of such chunks) and appends the exchange to the history.
+    """
+
+    name: str
+
+    @abstractmethod
+    def start_chat(self, history: List[Any]) -> Any:
+        """Start a chat session seeded with history in the model's format."""
+
+    @abstractmethod
+    async def generate(self, prompt: str) -> str:
+        """Generate a single reply without a session."""
+
+
+class _FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+    def __aiter__(self):
+        return self._chunks()
+
+    async def _chunks(self):
+        for i, word in enumerate(self.text.split(" ")):
+            yield _FakeResponse(word if i == 0 else " " + word)
+
+
+class _FakeChatSession:
+    def __init__(self, client: "FakeModelClient", history: List[Any]):
+        self.client = client
+        self.history = list(history)
+
+    async def send_message_async(self, message: str, stream: bool = False):
+        text = await self.client.generate(message)
+        self.history += [{"role": "user", "parts": [message]}, {"role": "model", "parts": [text]}]
+        return _FakeResponse(text)
+
+
+class FakeModelClient(ModelClient):
+    """
+    Offline model client for benchmarks and local testing.
+
+    Every call takes latency seconds. With a capacity, calls beyond that many
+    in flight slow down proportionally, like an overloaded upstream.
+    """
+
+    def __init__(self, name: str = "fake", latency: float = 0.05, capacity: Optional[int] = None):
+        self.name = name
+        self.latency = latency
+        self.capacity = capacity
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.calls = 0
+
+    def start_chat(self, history: List[Any]) -> _FakeChatSession:
+        return _FakeChatSession(self, history)
+
+    async def generate(self, prompt: str) -> str:
+        self.in_flight += 1
+        self.calls += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            # Overloaded calls share the capacity, re-evaluated every 10ms
+            remaining = self.latency
+            while remaining > 0:
+                slowdown = max(1.0, self.in_flight / self.capacity) if self.capacity else 1.0
+                step = min(remaining * slowdown, 0.01)
+                await asyncio.sleep(step)
+                remaining -= step / slowdown
+        finally:
+            self.in_flight -= 1
+        return f"{self.name} reply to: {prompt[-80:]}"
+
+
+class FairSemaphore:
+    """
+    Semaphore that admits waiters strictly in arrival order.
+
+    A released slot is handed directly to the oldest waiter, so a steady
+    stream of new arrivals can never overtake requests already queued.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self._waiters: "deque[asyncio.Future]" = deque()
+        self.acquired = 0
+        self.queued = 0
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for waiter in self._waiters if not waiter.done())
+
+    @property
+    def saturated(self) -> bool:
+        return self.in_flight >= self.limit
+
+    async def acquire(self):
+        self.acquired += 1
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return
+        self.queued += 1
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the waiter was cancelled
+                self.release()
+            raise
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # in_flight is unchanged: the slot passes to the waiter
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "acquired": self.acquired,
+            "queued": self.queued,
+        }
+
+
+class ModelTier:
+    """One model with its prompt-size ceiling and concurrency cap."""
+
+    def __init__(self, client: ModelClient, max_prompt_tokens: int = 0, concurrency: int = GEMINI_MAX_CONCURRENCY):
+        self.name = client.name
+        self.client = client
+        # 0 means any prompt size
+        self.max_prompt_tokens = max_prompt_tokens
+        self.semaphore = FairSemaphore(concurrency)
+        self.routed = 0
+        self.overflowed = 0
+
+    def fits(self, prompt_tokens: int) -> bool:
+        return not self.max_prompt_tokens or prompt_tokens <= self.max_prompt_tokens
+
+    async def slot(self):
+        """Wait for a generation slot, recording the queueing time."""
+        start = time.perf_counter()
+        await self.semaphore.acquire()
+        MODEL_QUEUE_WAIT.observe(time.perf_counter() - start, model=self.name)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_prompt_tokens": self.max_prompt_tokens,
+            "routed": self.routed,
+            "overflowed": self.overflowed,
+            **self.semaphore.stats(),
+        }
+
+
+class CachedSession:
+    """A live chat session and the size of the prompt it carries."""
+
+    def __init__(self, session: Any, model: str, tokens: int):
+        self.session = session
+        self.model = model
+        self.tokens = tokens
+
+
+class SessionCache:
+    """
+    LRU cache of live chat sessions keyed by conversation content.
+
+    The key is history_key() of the conversation the session has seen, so
+    a continued conversation (client-side or stored) finds its session
+    again, while an edited or branched one simply misses. take() removes
+    the entry: a session serves one turn at a time and is stored again
+    under its new key once the turn succeeds.
+    """
+
+    def __init__(self, max_sessions: int = GEMINI_SESSION_CACHE_SIZE, ttl: float = GEMINI_SESSION_TTL):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def take(self, key: str) -> Optional[CachedSession]:
+        entry = self._sessions.pop(key, None)
+        if entry is None:
+            self.misses += 1
+            return None
+        cached, expires_at = entry
+        if expires_at <= time.monotonic():
+            self.expired += 1
+            self.misses += 1
+            return None
+        self.hits += 1
+        return cached
+
+    def put(self, key: str, cached: CachedSession):
+        if self.max_sessions <= 0:
+            return
+        self._sessions[key] = (cached, time.monotonic() + self.ttl)
+        self._sessions.move_to_end(key)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "sessions": len(self._sessions),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "expired": self.expired,
+            "evictions": self.evictions,
+        }
+
+
+def parse_tiers(spec: str, default_model: str) -> List[tuple]:
+    """
+    Parse a GEMINI_MODEL_TIERS value into (name, max_prompt_tokens, concurrency).
+
+    The last tier always accepts any prompt size, so every request has a model.
+    """
+    tiers = []
+    for part in (p.strip() for p in spec.split(",")):
+        if not part:
+            continue
+        name, *limits = part.split(":")
+        max_prompt_tokens = int(limits[0]) if limits and limits[0] else 0
+        concurrency = int(limits[1]) if len(limits) > 1 and limits[1] else GEMINI_MAX_CONCURRENCY
+        tiers.append((name.strip(), max_prompt_tokens, concurrency))
+    if not tiers:
+        tiers.append((default_model, 0, GEMINI_MAX_CONCURRENCY))
+    name, _, concurrency = tiers[-1]
+    tiers[-1] = (name, 0, concurrency)
+    return tiers
+
+
+class ModelPool:
+    """
+    Model tiers with concurrency caps, plus the live chat session cache.
+
+    select() routes a prompt to the cheapest tier whose prompt-size ceiling
+    it fits. When that tier has no free slot, the prompt overflows to the
+    next larger tier that has one; when all are busy it queues (in arrival
+    order) on the fitting tier with the shortest queue per slot.
+    """
+
+    def __init__(self, tiers: List[ModelTier], sessions: Optional[SessionCache] = None):
+        if not tiers:
+            raise ValueError("ModelPool needs at least one model tier")
+        self.tiers = tiers
+        self.sessions = sessions or SessionCache()
+
+    @classmethod
+    def from_env(cls, client_factory: Callable[[str], ModelClient], default_model: str = GEMINI_MODEL) -> "ModelPool":
+        """
+        Build a pool from the GEMINI_* environment variables.
+
+        Args:
+            client_factory: Creates the client for a model name
+            default_model: Model used when GEMINI_MODEL_TIERS is empty
+        """
+        tiers = [
+            ModelTier(client_factory(name), max_prompt_tokens, concurrency)
+            for name, max_prompt_tokens, concurrency in parse_tiers(GEMINI_MODEL_TIERS, default_model)
+        ]
+        return cls(tiers)
+
+    def select(self, prompt_tokens: int, preferred: Optional[str] = None) -> ModelTier:
+        """
+        Choose the tier for a prompt.
+
+        Args:
+            prompt_tokens: Estimated size of the full prompt
+            preferred: Model of a cached session; kept while it fits and has room
+
+        Returns:
+            The tier to generate on
+        """
+        fitting = [tier for tier in self.tiers if tier.fits(prompt_tokens)]
+        for tier in fitting:
+            if tier.name == preferred and not tier.semaphore.saturated:
+                tier.routed += 1
+                MODEL_ROUTED.inc(model=tier.name, reason="session")
+                return tier
+        for i, tier in enumerate(fitting):
+            if not tier.semaphore.saturated:
+                tier.routed += 1
+                if i:
+                    tier.overflowed += 1
+                MODEL_ROUTED.inc(model=tier.name, reason="overflow" if i else "size")
+                return tier
+        tier = min(fitting, key=lambda t: (t.semaphore.waiting + 1) / t.semaphore.limit)
+        tier.routed += 1
+        MODEL_ROUTED.inc(model=tier.name, reason="queued")
+        return tier
+
+    async def generate(self, prompt: str, prompt_tokens: int) -> str:
+        """Single-shot generation (e.g. summaries) under the same routing and caps."""
+        tier = self.select(prompt_tokens)
+        await tier.slot()
+        try:
+            return await tier.client.generate(prompt)
+        finally:
+            tier.semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "models": {tier.name: tier.stats() for tier in self.tiers},
+            "sessions": self.sessions.stats(),
+        }
@@ -0,0 +1,97 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, Any, Callable, Generic, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+# Seconds before a failed provider initialization is attempted again
+PROVIDER_RETRY_INTERVAL = float(os.getenv("PROVIDER_RETRY_INTERVAL", "30"))
+
+T = TypeVar("T")
+
+
+class ProviderUnavailable(Exception):
+    """Raised when a provider could not be initialized (e.g. a missing API key)."""
+
+    def __init__(self, name: str, error: str):
+        super().__init__(f"{name} is unavailable: {error}")
+        self.name = name
+        self.error = error
+
+
+class LazyProvider(Generic[T]):
+    """
+    Builds an upstream client on first use instead of at import time.
+
+    The factory runs in a worker thread (SDK imports and configuration can
+    take hundreds of milliseconds) and at most once at a time. A failed
+    initialization is remembered and only retried after retry_interval, so
+    a missing key fails fast instead of on every request. status() feeds the
+    readiness endpoint.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], T], retry_interval: float = PROVIDER_RETRY_INTERVAL):
+        self.name = name
+        self.factory = factory
+        self.retry_interval = retry_interval
+        self._instance: Optional[T] = None
+        self._error: Optional[str] = None
+        self._failed_at = 0.0
+        self._init_ms: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def instance(self) -> Optional[T]:
+        """The client if it has been initialized, without initializing it."""
+        return self._instance
+
+    async def get(self) -> T:
+        """
+        Return the client, initializing it on first use.
+
+        Returns:
+            The initialized client. Raises ProviderUnavailable when the
+            factory failed (now or within the last retry_interval).
+        """
+        if self._instance is not None:
+            return self._instance
+        async with self._lock:
+            if self._instance is not None:
+                return self._instance
+            if self._error is not None and time.monotonic() - self._failed_at < self.retry_interval:
+                raise ProviderUnavailable(self.name, self._error)
+            start = time.perf_counter()
+            try:
+                instance = await asyncio.to_thread(self.factory)
+            except Exception as e:
+                self._error = str(e) or type(e).__name__
+                self._failed_at = time.monotonic()
+                logger.error("Provider %s failed to initialize: %s", self.name, self._error)
+                raise ProviderUnavailable(self.name, self._error) from e
+            self._init_ms = round((time.perf_counter() - start) * 1000, 1)
+            self._instance = instance
+            self._error = None
+            logger.info("Provider %s initialized", self.name, extra={"init_ms": self._init_ms})
+            return instance
+
+    def status(self) -> Dict[str, Any]:
+        if self._instance is not None:
+            return {"state": "ready", "init_ms": self._init_ms}
+        if self._error is not None:
+            return {"state": "error", "error": self._error}
+        return {"state": "uninitialized"}
+
+
+async def warm_up(providers: Dict[str, LazyProvider]) -> Dict[str, Dict[str, Any]]:
+    """Initialize every provider concurrently and return their status."""
+
+    async def init(provider: LazyProvider):
+        try:
+            await provider.get()
+        except ProviderUnavailable:
+            pass
+
+    await asyncio.gather(*(init(provider) for provider in providers.values()))
+    return {name: provider.status() for name, provider in providers.items()}
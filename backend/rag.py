@@ -0,0 +1,224 @@
+import os
+import re
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional, Tuple, Callable, Awaitable
+from context_window import estimate_tokens
+from metrics import RAG_PREFETCH, RAG_CONTEXT_WAIT
+
+logger = logging.getLogger(__name__)
+
+# Retrieval-augmented chat configuration (overridable through environment variables)
+RAG_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", "800"))
+RAG_SEARCH_RESULTS = int(os.getenv("RAG_SEARCH_RESULTS", "6"))
+RAG_FETCH_TIMEOUT = float(os.getenv("RAG_FETCH_TIMEOUT", "4"))
+RAG_PROVIDERS = [p.strip() for p in os.getenv("RAG_PROVIDERS", "google,you").split(",") if p.strip()]
+# Fetching starts speculatively at RAG_SPECULATE_SCORE; context is used at RAG_USE_SCORE
+RAG_SPECULATE_SCORE = float(os.getenv("RAG_SPECULATE_SCORE", "0.3"))
+RAG_USE_SCORE = float(os.getenv("RAG_USE_SCORE", "0.5"))
+
+# (pattern, weight) cues for "this needs fresh web context"
+_CUES: List[Tuple[re.Pattern, float]] = [
+    (re.compile(r"\b(latest|newest|recent(ly)?|today'?s?|tonight|yesterday|this (week|month|year)|current(ly)?|right now|upcoming)\b"), 0.5),
+    (re.compile(r"\b(news|headlines?|price|prices|stock|weather|forecast|score|scores|results?|release[sd]?|election|launch(ed)?)\b"), 0.3),
+    (re.compile(r"\b(20[2-3]\d)\b"), 0.3),
+    (re.compile(r"\b(search|look up|google|find (me )?(info|information|sources)|sources?|cite|according to|link)\b"), 0.6),
+    (re.compile(r"^(who|what|when|where|which|how (much|many))\b.*\b(is|are|was|were|did|does|won|costs?)\b"), 0.2),
+]
+# Requests the model can answer from the conversation or its own knowledge
+_NEGATIVE_CUES: List[Tuple[re.Pattern, float]] = [
+    (re.compile(r"```|\b(def|class|function|traceback|exception|compile|regex|sql|bug|refactor)\b"), 0.5),
+    (re.compile(r"^(write|rewrite|rephrase|translate|summari[sz]e|shorten|make it|fix|explain (this|that|it)|continue)\b"), 0.5),
+    (re.compile(r"\b(poem|story|joke|essay|haiku|lyrics)\b"), 0.4),
+    (re.compile(r"^[\d\s+\-*/().^=x]+\??$"), 0.6),
+]
+_FOLLOW_UP = re.compile(r"^(and|what about|how about|also|more on|why)\b|\b(it|that|this|they|them|those)\b")
+
+
+def classify(message: str, history: Optional[List[Dict[str, str]]] = None) -> float:
+    """
+    Score how much a chat message needs fresh web context (0 to 1).
+
+    A cheap keyword classifier: freshness and lookup cues raise the score,
+    coding, rewriting and creative requests lower it. Short follow-ups
+    ("and in Paris?") inherit most of the previous user message's score.
+
+    Args:
+        message: The new user message
+        history: Previous messages; only used for follow-ups
+
+    Returns:
+        The score
+    """
+    text = message.strip().lower()
+    score = sum(weight for pattern, weight in _CUES if pattern.search(text))
+    score -= sum(weight for pattern, weight in _NEGATIVE_CUES if pattern.search(text))
+    previous = previous_question(message, history)
+    if previous:
+        score = max(score, 0.8 * classify(previous))
+    return max(0.0, min(1.0, score))
+
+
+def previous_question(message: str, history: Optional[List[Dict[str, str]]]) -> Optional[str]:
+    """The last user message when the new message is a short follow-up to it, else None."""
+    text = message.strip().lower()
+    if not history or len(text.split()) > 6 or not _FOLLOW_UP.search(text):
+        return None
+    return next((m["content"] for m in reversed(history) if m["role"] == "user"), None)
+
+
+def search_query(message: str, history: Optional[List[Dict[str, str]]] = None, max_words: int = 24) -> str:
+    """
+    Build the search query for a message.
+
+    Greetings and filler are dropped. A follow-up ("and in Paris?") is
+    searched together with the question it follows up on.
+    """
+    previous = previous_question(message, history)
+    if previous:
+        message = f"{previous} {message}"
+    text = re.sub(r"^(hi|hey|hello|please|can you|could you|tell me|i want to know)\b[\s,]*", "", message.strip(), flags=re.I)
+    return " ".join(text.split()[:max_words]) or message
+
+
+class RetrievalContext:
+    """Sources selected for a turn and the prompt block built from them."""
+
+    def __init__(self, sources: List[Dict[str, Any]], block: str):
+        self.sources = sources
+        self.block = block
+
+    def prompt(self, message: str) -> str:
+        return f"{self.block}\n\nUser question: {message}"
+
+
+def build_context(results: List[Dict[str, Any]], budget_tokens: int) -> Optional[RetrievalContext]:
+    """
+    Pack search results into a numbered context block within a token budget.
+
+    Results are taken in rank order. The snippet of the first result that no
+    longer fits is cut to the remaining budget, and later results are dropped.
+    """
+    header = "Web search results retrieved for this question (cite them as [n] when you use them):"
+    lines = [header]
+    used = estimate_tokens(header)
+    sources = []
+    for result in results:
+        n = len(sources) + 1
+        prefix = f"[{n}] {result.get('title', '')} ({result['url']}): "
+        snippet = " ".join((result.get("snippet") or "").split())
+        cost = estimate_tokens(prefix + snippet)
+        if used + cost > budget_tokens:
+            room = budget_tokens - used - estimate_tokens(prefix)
+            if room < 20:
+                break
+            # About four characters per token for the truncated tail
+            snippet = snippet[: room * 4].rsplit(" ", 1)[0] + "…"
+            cost = estimate_tokens(prefix + snippet)
+        lines.append(prefix + snippet)
+        used += cost
+        sources.append({"n": n, "title": result.get("title", ""), "url": result["url"]})
+        if used >= budget_tokens:
+            break
+    if not sources:
+        return None
+    return RetrievalContext(sources, "\n".join(lines))
+
+
+class RetrievalPrefetch:
+    """
+    Speculative web retrieval for one chat turn.
+
+    Created as soon as the request arrives: when the message alone scores at
+    least speculate_score (or mode is "always") the search fan-out starts
+    immediately, so it overlaps with loading the conversation and preparing
+    the history. context() makes the final decision with the history known,
+    then either cancels the fetch or waits for it (bounded by timeout) and
+    packs the results into the token budget. Follow-ups only recognized
+    from the history are fetched at that point, searching the previous
+    question together with the follow-up. cancel() is safe to call at
+    any point and is a no-op once the fetch finished.
+    """
+
+    def __init__(
+        self,
+        message: str,
+        search: Callable[[str, int], Awaitable[Dict[str, Any]]],
+        mode: str = "auto",
+        budget_tokens: int = RAG_CONTEXT_TOKENS,
+        num_results: int = RAG_SEARCH_RESULTS,
+        timeout: float = RAG_FETCH_TIMEOUT,
+        speculate_score: float = RAG_SPECULATE_SCORE,
+        use_score: float = RAG_USE_SCORE,
+    ):
+        self.message = message
+        self.search = search
+        self.num_results = num_results
+        self.mode = mode
+        self.budget_tokens = budget_tokens
+        self.timeout = timeout
+        self.use_score = use_score
+        self.score = classify(message)
+        self.outcome: Optional[str] = None
+        # The context injected into the prompt, once context() returned one
+        self.used: Optional[RetrievalContext] = None
+        self.task: Optional[asyncio.Task] = None
+        self.query: Optional[str] = None
+        if mode == "always" or self.score >= speculate_score:
+            self._start(search_query(message))
+
+    def _start(self, query: str):
+        self.query = query
+        self.task = asyncio.create_task(self.search(query, self.num_results))
+
+    def cancel(self, outcome: str = "cancelled"):
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+            self._record(outcome)
+        elif self.outcome is None:
+            self._record("skipped" if self.task is None else outcome)
+
+    def _record(self, outcome: str):
+        if self.outcome is None:
+            self.outcome = outcome
+            RAG_PREFETCH.inc(outcome=outcome)
+
+    async def context(self, history: Optional[List[Dict[str, str]]] = None) -> Optional[RetrievalContext]:
+        """
+        Decide whether to use web context and return it.
+
+        Args:
+            history: Previous messages, for follow-up detection
+
+        Returns:
+            The context to inject, or None (fetch cancelled, failed or empty)
+        """
+        needed = self.mode == "always" or classify(self.message, history) >= self.use_score
+        if not needed:
+            self.cancel("not_needed")
+            return None
+        query = search_query(self.message, history)
+        if self.task is None or query != self.query:
+            # A follow-up: only the history shows what it is about, so the
+            # speculative search (if any) used the wrong query
+            if self.task is not None:
+                self.task.cancel()
+            self._start(query)
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        done, _ = await asyncio.wait({self.task}, timeout=self.timeout)
+        RAG_CONTEXT_WAIT.observe(loop.time() - start)
+        if not done:
+            self.cancel("timeout")
+            return None
+        try:
+            data = self.task.result()
+        except Exception as e:
+            logger.warning("Retrieval for chat failed: %s", e)
+            self._record("error")
+            return None
+        context = build_context(data.get("results") or [], self.budget_tokens)
+        self._record("used" if context else "empty")
+        self.used = context
+        return context
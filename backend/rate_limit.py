@@ -0,0 +1,371 @@
+import os
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional
+
+# Rate limiter configuration (overridable through environment variables)
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "5"))
+QUOTA_SQLITE_PATH = os.getenv("QUOTA_SQLITE_PATH", os.path.join(os.getenv("DATA_DIR", "."), "quota.db"))
+# Keep token buckets in the quota database so every worker process draws from the same budget
+RATE_LIMIT_SHARED = os.getenv("RATE_LIMIT_SHARED", "0") == "1"
+# How long a worker trusts its cached copy of the shared daily counters
+QUOTA_CACHE_TTL = float(os.getenv("QUOTA_CACHE_TTL", "1"))
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a request cannot be admitted within the allowed wait."""
+
+    def __init__(self, provider: str, retry_after: float, reason: str = "rate limit"):
+        super().__init__(f"{provider} {reason} exceeded; retry in {retry_after:.1f}s")
+        self.provider = provider
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class TokenBucket:
+    """
+    Async token bucket refilled continuously at `rate` tokens per second.
+
+    Waiters are served in arrival order; a caller that would have to wait
+    longer than max_wait is rejected straight away with the expected delay.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self) -> float:
+        self._refill()
+        return self.tokens
+
+    def wait_time(self, tokens: float = 1.0) -> float:
+        """Seconds until `tokens` would be available, ignoring queued waiters."""
+        self._refill()
+        return max(0.0, (tokens - self.tokens) / self.rate)
+
+    async def acquire(self, tokens: float = 1.0, max_wait: Optional[float] = None) -> float:
+        """
+        Take tokens, sleeping until they are available.
+
+        Args:
+            tokens: Number of tokens to take
+            max_wait: Longest acceptable wait in seconds (None waits forever)
+
+        Returns:
+            The number of seconds waited. Raises RateLimitExceeded when the
+            wait would exceed max_wait.
+        """
+        async with self._lock:
+            self._refill()
+            # Reserve the tokens now (possibly going negative) so later
+            # callers queue behind this one
+            wait = max(0.0, (tokens - self.tokens) / self.rate)
+            if max_wait is not None and wait > max_wait:
+                raise RateLimitExceeded("bucket", wait)
+            self.tokens -= tokens
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                # Hand the reservation back to the callers queued behind us
+                self.tokens += tokens
+                raise
+        return wait
+
+
+class SharedTokenBucket:
+    """
+    TokenBucket whose state lives in the QuotaCounter database.
+
+    Used in multi-worker deployments so N processes do not each admit the
+    full per-minute rate. Reservations are single SQLite transactions run
+    in a worker thread; the waiting happens in the event loop as usual.
+    """
+
+    def __init__(self, store: "QuotaCounter", provider: str, key_id: str, rate: float, capacity: float):
+        self.store = store
+        self.provider = provider
+        self.key_id = key_id
+        self.rate = rate
+        self.capacity = capacity
+
+    def available(self) -> float:
+        return self.store.peek_tokens(self.provider, self.key_id, self.rate, self.capacity)
+
+    def wait_time(self, tokens: float = 1.0) -> float:
+        return max(0.0, (tokens - self.available()) / self.rate)
+
+    async def acquire(self, tokens: float = 1.0, max_wait: Optional[float] = None) -> float:
+        wait = await asyncio.to_thread(self.store.take_tokens, self.provider, self.key_id, self.rate, self.capacity, tokens, max_wait)
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                # Hand the reservation back to the callers queued behind us, without
+                # blocking the loop (or awaiting, since this task is being cancelled)
+                asyncio.get_running_loop().run_in_executor(
+                    None, self.store.take_tokens, self.provider, self.key_id, self.rate, self.capacity, -tokens, None
+                )
+                raise
+        return wait
+
+
+class QuotaCounter:
+    """Persistent per-key daily usage counters (UTC days) stored in SQLite."""
+
+    def __init__(self, path: str = QUOTA_SQLITE_PATH):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS daily_quota ("
+            "provider TEXT NOT NULL, key_id TEXT NOT NULL, day TEXT NOT NULL, used INTEGER NOT NULL, "
+            "PRIMARY KEY (provider, key_id, day))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS token_buckets ("
+            "provider TEXT NOT NULL, key_id TEXT NOT NULL, tokens REAL NOT NULL, updated REAL NOT NULL, "
+            "PRIMARY KEY (provider, key_id))"
+        )
+        self._cache: Dict[tuple, tuple] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def today() -> str:
+        return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+    @staticmethod
+    def seconds_until_reset() -> float:
+        now = datetime.now(timezone.utc)
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0).timestamp() + 86400
+        return midnight - now.timestamp()
+
+    def cached(self, provider: str, key_id: str) -> Optional[int]:
+        """Today's count if read within QUOTA_CACHE_TTL, else None (no database access)."""
+        cached = self._cache.get((provider, key_id, self.today()))
+        # Other worker processes may have counted requests since we last looked
+        if cached is None or time.monotonic() - cached[1] > QUOTA_CACHE_TTL:
+            return None
+        return cached[0]
+
+    def used(self, provider: str, key_id: str) -> int:
+        used = self.cached(provider, key_id)
+        if used is None:
+            day = self.today()
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT used FROM daily_quota WHERE provider = ? AND key_id = ? AND day = ?",
+                    (provider, key_id, day),
+                ).fetchone()
+            used = row[0] if row else 0
+            self._cache[(provider, key_id, day)] = (used, time.monotonic())
+        return used
+
+    def increment(self, provider: str, key_id: str, amount: int = 1) -> int:
+        day = self.today()
+        with self._lock:
+            row = self._conn.execute(
+                "INSERT INTO daily_quota (provider, key_id, day, used) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (provider, key_id, day) DO UPDATE SET used = used + excluded.used "
+                "RETURNING used",
+                (provider, key_id, day, amount),
+            ).fetchone()
+        self._cache[(provider, key_id, day)] = (row[0], time.monotonic())
+        return row[0]
+
+    def take_tokens(self, provider: str, key_id: str, rate: float, capacity: float, tokens: float, max_wait: Optional[float]) -> float:
+        """
+        Atomically reserve tokens from a bucket shared by all processes using this database.
+
+        Args:
+            provider: Provider name
+            key_id: Hashed key identifier
+            rate: Refill rate in tokens per second
+            capacity: Bucket size
+            tokens: Number of tokens to take (negative to hand tokens back)
+            max_wait: Longest acceptable wait in seconds (None waits forever)
+
+        Returns:
+            Seconds the caller must wait before using the tokens. Raises
+            RateLimitExceeded (without reserving) when that exceeds max_wait.
+        """
+        now = time.time()
+        with self._lock:
+            # IMMEDIATE takes the write lock up front so concurrent workers serialize here
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT tokens, updated FROM token_buckets WHERE provider = ? AND key_id = ?", (provider, key_id)
+                ).fetchone()
+                available = capacity if row is None else min(capacity, row[0] + max(0.0, now - row[1]) * rate)
+                wait = max(0.0, (tokens - available) / rate)
+                if max_wait is not None and wait > max_wait:
+                    raise RateLimitExceeded("bucket", wait)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO token_buckets (provider, key_id, tokens, updated) VALUES (?, ?, ?, ?)",
+                    (provider, key_id, min(capacity, available - tokens), now),
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return wait
+
+    def peek_tokens(self, provider: str, key_id: str, rate: float, capacity: float) -> float:
+        """Tokens currently available in a shared bucket (may be negative while callers queue)."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT tokens, updated FROM token_buckets WHERE provider = ? AND key_id = ?", (provider, key_id)
+            ).fetchone()
+        if row is None:
+            return capacity
+        return min(capacity, row[0] + max(0.0, time.time() - row[1]) * rate)
+
+    def close(self):
+        self._conn.close()
+
+
+class _KeyState:
+    def __init__(self, key: str, per_minute: float, burst: float, per_day: Optional[int], shared_store: Optional[QuotaCounter] = None, provider: str = ""):
+        self.key = key
+        # Never store the raw key in counters or stats
+        self.key_id = hashlib.sha256(key.encode("utf-8")).hexdigest()[:12]
+        if shared_store is not None:
+            self.bucket = SharedTokenBucket(shared_store, provider, self.key_id, per_minute / 60.0, burst)
+        else:
+            self.bucket = TokenBucket(per_minute / 60.0, burst)
+        self.per_day = per_day
+
+
+class ProviderRateLimiter:
+    """
+    Token-bucket limiter and daily quota accounting for one upstream provider.
+
+    Each API key gets its own bucket and daily quota; acquire() picks the key
+    that can serve the request soonest, spreading load across keys.
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        keys: List[str],
+        per_minute: float,
+        per_day: Optional[int] = None,
+        burst: Optional[float] = None,
+        max_wait: float = RATE_LIMIT_MAX_WAIT,
+        quota: Optional[QuotaCounter] = None,
+        shared: bool = RATE_LIMIT_SHARED,
+    ):
+        if not keys:
+            raise ValueError(f"At least one API key is required for {provider}")
+        self.provider = provider
+        self.max_wait = max_wait
+        self.quota = quota
+        self.shared = shared and quota is not None
+        burst = burst if burst is not None else max(1.0, per_minute / 6)
+        shared_store = quota if shared else None
+        self._keys = [_KeyState(key, per_minute, burst, per_day, shared_store, provider) for key in keys]
+        self.admitted = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+
+    def _under_quota(self, state: _KeyState) -> bool:
+        return state.per_day is None or self.quota is None or self.quota.used(self.provider, state.key_id) < state.per_day
+
+    def _pick(self) -> Optional[_KeyState]:
+        """The key under quota that can serve soonest (None when all are out of quota)."""
+        candidates = [state for state in self._keys if self._under_quota(state)]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda s: s.bucket.wait_time())
+
+    def _pick_needs_database(self) -> bool:
+        if self.shared:
+            return True
+        return self.quota is not None and any(
+            state.per_day is not None and self.quota.cached(self.provider, state.key_id) is None for state in self._keys
+        )
+
+    async def acquire(self) -> str:
+        """
+        Wait for capacity and return the API key to use for one request.
+
+        Raises RateLimitExceeded when every key is out of daily quota or the
+        queueing delay would exceed max_wait. Quota and shared bucket reads
+        and the quota increment run in a worker thread, off the event loop.
+        """
+        if self._pick_needs_database():
+            state = await asyncio.to_thread(self._pick)
+        else:
+            state = self._pick()
+        if state is None:
+            self.rejected += 1
+            raise RateLimitExceeded(self.provider, self.quota.seconds_until_reset(), "daily quota")
+
+        try:
+            waited = await state.bucket.acquire(max_wait=self.max_wait)
+        except RateLimitExceeded as e:
+            self.rejected += 1
+            raise RateLimitExceeded(self.provider, e.retry_after)
+
+        self.admitted += 1
+        self.total_wait += waited
+        if self.quota is not None:
+            await asyncio.to_thread(self.quota.increment, self.provider, state.key_id)
+        return state.key
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.total_wait / self.admitted * 1000, 1) if self.admitted else 0.0,
+            "keys": {
+                state.key_id: {
+                    "tokens": round(state.bucket.available(), 2),
+                    "used_today": self.quota.used(self.provider, state.key_id) if self.quota else None,
+                    "per_day": state.per_day,
+                }
+                for state in self._keys
+            },
+        }
+
+
+def keys_from_env(plural: str, singular: str) -> List[str]:
+    """Read a comma-separated key list, falling back to the single-key variable."""
+    raw = os.getenv(plural) or os.getenv(singular) or ""
+    return [key.strip() for key in raw.split(",") if key.strip()]
+
+
+def limiter_from_env(provider: str, keys: List[str], per_minute: float, per_day: Optional[int], quota: QuotaCounter) -> ProviderRateLimiter:
+    """
+    Build a limiter using <PROVIDER>_RATE_PER_MINUTE / _QUOTA_PER_DAY overrides.
+
+    Args:
+        provider: Provider name, e.g. "google"
+        keys: API keys to balance across
+        per_minute: Default requests per minute per key
+        per_day: Default daily quota per key (None for unlimited)
+        quota: Shared persistent quota counter
+
+    Returns:
+        A configured ProviderRateLimiter
+    """
+    prefix = provider.upper()
+    per_minute = float(os.getenv(f"{prefix}_RATE_PER_MINUTE", per_minute))
+    per_day_env = os.getenv(f"{prefix}_QUOTA_PER_DAY")
+    if per_day_env is not None:
+        per_day = int(per_day_env) or None
+    return ProviderRateLimiter(provider, keys, per_minute, per_day, quota=quota)
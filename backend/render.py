@@ -0,0 +1,249 @@
+import json
+from typing import List, Dict, Any, Iterable, Iterator, Literal, Optional
+
+# Output formats understood by every renderer
+Format = Literal["markdown", "text", "json"]
+FORMATS = ("markdown", "text", "json")
+
+MEDIA_TYPES = {
+    "markdown": "text/markdown; charset=utf-8",
+    "text": "text/plain; charset=utf-8",
+    "json": "application/json",
+}
+
+# Templates are f-strings compiled once at import (several times faster than
+# str.format with keywords); each renders one whole item so a result list is
+# a single join over one chunk per item.
+_WEB_HEADER = {
+    "markdown": lambda query: f"## 🔍 Web Search Results: '{query}'\n\n",
+    "text": lambda query: f"Web Search Results: '{query}'\n\n",
+}
+_WEB_ITEM = {
+    "markdown": lambda sep, rank, title, link, display, snippet: f"{sep}### {rank}. [{title}]({link})\n📎 *{display}*\n\n{snippet}\n\n",
+    "text": lambda sep, rank, title, link, display, snippet: f"{sep}{rank}. {title}\n   {link}\n   {snippet}\n\n",
+}
+_ANSWER_HEADER = {
+    "markdown": lambda icon, title, query: f"## {icon} {title}: '{query}'\n\n",
+    "text": lambda icon, title, query: f"{title}: '{query}'\n\n",
+}
+_SOURCES_HEADER = {"markdown": "\n\n### Sources:\n", "text": "\n\nSources:\n"}
+_SOURCE = {
+    "markdown": lambda rank, name, url, snippet: f"{rank}. [{name}]({url})\n   {snippet}\n\n" if snippet else f"{rank}. [{name}]({url})\n",
+    "text": lambda rank, name, url, snippet: f"{rank}. {name} - {url}\n   {snippet}\n\n" if snippet else f"{rank}. {name} - {url}\n",
+}
+_COMBINED_HEADER = {
+    "markdown": lambda query: f"## 🔍 Combined Search Results: '{query}'\n",
+    "text": lambda query: f"Combined Search Results: '{query}'\n",
+}
+_COMBINED_ITEM = {
+    "markdown": lambda rank, title, url, providers, snippet: f"\n### {rank}. [{title}]({url})\n📎 *{providers}*\n" + (f"\n{snippet}\n" if snippet else ""),
+    "text": lambda rank, title, url, providers, snippet: f"\n{rank}. {title}\n   {url}\n   via {providers}\n" + (f"\n{snippet}\n" if snippet else ""),
+}
+
+# Answer kinds: (icon, title) of the heading
+ANSWER_KINDS = {
+    "smart": ("🔍", "Search Results"),
+    "research": ("🔬", "Deep Research"),
+    "research-fallback": ("🔬", "Deep Research (Smart API Fallback)"),
+}
+
+
+def _check(fmt: str):
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown output format: {fmt}")
+
+
+def _json_open(head: Dict[str, Any], key: str) -> str:
+    """Opening chunk of {**head, key: [...]}; items follow comma-separated, then "]}"."""
+    return json.dumps(head)[:-1] + f', "{key}": ['
+
+
+def render(chunks: Iterable[str]) -> str:
+    """Join rendered chunks into one string (a single copy, unlike repeated +=)."""
+    return "".join(chunks)
+
+
+def iter_message(kind: str, message: str, fmt: Format = "markdown") -> Iterator[str]:
+    """
+    Render a status message such as "no results" or an error.
+
+    Args:
+        kind: Message type reported in JSON output, e.g. "empty" or "error"
+        message: Human-readable message
+        fmt: Output format
+
+    Returns:
+        An iterator of output chunks
+    """
+    _check(fmt)
+    if fmt == "json":
+        yield json.dumps({"type": kind, "message": message})
+    else:
+        yield message
+
+
+def web_results_header(query: str, fmt: Format = "markdown") -> str:
+    """Opening chunk of a web results document (heading, or the JSON envelope)."""
+    _check(fmt)
+    if fmt == "json":
+        return _json_open({"type": "web_results", "query": query}, "results")
+    return _WEB_HEADER[fmt](query)
+
+
+def web_results_footer(fmt: Format = "markdown", error: Optional[str] = None) -> str:
+    """
+    Closing chunk of a web results document.
+
+    Args:
+        fmt: Output format
+        error: Error that interrupted a streamed document after some results
+
+    Returns:
+        The chunk to emit last (may be empty)
+    """
+    _check(fmt)
+    if fmt == "json":
+        return "]" + (f', "error": {json.dumps(error)}' if error else "") + "}"
+    return error or ""
+
+
+def iter_web_items(items: Iterable[Dict[str, Any]], fmt: Format = "markdown", start: int = 1) -> Iterator[str]:
+    """
+    Render Google Custom Search items without header or footer.
+
+    The separator is derived from the rank, so pages rendered separately
+    (start > 1) concatenate to the same output as all items rendered at once.
+
+    Args:
+        items: CSE result items
+        fmt: Output format
+        start: Rank of the first item
+
+    Returns:
+        An iterator of output chunks, one per item
+    """
+    _check(fmt)
+    if fmt == "json":
+        for rank, item in enumerate(items, start):
+            result = json.dumps({
+                "rank": rank,
+                "title": item.get("title", "No title"),
+                "url": item.get("link", "No link"),
+                "displayUrl": item.get("displayLink", ""),
+                "snippet": item.get("snippet", "No description").replace("\n", " "),
+            })
+            yield result if rank == 1 else ", " + result
+        return
+
+    template = _WEB_ITEM[fmt]
+    for rank, item in enumerate(items, start):
+        yield template(
+            "" if rank == 1 else "\n",
+            rank,
+            item.get("title", "No title"),
+            item.get("link", "No link"),
+            item.get("displayLink", ""),
+            item.get("snippet", "No description").replace("\n", " "),
+        )
+
+
+def iter_web_results(query: str, items: List[Dict[str, Any]], fmt: Format = "markdown") -> Iterator[str]:
+    """
+    Render a complete Google Custom Search result list.
+
+    Args:
+        query: The search query, shown in the heading
+        items: CSE result items
+        fmt: Output format
+
+    Returns:
+        An iterator of output chunks
+    """
+    if not items:
+        yield from iter_message("empty", f"No results found for query: '{query}'", fmt)
+        return
+    yield web_results_header(query, fmt)
+    yield from iter_web_items(items, fmt)
+    footer = web_results_footer(fmt)
+    if footer:
+        yield footer
+
+
+def iter_answer(kind: str, query: str, data: Dict[str, Any], fmt: Format = "markdown") -> Iterator[str]:
+    """
+    Render a You.com answer with its sources.
+
+    Args:
+        kind: One of ANSWER_KINDS ("smart", "research", "research-fallback")
+        query: The query, shown in the heading
+        data: You.com response with "answer" and optional "search_results"
+        fmt: Output format
+
+    Returns:
+        An iterator of output chunks
+    """
+    _check(fmt)
+    answer = data.get("answer")
+    if not answer:
+        label = "No results found" if kind == "smart" else "No research results found"
+        yield from iter_message("empty", f"{label} for query: '{query}'", fmt)
+        return
+
+    sources = data.get("search_results") or []
+    if fmt == "json":
+        yield _json_open({"type": "answer", "kind": kind, "query": query, "answer": answer}, "sources")
+        for rank, source in enumerate(sources, 1):
+            result = json.dumps({
+                "rank": rank,
+                "name": source.get("name", "No title"),
+                "url": source.get("url", "#"),
+                "snippet": source.get("snippet", ""),
+            })
+            yield result if rank == 1 else ", " + result
+        yield "]}"
+        return
+
+    icon, title = ANSWER_KINDS[kind]
+    yield _ANSWER_HEADER[fmt](icon, title, query)
+    yield answer
+    if sources:
+        yield _SOURCES_HEADER[fmt]
+        template = _SOURCE[fmt]
+        for rank, source in enumerate(sources, 1):
+            yield template(rank, source.get("name", "No title"), source.get("url", "#"), source.get("snippet", ""))
+
+
+def iter_combined_results(data: Dict[str, Any], fmt: Format = "markdown") -> Iterator[str]:
+    """
+    Render merged multi-provider results (see aggregate.SearchAggregator).
+
+    Args:
+        data: Aggregator output with "query" and ranked "results"
+        fmt: Output format
+
+    Returns:
+        An iterator of output chunks
+    """
+    _check(fmt)
+    query = data["query"]
+    if not data["results"]:
+        yield from iter_message("empty", f"No results found for query: '{query}'", fmt)
+        return
+    if fmt == "json":
+        yield _json_open({"type": "combined_results", "query": query}, "results")
+        for rank, result in enumerate(data["results"], 1):
+            item = json.dumps({
+                "rank": rank,
+                "title": result["title"],
+                "url": result["url"],
+                "snippet": result.get("snippet", ""),
+                "providers": result["providers"],
+            })
+            yield item if rank == 1 else ", " + item
+        yield "]}"
+        return
+
+    yield _COMBINED_HEADER[fmt](query)
+    template = _COMBINED_ITEM[fmt]
+    for rank, result in enumerate(data["results"], 1):
+        yield template(rank, result["title"], result["url"], ", ".join(result["providers"]), result.get("snippet"))
@@ -0,0 +1,328 @@
+import os
+import time
+import random
+import asyncio
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional, Callable, Awaitable
+from http_pool import UpstreamHTTPError
+from metrics import UPSTREAM_REQUESTS, UPSTREAM_LATENCY, UPSTREAM_IN_FLIGHT, UPSTREAM_WASTED
+from deadlines import DeadlineExceeded, current_deadline, time_left, cancel_reason
+from tracing import stage
+
+# Resilience defaults (overridable through environment variables)
+RESILIENCE_TOTAL_TIMEOUT = float(os.getenv("RESILIENCE_TOTAL_TIMEOUT", "30"))
+RESILIENCE_ATTEMPT_TIMEOUT = float(os.getenv("RESILIENCE_ATTEMPT_TIMEOUT", "15"))
+RESILIENCE_MAX_ATTEMPTS = int(os.getenv("RESILIENCE_MAX_ATTEMPTS", "3"))
+RESILIENCE_BASE_DELAY = float(os.getenv("RESILIENCE_BASE_DELAY", "0.25"))
+RESILIENCE_MAX_DELAY = float(os.getenv("RESILIENCE_MAX_DELAY", "5"))
+BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", "20"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "10"))
+BREAKER_RECOVERY_TIMEOUT = float(os.getenv("BREAKER_RECOVERY_TIMEOUT", "30"))
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit breaker is open."""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"Circuit open for {name}; retry in {retry_in:.0f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Return True for timeouts, connection errors, 429 and 5xx responses."""
+    if isinstance(error, UpstreamHTTPError):
+        return error.status in RETRYABLE_STATUSES
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    # google.api_core errors carry the HTTP status in .code
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code in RETRYABLE_STATUSES
+    return str(error).startswith("Request Error")
+
+
+def is_throttled(error: BaseException) -> bool:
+    """Return True for a 429 carrying Retry-After; a 5xx with Retry-After is still a failure."""
+    status = error.status if isinstance(error, UpstreamHTTPError) else getattr(error, "code", None)
+    return status == 429 and retry_after_seconds(error) is not None
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Parse a Retry-After header (seconds or HTTP date) from an upstream error."""
+    headers = getattr(error, "headers", None) or {}
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class LatencyTracker:
+    """Sliding window of recent successful call latencies."""
+
+    def __init__(self, window: int = 200):
+        self._samples: deque = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open breaker driven by the recent failure rate.
+
+    The circuit opens when at least failure_rate of the last `window`
+    outcomes (and no fewer than min_calls) were failures; calls then fail
+    fast. After recovery_timeout a single probe is let through and its
+    outcome closes or re-opens the circuit.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = BREAKER_FAILURE_RATE,
+        window: int = BREAKER_WINDOW,
+        min_calls: int = BREAKER_MIN_CALLS,
+        recovery_timeout: float = BREAKER_RECOVERY_TIMEOUT,
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.recovery_timeout = recovery_timeout
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.trips = 0
+        self.rejected = 0
+        self._outcomes: deque = deque(maxlen=window)
+        self._probe_in_flight = False
+
+    def allow(self):
+        """Raise CircuitOpenError unless a call may proceed."""
+        if self.state == "closed":
+            return
+        elapsed = time.monotonic() - self.opened_at
+        if self.state == "open" and elapsed >= self.recovery_timeout:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return
+        self.rejected += 1
+        raise CircuitOpenError(self.name, max(0.0, self.recovery_timeout - elapsed))
+
+    def release(self):
+        """Give up a half-open probe without recording an outcome (e.g. on cancel)."""
+        self._probe_in_flight = False
+
+    def record_success(self):
+        if self.state == "open":
+            # A straggler started before the trip; wait for the probe instead
+            return
+        if self.state == "half_open":
+            self._outcomes.clear()
+        self.state = "closed"
+        self._outcomes.append(True)
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self._outcomes.append(False)
+        self._probe_in_flight = False
+        failures = self._outcomes.count(False)
+        tripped = len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate
+        if self.state == "half_open" or (self.state == "closed" and tripped):
+            self.trips += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        outcomes = len(self._outcomes)
+        return {
+            "state": self.state,
+            "recent_failure_rate": round(self._outcomes.count(False) / outcomes, 3) if outcomes else 0.0,
+            "trips": self.trips,
+            "rejected": self.rejected,
+        }
+
+
+class ResilientCaller:
+    """
+    Wraps upstream calls with timeouts, retries, hedging and a circuit breaker.
+
+    Every attempt is bounded by attempt_timeout and the whole call by
+    total_timeout, or by what is left of the request's deadline. Retryable failures back off exponentially with full
+    jitter, honouring Retry-After. When hedging is enabled, a second
+    identical request is started if the first has not answered within the
+    observed p95 latency, and whichever answers first wins.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        total_timeout: float = RESILIENCE_TOTAL_TIMEOUT,
+        attempt_timeout: float = RESILIENCE_ATTEMPT_TIMEOUT,
+        max_attempts: int = RESILIENCE_MAX_ATTEMPTS,
+        base_delay: float = RESILIENCE_BASE_DELAY,
+        max_delay: float = RESILIENCE_MAX_DELAY,
+        hedge: bool = True,
+        hedge_min_samples: int = 20,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.name = name
+        self.total_timeout = total_timeout
+        self.attempt_timeout = attempt_timeout
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker = breaker or CircuitBreaker(name)
+        self.latency = LatencyTracker()
+        self.calls = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failures = 0
+
+    def hedge_delay(self) -> Optional[float]:
+        """Delay before a hedged request, or None while there is too little data."""
+        if not self.hedge or len(self.latency) < self.hedge_min_samples:
+            return None
+        return self.latency.percentile(95)
+
+    def _backoff(self, attempt: int, error: BaseException) -> float:
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def _timed(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        start = time.perf_counter()
+        outcome = "error"
+        UPSTREAM_IN_FLIGHT.inc(provider=self.name)
+        try:
+            result = await asyncio.wait_for(fn(), self.attempt_timeout)
+            outcome = "ok"
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            raise
+        except asyncio.CancelledError:
+            # Losing hedges, abandoned calls and cancelled requests end up here
+            outcome = "cancelled"
+            UPSTREAM_WASTED.inc(time.perf_counter() - start, provider=self.name, reason=cancel_reason())
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            UPSTREAM_IN_FLIGHT.dec(provider=self.name)
+            UPSTREAM_REQUESTS.inc(provider=self.name, outcome=outcome)
+            UPSTREAM_LATENCY.observe(elapsed, provider=self.name)
+        self.latency.record(elapsed)
+        return result
+
+    async def _attempt(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        delay = self.hedge_delay()
+        if delay is None:
+            return await self._timed(fn)
+
+        primary = asyncio.ensure_future(self._timed(fn))
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                self.hedges += 1
+                hedged = asyncio.ensure_future(self._timed(fn))
+                tasks.add(hedged)
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        return task.result()
+                    if not tasks:
+                        raise task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def call(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run an upstream call with the configured resilience policy.
+
+        Args:
+            fn: Coroutine factory performing one upstream request
+
+        Returns:
+            The result of the first successful attempt
+        """
+        with stage("upstream"):
+            return await self._call(fn)
+
+    async def _call(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self.calls += 1
+        loop = asyncio.get_running_loop()
+        budget = time_left(self.total_timeout)
+        if budget <= 0:
+            raise DeadlineExceeded(self.name, current_deadline().timeout)
+        deadline = loop.time() + budget
+        attempt = 0
+        while True:
+            self.breaker.allow()
+            remaining = deadline - loop.time()
+            try:
+                result = await asyncio.wait_for(self._attempt(fn), remaining)
+                self.breaker.record_success()
+                return result
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            except Exception as e:
+                retryable = is_retryable(e)
+                if retryable and not is_throttled(e):
+                    self.breaker.record_failure()
+                else:
+                    # The upstream answered: client errors and explicit 429 throttling
+                    # are handled by backoff, not by the breaker
+                    self.breaker.record_success()
+                attempt += 1
+                delay = self._backoff(attempt - 1, e)
+                if not retryable or attempt >= self.max_attempts or loop.time() + delay >= deadline:
+                    self.failures += 1
+                    request_deadline = current_deadline()
+                    if request_deadline is not None and request_deadline.expired:
+                        raise DeadlineExceeded(self.name, request_deadline.timeout) from e
+                    if isinstance(e, asyncio.TimeoutError):
+                        raise asyncio.TimeoutError(f"{self.name} timed out after {attempt} attempt(s)") from e
+                    raise
+                self.retries += 1
+                await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        p95 = self.latency.percentile(95)
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "failures": self.failures,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "breaker": self.breaker.stats(),
+        }
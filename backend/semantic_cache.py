@@ -0,0 +1,482 @@
+import os
+import re
+import time
+import zlib
+import hashlib
+import random
+import asyncio
+import logging
+from collections import deque
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Tuple, Set
+import numpy as np
+from cache import normalize_query
+from metrics import SEMANTIC_CACHE_LOOKUPS, SEMANTIC_CACHE_SIMILARITY, SEMANTIC_CACHE_AUDITS
+from deadlines import without_deadline
+
+logger = logging.getLogger(__name__)
+
+# Semantic cache configuration (overridable through environment variables)
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE", "1") == "1"
+# Calibrated on the labelled paraphrase pairs in tests/test_semantic_cache.py
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.83"))
+# Chat replies are opt-in: a wrong near-duplicate answer costs more there than for search
+SEMANTIC_CACHE_CHAT = os.getenv("SEMANTIC_CACHE_CHAT", "0") == "1"
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "900"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "5000"))
+SEMANTIC_CACHE_DIM = int(os.getenv("SEMANTIC_CACHE_DIM", "1024"))
+SEMANTIC_CACHE_LSH_TABLES = int(os.getenv("SEMANTIC_CACHE_LSH_TABLES", "10"))
+SEMANTIC_CACHE_LSH_BITS = int(os.getenv("SEMANTIC_CACHE_LSH_BITS", "16"))
+SEMANTIC_CACHE_EXACT_MAX = int(os.getenv("SEMANTIC_CACHE_EXACT_MAX", "2048"))
+SEMANTIC_CACHE_AUDIT_RATE = float(os.getenv("SEMANTIC_CACHE_AUDIT_RATE", "0.05"))
+SEMANTIC_CACHE_AUDIT_AGREEMENT = float(os.getenv("SEMANTIC_CACHE_AUDIT_AGREEMENT", "0.5"))
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an the of for in on at to is are was were be been what whats which who how do does did "
+    "me my i you your tell show give find about please can could would and or with any some".split()
+)
+# Words that only say "recent" are dropped: the freshness window already bounds how old an answer is
+FRESHNESS_WORDS = frozenset("latest newest today todays current currently now recent recently".split())
+_SYNONYMS = {"tech": "technology", "info": "information"}
+# Similarity bands used to report hit and false-hit rates for threshold tuning
+_BANDS = (0.8, 0.85, 0.9, 0.95, 0.99)
+
+
+class HashingVectorizer:
+    """
+    Embeds short queries into fixed-size unit vectors without a model.
+
+    Features are content words (stop and freshness words removed, a few
+    synonyms mapped), their plural-folded stems, bigrams of adjacent content
+    words so word order counts ("python faster java" is not "java faster
+    python"), and character trigrams of each word for typo tolerance, all
+    hashed with a sign bit into `dim` buckets. The surface word keeps "apple" and
+    "apples" apart; the shared stem and trigrams keep them close.
+    """
+
+    def __init__(
+        self,
+        dim: int = SEMANTIC_CACHE_DIM,
+        trigram_weight: float = 0.3,
+        stem_weight: float = 1.0,
+        bigram_weight: float = 1.2,
+    ):
+        self.dim = dim
+        self.trigram_weight = trigram_weight
+        self.stem_weight = stem_weight
+        self.bigram_weight = bigram_weight
+
+    @staticmethod
+    def tokens(text: str) -> List[str]:
+        return [
+            _SYNONYMS.get(word, word)
+            for word in _TOKEN.findall(normalize_query(text))
+            if word not in STOPWORDS and word not in FRESHNESS_WORDS
+        ]
+
+    @staticmethod
+    def stem(word: str) -> str:
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            return word[:-1]
+        return word
+
+    def _add(self, vector: np.ndarray, feature: str, weight: float):
+        h = zlib.crc32(feature.encode("utf-8"))
+        vector[h % self.dim] += weight if h & 0x80000000 else -weight
+
+    def embed(self, text: str) -> np.ndarray:
+        """
+        Return the L2-normalized float32 vector of a text.
+
+        Args:
+            text: Query or answer text
+
+        Returns:
+            A vector of length dim (all zeros when the text has no content words)
+        """
+        vector = np.zeros(self.dim, dtype=np.float32)
+        words = self.tokens(text)
+        for word in words:
+            self._add(vector, word, 1.0)
+            self._add(vector, "~" + self.stem(word), self.stem_weight)
+            padded = f"<{word}>"
+            for i in range(len(padded) - 2):
+                self._add(vector, padded[i:i + 3], self.trigram_weight)
+        for first, second in zip(words, words[1:]):
+            self._add(vector, f"{self.stem(first)} {self.stem(second)}", self.bigram_weight)
+        norm = float(np.linalg.norm(vector))
+        if norm > 0:
+            vector /= norm
+        return vector
+
+
+class SemanticIndex:
+    """
+    NumPy vector index with random-hyperplane LSH for approximate search.
+
+    Rows live in one growable matrix. Up to exact_max rows are scanned with
+    a single matrix-vector product; larger indexes only score the rows that
+    share an LSH bucket with the query in any table (probing every bucket
+    one bit away as well). Rows are scoped, and only rows of the query's
+    scope that have not expired can match.
+    """
+
+    def __init__(
+        self,
+        dim: int = SEMANTIC_CACHE_DIM,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+        tables: int = SEMANTIC_CACHE_LSH_TABLES,
+        bits: int = SEMANTIC_CACHE_LSH_BITS,
+        exact_max: int = SEMANTIC_CACHE_EXACT_MAX,
+        seed: int = 0,
+    ):
+        self.dim = dim
+        self.max_entries = max_entries
+        self.tables = tables
+        self.bits = bits
+        self.exact_max = exact_max
+        self.size = 0
+        self.evictions = 0
+        capacity = min(max_entries, 256)
+        self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self._expires = np.zeros(capacity, dtype=np.float64)
+        self._inserted = np.zeros(capacity, dtype=np.float64)
+        self._scopes = np.zeros(capacity, dtype=np.int64)
+        self._signatures = np.zeros((capacity, tables), dtype=np.int64)
+        self._values: List[Any] = []
+        self._keys: List[Tuple[int, str]] = []
+        self._rows: Dict[Tuple[int, str], int] = {}
+        self._planes = np.random.default_rng(seed).standard_normal((tables * bits, dim)).astype(np.float32)
+        self._powers = 1 << np.arange(bits, dtype=np.int64)
+        self._buckets: List[Dict[int, Set[int]]] = [{} for _ in range(tables)]
+
+    def _signature(self, vector: np.ndarray) -> np.ndarray:
+        bits = (self._planes @ vector > 0).reshape(self.tables, self.bits)
+        return bits.astype(np.int64) @ self._powers
+
+    def _grow(self):
+        capacity = min(self.max_entries, len(self._vectors) * 2)
+        for name in ("_vectors", "_expires", "_inserted", "_scopes", "_signatures"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[: self.size] = old[: self.size]
+            setattr(self, name, new)
+
+    def _remove(self, row: int):
+        for table, signature in enumerate(self._signatures[row]):
+            bucket = self._buckets[table][int(signature)]
+            bucket.discard(row)
+            if not bucket:
+                del self._buckets[table][int(signature)]
+        del self._rows[self._keys[row]]
+        last = self.size - 1
+        if row != last:
+            # Move the last row into the hole so live rows stay contiguous
+            for table, signature in enumerate(self._signatures[last]):
+                bucket = self._buckets[table][int(signature)]
+                bucket.discard(last)
+                bucket.add(row)
+            for array in (self._vectors, self._expires, self._inserted, self._scopes, self._signatures):
+                array[row] = array[last]
+            self._values[row] = self._values[last]
+            self._keys[row] = self._keys[last]
+            self._rows[self._keys[row]] = row
+        self._values.pop()
+        self._keys.pop()
+        self.size -= 1
+
+    def _make_room(self, now: float):
+        expired = np.flatnonzero(self._expires[: self.size] <= now)
+        for row in sorted(expired, reverse=True):
+            self._remove(int(row))
+        if self.size >= self.max_entries:
+            self._remove(int(np.argmin(self._inserted[: self.size])))
+            self.evictions += 1
+
+    def add(self, vector: np.ndarray, scope: int, key: str, value: Any, expires_at: float):
+        """Insert or replace the row of (scope, key)."""
+        now = time.time()
+        existing = self._rows.get((scope, key))
+        if existing is not None:
+            self._remove(existing)
+        if self.size >= self.max_entries:
+            self._make_room(now)
+        if self.size == len(self._vectors):
+            self._grow()
+        row = self.size
+        self._vectors[row] = vector
+        self._expires[row] = expires_at
+        self._inserted[row] = now
+        self._scopes[row] = scope
+        self._signatures[row] = self._signature(vector)
+        for table, signature in enumerate(self._signatures[row]):
+            self._buckets[table].setdefault(int(signature), set()).add(row)
+        self._values.append(value)
+        self._keys.append((scope, key))
+        self._rows[(scope, key)] = row
+        self.size += 1
+
+    def _candidates(self, vector: np.ndarray) -> np.ndarray:
+        rows: Set[int] = set()
+        for table, signature in enumerate(self._signature(vector)):
+            buckets = self._buckets[table]
+            signature = int(signature)
+            rows.update(buckets.get(signature, ()))
+            for bit in range(self.bits):
+                rows.update(buckets.get(signature ^ (1 << bit), ()))
+        return np.fromiter(rows, dtype=np.int64, count=len(rows))
+
+    def search(self, vector: np.ndarray, scope: int, now: Optional[float] = None) -> Optional[Tuple[int, float]]:
+        """
+        Find the most similar live row of a scope.
+
+        Args:
+            vector: Unit query vector
+            scope: Scope id the row must belong to
+            now: Wall-clock time used for expiry (defaults to time.time())
+
+        Returns:
+            (row, cosine similarity) of the best match, or None
+        """
+        if self.size == 0:
+            return None
+        now = time.time() if now is None else now
+        if self.size <= self.exact_max:
+            # Score the contiguous block in one product, then mask other scopes and expired rows
+            scores = self._vectors[: self.size] @ vector
+            scores[(self._scopes[: self.size] != scope) | (self._expires[: self.size] <= now)] = -np.inf
+            best = int(np.argmax(scores))
+            return (best, float(scores[best])) if scores[best] > -np.inf else None
+        rows = self._candidates(vector)
+        live = rows[(self._scopes[rows] == scope) & (self._expires[rows] > now)]
+        if not len(live):
+            return None
+        scores = self._vectors[live] @ vector
+        best = int(np.argmax(scores))
+        return int(live[best]), float(scores[best])
+
+    def value(self, row: int) -> Any:
+        return self._values[row]
+
+    def key(self, row: int) -> str:
+        return self._keys[row][1]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": self.size,
+            "max_entries": self.max_entries,
+            "evictions": self.evictions,
+            "bytes": int(self._vectors.nbytes),
+            "mode": "exact" if self.size <= self.exact_max else "lsh",
+        }
+
+
+class SemanticHit:
+    """A cached answer served for a similar (not necessarily identical) query."""
+
+    def __init__(self, value: Any, similarity: float, cached_query: str):
+        self.value = value
+        self.similarity = similarity
+        self.cached_query = cached_query
+
+
+class SemanticCache:
+    """
+    Serves answers cached for near-duplicate queries ("latest tech news" and
+    "tech news today").
+
+    Queries are embedded with HashingVectorizer and looked up per namespace
+    and scope (e.g. the You.com instructions, which must match exactly).
+    A match at or above `threshold` within the freshness window (`ttl`) is a
+    hit. A sample of non-identical hits (`audit_rate`) is re-fetched in the
+    background, and the fresh answer is compared with the served one; low
+    agreement counts as a false hit. Hit and false-hit rates are reported
+    per similarity band so the threshold can be tuned from real traffic.
+    The index is process-local, like the memory tier of ResponseCache.
+    """
+
+    def __init__(
+        self,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        ttl: float = SEMANTIC_CACHE_TTL,
+        audit_rate: float = SEMANTIC_CACHE_AUDIT_RATE,
+        audit_agreement: float = SEMANTIC_CACHE_AUDIT_AGREEMENT,
+        vectorizer: Optional[HashingVectorizer] = None,
+        index: Optional[SemanticIndex] = None,
+    ):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.audit_rate = audit_rate
+        self.audit_agreement = audit_agreement
+        self.vectorizer = vectorizer or HashingVectorizer()
+        self.index = index or SemanticIndex(dim=self.vectorizer.dim)
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._bands: Dict[str, Dict[str, int]] = {}
+        self._audits: "deque[Tuple[float, float]]" = deque(maxlen=1000)
+        self._audit_tasks: Set[asyncio.Task] = set()
+
+    @classmethod
+    def from_env(cls) -> Optional["SemanticCache"]:
+        """Build a cache from the SEMANTIC_CACHE_* environment variables (None when disabled)."""
+        return cls() if SEMANTIC_CACHE_ENABLED else None
+
+    @staticmethod
+    def _scope(namespace: str, scope: Optional[str]) -> int:
+        # A 64-bit hash rather than an id table: scopes are client-supplied, so a table would grow without bound
+        text = namespace + "\0" + (normalize_query(scope) if scope else "")
+        return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little", signed=True)
+
+    def _count(self, namespace: str, name: str):
+        counts = self._counts.setdefault(namespace, {"lookups": 0, "hits": 0, "misses": 0, "stores": 0, "audits": 0, "false_hits": 0})
+        counts[name] += 1
+
+    @staticmethod
+    def _band(similarity: float) -> str:
+        lower = max((b for b in _BANDS if similarity >= b), default=None)
+        return f">={lower}" if lower is not None else f"<{_BANDS[0]}"
+
+    def lookup(self, namespace: str, query: str, scope: Optional[str] = None) -> Optional[SemanticHit]:
+        """
+        Return the cached answer of the most similar fresh query, if close enough.
+
+        Args:
+            namespace: Upstream operation, e.g. "you-smart" or "gemini"
+            query: The incoming query
+            scope: Extra parameters that must match exactly (e.g. instructions)
+
+        Returns:
+            A SemanticHit, or None on a miss
+        """
+        self._count(namespace, "lookups")
+        vector = self.vectorizer.embed(query)
+        match = self.index.search(vector, self._scope(namespace, scope)) if vector.any() else None
+        similarity = match[1] if match else 0.0
+        outcome = "hit" if match and similarity >= self.threshold else "miss"
+        SEMANTIC_CACHE_LOOKUPS.inc(namespace=namespace, outcome=outcome)
+        if match:
+            SEMANTIC_CACHE_SIMILARITY.observe(similarity, namespace=namespace, outcome=outcome)
+        if outcome == "miss":
+            self._count(namespace, "misses")
+            return None
+        self._count(namespace, "hits")
+        band = self._bands.setdefault(namespace, {})
+        band[self._band(similarity)] = band.get(self._band(similarity), 0) + 1
+        return SemanticHit(self.index.value(match[0]), similarity, self.index.key(match[0]))
+
+    def store(self, namespace: str, query: str, value: Any, scope: Optional[str] = None, ttl: Optional[float] = None):
+        """Remember an answer for a query until the freshness window ends."""
+        vector = self.vectorizer.embed(query)
+        if not vector.any():
+            return
+        self._count(namespace, "stores")
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        self.index.add(vector, self._scope(namespace, scope), normalize_query(query), value, expires_at)
+
+    async def get_or_fetch(
+        self,
+        namespace: str,
+        query: str,
+        fetch: Callable[[], Awaitable[Any]],
+        scope: Optional[str] = None,
+        answer_of: Callable[[Any], Optional[str]] = lambda value: value,
+    ) -> Any:
+        """
+        Serve a near-duplicate answer from the cache or fetch and store a new one.
+
+        Args:
+            namespace: Upstream operation, e.g. "you-smart" or "gemini"
+            query: The incoming query
+            fetch: Coroutine factory producing the answer
+            scope: Extra parameters that must match exactly
+            answer_of: Extracts the answer text; empty answers are not cached
+
+        Returns:
+            The cached or freshly fetched value
+        """
+        hit = self.lookup(namespace, query, scope)
+        if hit is not None:
+            identical = hit.cached_query == normalize_query(query)
+            if not identical:
+                logger.info(
+                    "Semantic cache hit",
+                    extra={"namespace": namespace, "similarity": round(hit.similarity, 3), "cached_query": hit.cached_query},
+                )
+                if random.random() < self.audit_rate:
+                    # The audit outlives the request, so it must not inherit its deadline
+                    task = asyncio.get_running_loop().create_task(
+                        self._audit(namespace, query, scope, hit, fetch, answer_of), context=without_deadline()
+                    )
+                    self._audit_tasks.add(task)
+                    task.add_done_callback(self._audit_tasks.discard)
+            return hit.value
+
+        value = await fetch()
+        if answer_of(value):
+            self.store(namespace, query, value, scope)
+        return value
+
+    async def _audit(self, namespace, query, scope, hit: SemanticHit, fetch, answer_of):
+        try:
+            fresh = await fetch()
+        except asyncio.CancelledError:
+            # The fetch may await work owned by the request that was served
+            # (e.g. its retrieval prefetch, cancelled when it finished); only
+            # close() cancelling the audit itself is propagated
+            if asyncio.current_task().cancelling():
+                raise
+            logger.debug("Semantic cache audit abandoned: the request's work was cancelled")
+            return
+        except Exception as e:
+            logger.debug("Semantic cache audit failed: %s", e)
+            return
+        served, actual = answer_of(hit.value) or "", answer_of(fresh) or ""
+        if not actual:
+            return
+        agreement = float(self.vectorizer.embed(served) @ self.vectorizer.embed(actual))
+        false_hit = agreement < self.audit_agreement
+        self._count(namespace, "audits")
+        self._audits.append((hit.similarity, agreement))
+        SEMANTIC_CACHE_AUDITS.inc(namespace=namespace, result="false_hit" if false_hit else "agree")
+        if false_hit:
+            self._count(namespace, "false_hits")
+            logger.warning(
+                "Semantic cache false hit",
+                extra={"namespace": namespace, "query": query, "cached_query": hit.cached_query,
+                       "similarity": round(hit.similarity, 3), "agreement": round(agreement, 3)},
+            )
+        # The fresh answer is the better entry for this exact wording either way
+        self.store(namespace, query, fresh, scope)
+
+    def audit_report(self) -> Dict[str, Dict[str, Any]]:
+        """False-hit rate of audited hits per similarity band (input for threshold tuning)."""
+        report: Dict[str, Dict[str, Any]] = {}
+        for similarity, agreement in self._audits:
+            band = report.setdefault(self._band(similarity), {"audits": 0, "false_hits": 0})
+            band["audits"] += 1
+            band["false_hits"] += agreement < self.audit_agreement
+        for band in report.values():
+            band["false_hit_rate"] = band["false_hits"] / band["audits"]
+        return report
+
+    def stats(self) -> Dict[str, Any]:
+        namespaces = {}
+        for namespace, counts in self._counts.items():
+            namespaces[namespace] = {
+                **counts,
+                "hit_rate": counts["hits"] / counts["lookups"] if counts["lookups"] else 0.0,
+                "false_hit_rate": counts["false_hits"] / counts["audits"] if counts["audits"] else 0.0,
+                "hits_by_similarity": dict(self._bands.get(namespace, {})),
+            }
+        return {
+            "threshold": self.threshold,
+            "ttl": self.ttl,
+            "audit_rate": self.audit_rate,
+            "index": self.index.stats(),
+            "namespaces": namespaces,
+            "audits_by_similarity": self.audit_report(),
+        }
+
+    async def close(self):
+        for task in list(self._audit_tasks):
+            task.cancel()
+        await asyncio.gather(*self._audit_tasks, return_exceptions=True)
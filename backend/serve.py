@@ -0,0 +1,145 @@
+"""
+Run the API with one or more uvicorn worker processes.
+
+    python serve.py --workers 4          # multi-process, shared SQLite state
+    python serve.py --reload             # single process, restart on code changes
+
+With several workers the response cache, conversation store and rate-limit
+buckets default to SQLite files in DATA_DIR (the working directory unless
+set) so every worker sees the same state. Send SIGHUP to the supervisor for a graceful rolling
+restart: workers are replaced one at a time and each old worker finishes
+its in-flight requests before exiting. Crashed workers are respawned.
+"""
+import os
+import time
+import signal
+import logging
+import argparse
+import multiprocessing
+from typing import List
+from multiprocessing.context import SpawnProcess
+import uvicorn
+
+logger = logging.getLogger("uvicorn.error")
+
+# Deployment configuration (overridable through environment variables or flags)
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8001"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+RELOAD_STAGGER = float(os.getenv("RELOAD_STAGGER", "2"))
+# Directory for the SQLite files shared by the workers
+DATA_DIR = os.getenv("DATA_DIR", ".")
+
+
+def configure_shared_state(workers: int):
+    """
+    Point process-local state at shared SQLite backends when running several workers.
+
+    Explicit settings win; this only fills in defaults, and must run before
+    the workers import the application so they inherit the environment.
+    """
+    if workers <= 1:
+        return
+    os.environ.setdefault("RESPONSE_CACHE_SQLITE_PATH", os.path.join(DATA_DIR, "response_cache.db"))
+    os.environ.setdefault("CONVERSATION_STORE", "sqlite")
+    os.environ.setdefault("RATE_LIMIT_SHARED", "1")
+
+
+def run_worker(config: uvicorn.Config, sockets: list):
+    """Entry point of a spawned worker process: serve on the supervisor's sockets."""
+    config.configure_logging()
+    uvicorn.Server(config).run(sockets=sockets)
+
+
+class Supervisor:
+    """Keeps `workers` uvicorn processes running on one shared listening socket."""
+
+    def __init__(self, config: uvicorn.Config, workers: int):
+        self.config = config
+        self.workers = workers
+        self.sockets = [config.bind_socket()]
+        self.processes: List[SpawnProcess] = []
+        # Workers start from a fresh interpreter and import the app themselves
+        self.context = multiprocessing.get_context("spawn")
+        self.should_exit = False
+        self.should_reload = False
+
+    def spawn(self) -> SpawnProcess:
+        process = self.context.Process(target=run_worker, args=(self.config, self.sockets))
+        process.start()
+        return process
+
+    def stop(self, process: SpawnProcess):
+        # SIGTERM makes uvicorn stop accepting and drain in-flight requests
+        process.terminate()
+        process.join(GRACEFUL_TIMEOUT + 5)
+        if process.is_alive():
+            process.kill()
+            process.join()
+
+    def rolling_restart(self):
+        logger.info("Reloading %d workers", len(self.processes))
+        for index, old in enumerate(list(self.processes)):
+            self.processes[index] = self.spawn()
+            time.sleep(RELOAD_STAGGER)
+            self.stop(old)
+
+    def run(self):
+        signal.signal(signal.SIGINT, self._on_exit)
+        signal.signal(signal.SIGTERM, self._on_exit)
+        signal.signal(signal.SIGHUP, self._on_reload)
+        logger.info("Supervisor [%d] starting %d workers", os.getpid(), self.workers)
+        self.processes = [self.spawn() for _ in range(self.workers)]
+        while not self.should_exit:
+            if self.should_reload:
+                self.should_reload = False
+                self.rolling_restart()
+            for index, process in enumerate(self.processes):
+                if not process.is_alive() and not self.should_exit:
+                    logger.warning("Worker %s exited with %s; restarting", process.pid, process.exitcode)
+                    self.processes[index] = self.spawn()
+            time.sleep(0.5)
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            self.stop(process)
+        for sock in self.sockets:
+            sock.close()
+
+    def _on_exit(self, signum, frame):
+        self.should_exit = True
+
+    def _on_reload(self, signum, frame):
+        self.should_reload = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY)
+    parser.add_argument("--reload", action="store_true", default=os.getenv("RELOAD") == "1")
+    args = parser.parse_args()
+
+    if args.reload:
+        # Development: uvicorn's file watcher restarts a single worker
+        uvicorn.run("main:app", host=args.host, port=args.port, reload=True)
+        return
+
+    configure_shared_state(args.workers)
+    config = uvicorn.Config(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        timeout_graceful_shutdown=GRACEFUL_TIMEOUT,
+    )
+    if args.workers <= 1:
+        uvicorn.Server(config).run()
+        return
+    Supervisor(config, args.workers).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import os
+import json
+import asyncio
+from typing import List, Dict, Any, AsyncIterator, Awaitable, Callable, Optional
+from chat_model import ChatModel
+from rag import RetrievalPrefetch
+from conversation_store import ConversationNotFound
+
+# Maximum number of generated chunks buffered ahead of a slow client
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "32"))
+
+_DONE = object()
+
+
+def format_sse(event: str, data: Any) -> str:
+    """Encode one server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def start_stream(chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    """
+    Wait for the first chunk of a stream, then return an iterator over all of them.
+
+    Errors raised before anything was produced (rate limits, deadlines)
+    reach the caller while it can still answer with a proper status code.
+    """
+    try:
+        first: Optional[str] = await chunks.__anext__()
+    except StopAsyncIteration:
+        first = None
+
+    async def replay():
+        if first is not None:
+            yield first
+        async for chunk in chunks:
+            yield chunk
+
+    return replay()
+
+
+async def stream_chat_events(
+    model: ChatModel,
+    message: str,
+    conversation_history: List[Dict[str, str]],
+    queue_size: int = STREAM_QUEUE_SIZE,
+    on_complete: Optional[Callable[[List[Dict[str, str]]], Awaitable[List[Dict[str, str]]]]] = None,
+    retrieval: Optional[RetrievalPrefetch] = None,
+) -> AsyncIterator[str]:
+    """
+    Stream a chat reply as server-sent events.
+
+    Generation runs in a producer task feeding a bounded queue, so a slow
+    client stalls the model instead of buffering the whole reply. When the
+    consumer stops early (client disconnect), the producer is cancelled and
+    the upstream generation with it.
+
+    Args:
+        model: Chat backend to generate the reply with
+        message: The new user message
+        conversation_history: Previous messages as {"role", "content"} dicts
+        queue_size: Number of chunks buffered ahead of the client
+        on_complete: Optional callback receiving the new user/assistant messages
+            and returning the history to send in the "done" event
+        retrieval: Web retrieval started for this turn; its sources are
+            listed in the "done" event, and it is cancelled if unused
+
+    Returns:
+        An async iterator of SSE-encoded "token", "done" and "error" events
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    async def produce():
+        try:
+            async for chunk in model.stream_response(message, conversation_history, retrieval):
+                await queue.put(chunk)
+            await queue.put(_DONE)
+        except Exception as e:
+            await queue.put(e)
+
+    producer = asyncio.create_task(produce())
+    chunks = []
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                yield format_sse("error", {"error": str(item)})
+                return
+            chunks.append(item)
+            yield format_sse("token", {"text": item})
+
+        reply = "".join(chunks)
+        new_messages = [
+            {"role": "user", "content": message},
+            {"role": "assistant", "content": reply},
+        ]
+        if on_complete is not None:
+            try:
+                updated_history = await on_complete(new_messages)
+            except ConversationNotFound as e:
+                # Evicted while the reply streamed; the turn could not be saved
+                yield format_sse("error", {"error": str(e), "status": 404})
+                return
+        else:
+            updated_history = conversation_history + new_messages
+        done = {"reply": reply, "conversationHistory": updated_history}
+        if retrieval is not None:
+            done["sources"] = retrieval.used.sources if retrieval.used is not None else []
+        yield format_sse("done", done)
+    finally:
+        if retrieval is not None:
+            retrieval.cancel()
+        if not producer.done():
+            producer.cancel()
+            try:
+                await producer
+            except asyncio.CancelledError:
+                pass
@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Keep any SQLite files the app opens, and the chat model, local to the test run
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="backend-tests-"))
+os.environ.setdefault("PROVIDER_WARMUP", "0")
+os.environ.setdefault("CHAT_MODEL", "fake")
@@ -0,0 +1,63 @@
+import asyncio
+
+from aggregate import SearchAggregator, canonicalize_url, reciprocal_rank_fusion
+
+
+def result(url, snippet="snippet"):
+    return {"title": url, "url": url, "snippet": snippet}
+
+
+def test_canonical_urls_ignore_cosmetic_differences():
+    canonical = canonicalize_url("https://example.com/a?b=2&a=1")
+    assert canonicalize_url("http://www.Example.com:80/a/?a=1&b=2&utm_source=x#top") == canonical
+    assert canonicalize_url("https://example.com/a?a=1&b=2&gclid=123") == canonical
+    assert canonicalize_url("https://example.com/a?a=2&b=2") != canonical
+    assert canonicalize_url("https://example.com:8443/a?a=1&b=2") != canonical
+
+
+def test_rrf_ranks_agreement_above_a_single_top_hit():
+    fused = reciprocal_rank_fusion({
+        "google": [result("https://only-google.com"), result("https://both.com")],
+        "you": [result("https://only-you.com"), result("https://www.both.com/")],
+    }, k=60)
+
+    assert [entry["url"] for entry in fused][0] == "https://both.com"
+    assert fused[0]["providers"] == ["google", "you"]
+    assert fused[0]["score"] == 2 / 62
+    # Ties keep provider order
+    assert [entry["url"] for entry in fused[1:]] == ["https://only-google.com", "https://only-you.com"]
+
+
+def test_rrf_counts_a_repeated_url_once_per_provider_and_fills_snippets():
+    fused = reciprocal_rank_fusion({
+        "google": [result("https://a.com", snippet=""), result("https://a.com/#dup"), result("https://b.com")],
+        "you": [result("https://a.com", snippet="from you")],
+    }, k=60)
+
+    by_url = {entry["url"]: entry for entry in fused}
+    assert len(fused) == 2
+    assert by_url["https://a.com"]["score"] == 2 / 61
+    assert by_url["https://a.com"]["snippet"] == "from you"
+    assert by_url["https://b.com"]["score"] == 1 / 63
+
+
+def test_aggregator_returns_at_quorum_and_reports_every_provider():
+    async def fast(query, num_results):
+        return [result("https://fast.com")]
+
+    async def slow(query, num_results):
+        await asyncio.sleep(5)
+        return [result("https://slow.com")]
+
+    async def broken(query, num_results):
+        raise RuntimeError("upstream down")
+
+    aggregator = SearchAggregator({"fast": fast, "broken": broken, "slow": slow}, provider_timeout=1)
+    data = asyncio.run(aggregator.search("solar", quorum=1, deadline=0.5))
+
+    assert [entry["url"] for entry in data["results"]] == ["https://fast.com"]
+    assert data["partial"] is True
+    assert data["providers"]["fast"]["status"] == "ok"
+    assert data["providers"]["slow"]["status"] == "skipped"
+    assert data["providers"]["broken"]["status"] in ("error", "skipped")
+    assert data["elapsed_ms"] < 500
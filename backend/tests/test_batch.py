@@ -0,0 +1,86 @@
+import json
+import asyncio
+
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+import main
+from batch import InvalidLine, run_batch
+from http_pool import UpstreamHTTPError
+from rate_limit import RateLimitExceeded
+
+
+class Item(BaseModel):
+    value: int
+
+
+async def execute(operation):
+    if operation["op"] == "fail":
+        raise UpstreamHTTPError(503, "unavailable")
+    if operation["op"] == "throttled":
+        raise RateLimitExceeded("google", 2.0)
+    if operation["op"] == "invalid":
+        Item.parse_obj({"value": "not a number"})
+    return f"result {operation['id']}"
+
+
+def collect(operations, concurrency=4):
+    async def scenario():
+        return [line async for line in run_batch(operations, execute, concurrency)]
+
+    return asyncio.run(scenario())
+
+
+def test_run_batch_reports_a_status_per_item():
+    lines = collect([
+        {"op": "search", "id": "a"},
+        {"op": "fail", "id": "b"},
+        InvalidLine("Invalid JSON"),
+        {"op": "throttled", "id": "c"},
+        {"op": "invalid", "id": "d"},
+    ])
+    *items, summary = lines
+    by_index = {item["index"]: item for item in items}
+    assert by_index[0]["status"] == "ok" and by_index[0]["result"] == "result a"
+    assert by_index[1]["status"] == "error" and "HTTP Error 503" in by_index[1]["error"]
+    assert by_index[2]["status"] == "invalid"
+    assert by_index[3]["status"] == "rate_limited" and by_index[3]["retry_after"] == 2.0
+    assert by_index[4]["status"] == "invalid"
+    assert {key: summary[key] for key in ("total", "ok", "error", "invalid", "rate_limited")} == {
+        "total": 5, "ok": 1, "error": 1, "invalid": 2, "rate_limited": 1,
+    }
+
+
+class FailingSearchClient:
+    async def render_search_results(self, query, num_results, fmt):
+        raise UpstreamHTTPError(503, "unavailable")
+
+    async def format_search_results(self, query, num_results, fmt):
+        return "Error performing search: HTTP Error 503: unavailable"
+
+
+class StaticProvider:
+    def __init__(self, instance):
+        self.instance = instance
+
+    async def get(self):
+        return self.instance
+
+
+def test_upstream_failure_is_an_error_item(monkeypatch):
+    monkeypatch.setattr(main, "search_provider", StaticProvider(FailingSearchClient()))
+    body = "\n".join(json.dumps({"op": "search", "id": str(i), "query": "solar"}) for i in range(3))
+    with TestClient(main.app) as client:
+        response = client.post("/api/batch", content=body, headers={"Content-Type": "application/x-ndjson"})
+    *items, summary = [json.loads(line) for line in response.text.splitlines()]
+    assert [item["status"] for item in items] == ["error"] * 3
+    assert summary["error"] == 3 and summary["ok"] == 0
+
+
+def test_malformed_batch_requests_are_client_errors():
+    with TestClient(main.app) as client:
+        assert client.post("/api/batch", content="{not json", headers={"Content-Type": "application/json"}).status_code == 400
+        assert client.post("/api/batch", json={"operations": [], "concurrency": "many"}).status_code == 422
+        assert client.post("/api/batch", json={"operations": [], "concurrency": 0}).status_code == 422
+        assert client.post("/api/batch?concurrency=abc", json={"operations": []}).status_code == 422
+        assert client.post("/api/batch", json={"operations": "search"}).status_code == 422
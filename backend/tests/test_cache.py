@@ -0,0 +1,19 @@
+import asyncio
+
+from cache import MemoryLRUCache
+
+
+def test_memory_tier_bound_counts_utf8_bytes():
+    async def scenario():
+        cache = MemoryLRUCache(max_bytes=40)
+        # 15 characters, 30 bytes in UTF-8: a character count would fit both
+        await cache.set("first", "ü" * 15, 2e9)
+        assert cache.stats()["bytes"] == 30
+        await cache.set("second", "ö" * 15, 2e9)
+        assert await cache.get("first") is None
+        assert await cache.get("second") == ("ö" * 15, 2e9)
+        assert cache.stats() == {"entries": 1, "bytes": 30, "max_bytes": 40, "evictions": 1}
+        await cache.delete("second")
+        assert cache.stats()["bytes"] == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from conversation_store import ConversationNotFound, InMemoryConversationStore, SQLiteConversationStore
+
+TURN = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}]
+
+
+def test_append_to_evicted_conversation_raises_not_found():
+    async def scenario():
+        store = InMemoryConversationStore(max_sessions=1)
+        evicted = await store.create()
+        await store.create()
+        with pytest.raises(ConversationNotFound):
+            await store.append(evicted, TURN)
+
+    asyncio.run(scenario())
+
+
+def test_sqlite_append_to_deleted_conversation_raises_not_found(tmp_path):
+    async def scenario():
+        store = SQLiteConversationStore(str(tmp_path / "conversations.db"))
+        conversation_id = await store.create()
+        await store.delete(conversation_id)
+        try:
+            with pytest.raises(ConversationNotFound):
+                await store.append(conversation_id, TURN)
+        finally:
+            await store.close()
+
+    asyncio.run(scenario())
+
+
+def test_chat_turn_on_conversation_evicted_mid_turn_is_404(monkeypatch):
+    with TestClient(main.app) as client:
+        conversation_id = client.post("/api/conversations").json()["conversationId"]
+        store = main.conversation_store
+        load = store.get
+
+        async def get_then_evict(requested_id):
+            history = await load(requested_id)
+            await store.delete(requested_id)
+            return history
+
+        monkeypatch.setattr(store, "get", get_then_evict)
+        response = client.post("/api/chat", json={"message": "hi", "conversationId": conversation_id, "retrieval": "off"})
+
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Conversation not found or expired"}
+
+
+def test_memory_budget_counts_utf8_bytes():
+    async def scenario():
+        store = InMemoryConversationStore()
+        conversation_id = await store.create()
+        await store.append(conversation_id, [{"role": "user", "content": "ü" * 10}])
+        return store.stats()["bytes"]
+
+    assert asyncio.run(scenario()) == len("user") + 20
+
+
+def test_concurrent_appends_from_two_workers_keep_every_turn(tmp_path):
+    path = str(tmp_path / "conversations.db")
+
+    async def scenario():
+        # Two store instances on one database, as in a multi-worker deployment
+        workers = [SQLiteConversationStore(path), SQLiteConversationStore(path)]
+        conversation_id = await workers[0].create()
+        turns = [
+            [{"role": "user", "content": f"q{i}"}, {"role": "assistant", "content": f"a{i}"}]
+            for i in range(40)
+        ]
+        try:
+            await asyncio.gather(*(workers[i % 2].append(conversation_id, turn) for i, turn in enumerate(turns)))
+            return await workers[0].get(conversation_id), workers[0]._append_locks._locks
+        finally:
+            for store in workers:
+                await store.close()
+
+    messages, locks = asyncio.run(scenario())
+    assert len(messages) == 80
+    # Each turn's messages stay adjacent
+    for user, assistant in zip(messages[::2], messages[1::2]):
+        assert assistant["content"] == "a" + user["content"][1:]
+    assert not locks
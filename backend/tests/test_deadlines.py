@@ -0,0 +1,91 @@
+import time
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from deadlines import DEADLINE_MAX, Deadline, DeadlineExceeded, _current_deadline, request_timeout, time_left
+from resilience import ResilientCaller
+
+
+class StaticProvider:
+    def __init__(self, instance):
+        self.instance = instance
+
+    async def get(self):
+        return self.instance
+
+
+class SlowSearchClient:
+    """Search client reporting the budget it was given, optionally sleeping first."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.cancelled = False
+
+    async def format_search_results(self, query, num_results=5, fmt="markdown"):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return f"{time_left():.1f}"
+
+
+def test_request_timeout_prefers_header_and_caps_it():
+    assert request_timeout("/api/search", [(b"x-request-timeout", b"3")]) == 3
+    assert request_timeout("/api/search", [(b"x-request-timeout", b"99999")]) == DEADLINE_MAX
+    default = request_timeout("/api/search", [])
+    assert default is not None
+    assert request_timeout("/api/search", [(b"x-request-timeout", b"soon")]) == default
+    assert request_timeout("/api/search", [(b"x-request-timeout", b"0")]) == default
+    assert request_timeout("/api/cache/stats", []) is None
+
+
+def test_header_budget_reaches_the_upstream_client(monkeypatch):
+    monkeypatch.setattr(main, "search_provider", StaticProvider(SlowSearchClient()))
+    with TestClient(main.app) as client:
+        response = client.post("/api/search", json={"query": "solar"}, headers={"X-Request-Timeout": "3"})
+    assert response.status_code == 200
+    assert 2.0 < float(response.json()["reply"]) <= 3.0
+
+
+def test_expired_deadline_cancels_the_handler_and_answers_504(monkeypatch):
+    slow = SlowSearchClient(delay=5)
+    monkeypatch.setattr(main, "search_provider", StaticProvider(slow))
+    with TestClient(main.app) as client:
+        start = time.perf_counter()
+        response = client.post("/api/search", json={"query": "solar"}, headers={"X-Request-Timeout": "0.2"})
+        elapsed = time.perf_counter() - start
+    assert response.status_code == 504
+    assert "0.2s" in response.json()["error"]
+    assert elapsed < 2
+    assert slow.cancelled
+
+
+def test_upstream_deadline_exceeded_is_a_504(monkeypatch):
+    class ExpiredClient:
+        async def format_search_results(self, query, num_results=5, fmt="markdown"):
+            raise DeadlineExceeded("google", 1)
+
+    monkeypatch.setattr(main, "search_provider", StaticProvider(ExpiredClient()))
+    with TestClient(main.app) as client:
+        response = client.post("/api/search", json={"query": "solar"})
+    assert response.status_code == 504
+    assert response.json()["success"] is False
+
+
+def test_resilient_calls_stop_at_the_request_deadline():
+    async def slow_upstream():
+        await asyncio.sleep(5)
+
+    async def scenario():
+        _current_deadline.set(Deadline(0.2))
+        caller = ResilientCaller("test", total_timeout=30, base_delay=0, hedge=False)
+        start = time.perf_counter()
+        with pytest.raises(DeadlineExceeded):
+            await caller.call(slow_upstream)
+        return time.perf_counter() - start
+
+    assert asyncio.run(scenario()) < 1
@@ -0,0 +1,74 @@
+import asyncio
+
+from context_window import ContextWindowManager, message_tokens
+from gemini import GeminiChatbot
+from model_pool import FakeModelClient, ModelPool, ModelTier, history_key
+from resilience import ResilientCaller
+
+
+class StubContext:
+    def prompt(self, message):
+        return f"[1] Web context that must not outlive this turn\n\nUser question: {message}"
+
+
+class StubRetrieval:
+    budget_tokens = 50
+
+    async def context(self, history=None):
+        return StubContext()
+
+
+def build_chatbot(context_window):
+    pool = ModelPool([ModelTier(FakeModelClient("fake", latency=0))])
+    chatbot = GeminiChatbot(
+        api_key="test",
+        model_pool=pool,
+        context_window=context_window,
+        resilience=ResilientCaller("gemini", hedge=False),
+    )
+    return chatbot, pool
+
+
+def turn(message, reply):
+    return [{"role": "user", "content": message}, {"role": "assistant", "content": reply}]
+
+
+def test_session_keeps_the_question_not_the_retrieval_prompt():
+    async def scenario():
+        chatbot, pool = build_chatbot(ContextWindowManager(token_budget=8000))
+        history = turn("what is solar power", await chatbot.get_response("what is solar power", [], StubRetrieval()))
+        history += turn("and wind?", await chatbot.get_response("and wind?", history))
+        hits = pool.sessions.hits
+        return history, hits, pool.sessions.take(history_key(history))
+
+    history, hits, cached = asyncio.run(scenario())
+    assert hits == 1
+    user_parts = [entry["parts"][0] for entry in cached.session.history if entry["role"] == "user"]
+    assert user_parts == ["what is solar power", "and wind?"]
+    # Only the messages themselves are accounted, not the dropped context block
+    assert cached.tokens == sum(message_tokens(msg) for msg in history)
+
+
+def test_reused_session_over_budget_is_rebuilt_through_the_window():
+    summarized = []
+
+    async def summarizer(previous, messages, max_tokens):
+        summarized.append(len(messages))
+        return "earlier turns"
+
+    async def scenario():
+        window = ContextWindowManager(token_budget=150, keep_recent=2, summary_tokens=10, summarizer=summarizer)
+        chatbot, pool = build_chatbot(window)
+        history = []
+        for i in range(4):
+            message = f"question {i} " + "padding " * 20
+            history += turn(message, await chatbot.get_response(message, history))
+        return pool.sessions, history
+
+    sessions, history = asyncio.run(scenario())
+    # Turns are reused while they fit; the overflowing one is trimmed and summarized
+    assert sessions.hits >= 1
+    assert summarized
+    cached = sessions.take(history_key(history))
+    first = cached.session.history[0]["parts"][0]
+    assert first.startswith("Summary of the earlier conversation")
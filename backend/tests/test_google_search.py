@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+from benchmarks.stubs import LatencyProfile, build_app, start_app
+from google_search import GoogleSearchClient
+from http_pool import HTTPSessionPool
+from rate_limit import ProviderRateLimiter, RateLimitExceeded
+
+
+def run_with_one_token(scenario):
+    """Run scenario(client) with a limiter that admits a single page and rejects the next."""
+
+    async def main():
+        app = build_app(LatencyProfile(20, 20), LatencyProfile(), LatencyProfile())
+        runner, base_url = await start_app(app)
+        pool = HTTPSessionPool()
+        limiter = ProviderRateLimiter("google", ["test"], per_minute=1, burst=1, max_wait=0)
+        client = GoogleSearchClient(session_pool=pool, rate_limiter=limiter)
+        client.base_url = f"{base_url}/customsearch/v1"
+        try:
+            await scenario(client)
+        finally:
+            await pool.close()
+            await runner.cleanup()
+
+    asyncio.run(main())
+
+
+@pytest.fixture(autouse=True)
+def cse_env(monkeypatch):
+    monkeypatch.setenv("GOOGLE_CSE_ID", "test")
+
+
+def test_rate_limited_later_page_is_not_a_partial_result():
+    async def scenario(client):
+        with pytest.raises(RateLimitExceeded):
+            await client.search("solar", 20)
+
+    run_with_one_token(scenario)
+
+
+def test_rate_limited_stream_raises_instead_of_an_error_chunk():
+    async def scenario(client):
+        with pytest.raises(RateLimitExceeded):
+            async for _ in client.stream_search_results("solar", 20):
+                pass
+
+    run_with_one_token(scenario)
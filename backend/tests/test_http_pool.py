@@ -0,0 +1,26 @@
+import asyncio
+
+from http_pool import HTTPSessionPool
+
+
+def test_stats_survive_changed_aiohttp_internals():
+    async def scenario():
+        pool = HTTPSessionPool()
+        session = await pool.get_session("https://example.com/search")
+        connector = session.connector
+        acquired = connector._acquired
+        try:
+            before = pool.stats()
+            # Simulate an aiohttp release that renamed its private bookkeeping
+            del connector._acquired
+            return before, pool.stats()
+        finally:
+            connector._acquired = acquired
+            await pool.close()
+
+    before, after = asyncio.run(scenario())
+    (host_stats,) = before.values()
+    assert host_stats["acquired"] == 0 and host_stats["idle"] == 0
+    (host_stats,) = after.values()
+    assert "acquired" not in host_stats and "idle" not in host_stats
+    assert host_stats["limit"] > 0
@@ -0,0 +1,106 @@
+import asyncio
+
+import youcom_api
+import main
+from benchmarks.stubs import LatencyProfile, build_app, start_app
+from http_pool import HTTPSessionPool
+from jobs import JobQueue, JobStore
+from main import job_response
+from resilience import ResilientCaller
+
+
+def test_deduplicated_job_serves_every_subscriber(tmp_path):
+    async def runner(job, progress):
+        progress("working")
+        await asyncio.sleep(0.05)
+        return "research answer"
+
+    async def scenario():
+        queue = JobQueue(runner, workers=1, store=JobStore(str(tmp_path / "jobs.db")))
+        queue.start()
+        try:
+            first = await queue.submit("research", {"query": "solar"}, "client-a")
+            second = await queue.submit("research", {"query": "solar"}, "client-b")
+            assert second["jobId"] == first["jobId"]
+            assert queue.deduplicated == 1
+
+            async def watch():
+                # job_response() on every event, as /api/jobs/{id}/events does
+                return [job_response(state) async for _, state in queue.subscribe(first["jobId"])]
+
+            return await asyncio.gather(watch(), watch())
+        finally:
+            await queue.close()
+
+    for responses in asyncio.run(scenario()):
+        assert responses[-1].status == "done"
+        assert responses[-1].success
+        assert responses[-1].reply == "research answer"
+
+
+class StaticProvider:
+    def __init__(self, instance):
+        self.instance = instance
+
+    async def get(self):
+        return self.instance
+
+
+def test_failed_research_job_is_not_reused(tmp_path, monkeypatch):
+    monkeypatch.setenv("YOU_API_KEY", "test")
+
+    async def scenario():
+        failing = LatencyProfile(1, 1, error=1.0)
+        app = build_app(LatencyProfile(), failing, failing)
+        runner, base_url = await start_app(app)
+        monkeypatch.setattr(youcom_api, "YOU_SMART_API_URL", f"{base_url}/smart")
+        monkeypatch.setattr(youcom_api, "YOU_RESEARCH_API_URL", f"{base_url}/research")
+        pool = HTTPSessionPool()
+        client = youcom_api.YouComClient(session_pool=pool, resilience=ResilientCaller("you", max_attempts=1, hedge=False))
+        monkeypatch.setattr(main, "you_provider", StaticProvider(client))
+        queue = JobQueue(main.run_job, workers=1, store=JobStore(str(tmp_path / "jobs.db")))
+        queue.start()
+        try:
+            payload = {"query": "solar", "depth": "basic", "format": "markdown"}
+            first = await queue.submit("research", payload)
+            states = [state async for _, state in queue.subscribe(first["jobId"])]
+            assert states[-1]["status"] == "failed"
+            assert "Fallback also failed" in states[-1]["error"]
+            assert queue.stats()["failed"] == 1
+
+            again = await queue.submit("research", payload)
+            assert again["jobId"] != first["jobId"]
+            assert queue.deduplicated == 0
+        finally:
+            await queue.close()
+            await pool.close()
+            await runner.cleanup()
+
+    asyncio.run(scenario())
+
+
+def test_client_priority_cannot_jump_the_queue(tmp_path):
+    started = []
+    release = asyncio.Event()
+
+    async def runner(job, progress):
+        started.append(job.payload["query"])
+        await release.wait()
+        return job.payload["query"]
+
+    async def scenario():
+        queue = JobQueue(runner, workers=1, store=JobStore(str(tmp_path / "jobs.db")))
+        queue.start()
+        try:
+            await queue.submit("research", {"query": "first"}, "client-a")
+            await asyncio.sleep(0.01)
+            await queue.submit("research", {"query": "second"}, "client-a")
+            last = await queue.submit("research", {"query": "pushy"}, "client-a", priority=10 ** 9)
+            release.set()
+            async for _ in queue.subscribe(last["jobId"]):
+                pass
+        finally:
+            await queue.close()
+
+    asyncio.run(scenario())
+    assert started == ["first", "second", "pushy"]
@@ -0,0 +1,107 @@
+import time
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from rate_limit import ProviderRateLimiter, QuotaCounter, RateLimitExceeded, TokenBucket
+
+
+def test_token_bucket_admits_burst_then_paces():
+    async def scenario():
+        bucket = TokenBucket(rate=20, capacity=2)
+        assert await bucket.acquire() == 0
+        assert await bucket.acquire() == 0
+        start = time.perf_counter()
+        waited = await bucket.acquire()
+        return waited, time.perf_counter() - start
+
+    waited, elapsed = asyncio.run(scenario())
+    assert 0.04 <= waited <= 0.06
+    assert elapsed >= 0.04
+
+
+def test_token_bucket_rejects_waits_beyond_max_wait():
+    async def scenario():
+        bucket = TokenBucket(rate=1, capacity=1)
+        await bucket.acquire()
+        with pytest.raises(RateLimitExceeded) as raised:
+            await bucket.acquire(max_wait=0.5)
+        return raised.value.retry_after, bucket.available()
+
+    retry_after, available = asyncio.run(scenario())
+    assert 0.9 <= retry_after <= 1.0
+    # A rejected caller does not reserve tokens
+    assert available < 0.1
+
+
+def test_limiter_spreads_requests_across_keys():
+    async def scenario():
+        limiter = ProviderRateLimiter("google", ["key-a", "key-b"], per_minute=60, burst=1, max_wait=0)
+        keys = {await limiter.acquire(), await limiter.acquire()}
+        with pytest.raises(RateLimitExceeded):
+            await limiter.acquire()
+        return keys, limiter.stats()
+
+    keys, stats = asyncio.run(scenario())
+    assert keys == {"key-a", "key-b"}
+    assert (stats["admitted"], stats["rejected"]) == (2, 1)
+
+
+def test_daily_quota_is_enforced_and_persisted(tmp_path):
+    path = str(tmp_path / "quota.db")
+
+    async def scenario():
+        limiter = ProviderRateLimiter("you", ["key"], per_minute=6000, per_day=2, quota=QuotaCounter(path))
+        await limiter.acquire()
+        await limiter.acquire()
+        with pytest.raises(RateLimitExceeded) as raised:
+            await limiter.acquire()
+        return raised.value, limiter.stats()
+
+    error, stats = asyncio.run(scenario())
+    assert error.reason == "daily quota"
+    assert 0 < error.retry_after <= 86400
+    (key_stats,) = stats["keys"].values()
+    assert key_stats["used_today"] == 2
+
+    # A restarted (or second) worker sees the same usage
+    restarted = ProviderRateLimiter("you", ["key"], per_minute=6000, per_day=2, quota=QuotaCounter(path))
+    with pytest.raises(RateLimitExceeded):
+        asyncio.run(restarted.acquire())
+
+
+def test_shared_buckets_pace_every_worker(tmp_path):
+    path = str(tmp_path / "quota.db")
+
+    async def scenario():
+        workers = [
+            ProviderRateLimiter("google", ["key"], per_minute=60, burst=1, max_wait=0, quota=QuotaCounter(path), shared=True)
+            for _ in range(2)
+        ]
+        await workers[0].acquire()
+        with pytest.raises(RateLimitExceeded):
+            await workers[1].acquire()
+
+    asyncio.run(scenario())
+
+
+def test_metrics_reads_stored_stats_off_the_event_loop(monkeypatch):
+    on_loop = []
+
+    def stats():
+        try:
+            asyncio.get_running_loop()
+            on_loop.append(True)
+        except RuntimeError:
+            on_loop.append(False)
+        return {"sessions": 7}
+
+    with TestClient(main.app) as client:
+        monkeypatch.setattr(main.conversation_store, "stats", stats)
+        response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert "conversation_store_sessions 7" in response.text
+    assert on_loop == [False]
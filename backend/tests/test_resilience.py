@@ -0,0 +1,146 @@
+import time
+import asyncio
+
+import pytest
+
+from benchmarks.stubs import LatencyProfile, build_app, start_app
+from google_search import GoogleSearchClient
+from http_pool import HTTPSessionPool, UpstreamHTTPError
+from rate_limit import ProviderRateLimiter
+from resilience import CircuitBreaker, CircuitOpenError, ResilientCaller
+
+
+class Upstream:
+    """Fake upstream answering each call with the next scripted outcome."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    async def __call__(self):
+        outcome = self.outcomes[min(self.calls, len(self.outcomes) - 1)]
+        self.calls += 1
+        if isinstance(outcome, (int, float)):
+            await asyncio.sleep(outcome)
+            return self.calls
+        raise outcome
+
+
+def warm(caller, seconds, samples):
+    for _ in range(samples):
+        caller.latency.record(seconds)
+
+
+def test_retryable_errors_are_retried():
+    caller = ResilientCaller("test", base_delay=0, hedge=False)
+    upstream = Upstream(UpstreamHTTPError(503, "busy"), UpstreamHTTPError(502, "bad gateway"), 0)
+    assert asyncio.run(caller.call(upstream)) == 3
+    assert caller.retries == 2
+
+
+def test_client_errors_are_not_retried():
+    caller = ResilientCaller("test", base_delay=0, hedge=False)
+    upstream = Upstream(UpstreamHTTPError(400, "bad request"), 0)
+    with pytest.raises(UpstreamHTTPError):
+        asyncio.run(caller.call(upstream))
+    assert upstream.calls == 1
+    assert caller.breaker.state == "closed"
+
+
+def test_hedge_fires_after_p95_and_wins():
+    caller = ResilientCaller("test", hedge_min_samples=5)
+    warm(caller, 0.05, 5)
+    upstream = Upstream(2.0, 0)
+
+    start = time.perf_counter()
+    assert asyncio.run(caller.call(upstream)) == 2
+    elapsed = time.perf_counter() - start
+
+    assert 0.05 <= elapsed < 1.0
+    assert (caller.hedges, caller.hedge_wins) == (1, 1)
+
+
+def test_no_hedge_before_enough_samples():
+    caller = ResilientCaller("test", hedge_min_samples=5)
+    warm(caller, 0.01, 4)
+    upstream = Upstream(0.1)
+    asyncio.run(caller.call(upstream))
+    assert upstream.calls == 1
+    assert caller.hedges == 0
+
+
+def test_breaker_opens_probes_and_closes():
+    breaker = CircuitBreaker("test", failure_rate=0.5, window=4, min_calls=4, recovery_timeout=0.05)
+    breaker.record_success()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+    time.sleep(0.06)
+    breaker.allow()
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpenError):
+        # Only one probe at a time
+        breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    time.sleep(0.06)
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.trips == 2
+
+
+def breaker_state_after(error):
+    breaker = CircuitBreaker("test", failure_rate=0.5, window=2, min_calls=2)
+    caller = ResilientCaller("test", max_attempts=1, hedge=False, breaker=breaker)
+    for _ in range(2):
+        with pytest.raises(UpstreamHTTPError):
+            asyncio.run(caller.call(Upstream(error)))
+    return breaker.state
+
+
+def test_throttling_429_does_not_trip_the_breaker():
+    assert breaker_state_after(UpstreamHTTPError(429, "slow down", {"Retry-After": "0"})) == "closed"
+
+
+def test_5xx_with_retry_after_trips_the_breaker():
+    assert breaker_state_after(UpstreamHTTPError(503, "overloaded", {"Retry-After": "0"})) == "open"
+
+
+def test_hedged_search_spends_one_rate_limit_token(monkeypatch):
+    monkeypatch.setenv("GOOGLE_CSE_ID", "test")
+
+    async def main():
+        app = build_app(LatencyProfile(300, 300), LatencyProfile(), LatencyProfile())
+        runner, base_url = await start_app(app)
+        pool = HTTPSessionPool()
+        limiter = ProviderRateLimiter("google", ["test"], per_minute=6000, burst=100)
+        acquired = []
+        acquire = limiter.acquire
+
+        async def counting_acquire():
+            acquired.append(1)
+            return await acquire()
+
+        limiter.acquire = counting_acquire
+        caller = ResilientCaller("google", hedge_min_samples=1)
+        warm(caller, 0.05, 1)
+        client = GoogleSearchClient(session_pool=pool, resilience=caller, rate_limiter=limiter)
+        client.base_url = f"{base_url}/customsearch/v1"
+        try:
+            await client.search("solar", 5)
+        finally:
+            await pool.close()
+            await runner.cleanup()
+        return app["hits"]["google"], len(acquired), caller.hedges
+
+    hits, acquired, hedges = asyncio.run(main())
+    assert hedges == 1
+    assert hits == 2
+    assert acquired == 1
@@ -0,0 +1,73 @@
+import pytest
+
+from semantic_cache import SemanticCache
+
+# Labelled pairs the default threshold is calibrated on: (cached query, incoming query)
+PARAPHRASES = [
+    ("latest tech news", "tech news today"),
+    ("apple stock price", "apple stock price today"),
+    ("what is the weather in berlin", "weather berlin"),
+    ("bitcoin price now", "current bitcoin price"),
+    ("python list comprehension tutorial", "python list comprehensions tutorial"),
+    ("best pizza in new york", "best pizza new york"),
+    ("How do I reset my iPhone?", "how to reset iphone"),
+    ("latest solar panel prices", "solar panel prices today"),
+    ("news about electric cars", "electric cars news"),
+    ("world cup 2022 results", "results of the world cup 2022"),
+    ("nvidia earnings report", "nvidia earnings reports latest"),
+]
+DIFFERENT_QUESTIONS = [
+    ("python faster than java", "java faster than python"),
+    ("flights from london to paris", "flights from paris to london"),
+    ("weather in berlin", "weather in paris"),
+    ("apple stock price", "apple pie recipe"),
+    ("bitcoin price", "ethereum price"),
+    ("apple", "apples"),
+    ("python 3.11 release date", "python 3.12 release date"),
+    ("iphone 14 review", "iphone 15 review"),
+    ("tesla stock price", "tesla car price"),
+    ("best pizza in new york", "best pizza in york"),
+    ("best pizza in new york", "best pizza in chicago"),
+    ("nvidia earnings report", "amd earnings report"),
+    ("electric car news", "electric bike news"),
+    ("world cup 2022 results", "world cup 2018 results"),
+    ("how to reset iphone", "how to reset android"),
+]
+
+
+def similarity(cache, cached, incoming):
+    return float(cache.vectorizer.embed(cached) @ cache.vectorizer.embed(incoming))
+
+
+@pytest.mark.parametrize("cached, incoming", PARAPHRASES)
+def test_paraphrase_is_a_hit(cached, incoming):
+    cache = SemanticCache()
+    cache.store("you-smart", cached, "answer")
+    hit = cache.lookup("you-smart", incoming)
+    assert hit is not None, similarity(cache, cached, incoming)
+    assert hit.value == "answer"
+
+
+@pytest.mark.parametrize("cached, incoming", DIFFERENT_QUESTIONS)
+def test_different_question_is_a_miss(cached, incoming):
+    cache = SemanticCache()
+    cache.store("you-smart", cached, "answer")
+    assert cache.lookup("you-smart", incoming) is None, similarity(cache, cached, incoming)
+
+
+def test_threshold_sits_inside_the_calibration_margin():
+    cache = SemanticCache()
+    lowest_hit = min(similarity(cache, a, b) for a, b in PARAPHRASES)
+    highest_miss = max(similarity(cache, a, b) for a, b in DIFFERENT_QUESTIONS)
+    assert highest_miss + 0.02 < cache.threshold < lowest_hit - 0.02
+
+
+def test_scopes_separate_answers_without_growing_state():
+    cache = SemanticCache()
+    cache.store("you-smart", "solar news", "short answer", scope="Answer briefly")
+    assert cache.lookup("you-smart", "solar news", scope="answer briefly").value == "short answer"
+    assert cache.lookup("you-smart", "solar news", scope="Answer in detail") is None
+    assert cache.lookup("gemini", "solar news", scope="Answer briefly") is None
+    for i in range(1000):
+        cache.lookup("you-smart", "solar news", scope=f"instructions {i}")
+    assert not any(isinstance(value, dict) and len(value) >= 1000 for value in vars(cache).values())
@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from benchmarks.stubs import LatencyProfile, build_app, start_app
+from google_search import GoogleSearchClient
+from http_pool import HTTPSessionPool
+from singleflight import SingleFlight
+
+CONCURRENT_REQUESTS = 500
+UPSTREAM_DELAY_MS = 200
+
+
+@pytest.fixture
+def google_env(monkeypatch):
+    monkeypatch.setenv("GOOGLE_API_KEY", "test")
+    monkeypatch.setenv("GOOGLE_CSE_ID", "test")
+
+
+def run_against_stub(scenario, google: LatencyProfile = None):
+    """Run scenario(client, flight, pool, base_url, hits) against a fresh stub upstream."""
+
+    async def main():
+        app = build_app(google or LatencyProfile(UPSTREAM_DELAY_MS, UPSTREAM_DELAY_MS), LatencyProfile(), LatencyProfile())
+        runner, base_url = await start_app(app)
+        hits = app["hits"]
+        pool = HTTPSessionPool()
+        flight = SingleFlight()
+        client = GoogleSearchClient(session_pool=pool, single_flight=flight)
+        client.base_url = f"{base_url}/customsearch/v1"
+        try:
+            return await scenario(client, flight, pool, base_url, hits)
+        finally:
+            await pool.close()
+            await runner.cleanup()
+
+    return asyncio.run(main())
+
+
+def test_concurrent_identical_searches_hit_upstream_once(google_env):
+    async def scenario(client, flight, pool, base_url, hits):
+        results = await asyncio.gather(*(client.search("viral query") for _ in range(CONCURRENT_REQUESTS)))
+        assert hits["google"] == 1
+        assert all(result == results[0] for result in results)
+        assert flight.stats() == {"calls": 1, "shared": CONCURRENT_REQUESTS - 1, "in_flight": 0}
+
+    run_against_stub(scenario)
+
+
+def test_cancelled_callers_do_not_abort_the_shared_call(google_env):
+    async def scenario(client, flight, pool, base_url, hits):
+        tasks = [asyncio.ensure_future(client.search("cancel query")) for _ in range(10)]
+        await asyncio.sleep(UPSTREAM_DELAY_MS / 2000)
+        for task in tasks[:5]:
+            task.cancel()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        assert all(isinstance(result, asyncio.CancelledError) for result in results[:5])
+        assert all(isinstance(result, dict) for result in results[5:])
+        assert hits["google"] == 1
+
+    run_against_stub(scenario)
+
+
+def test_upstream_errors_reach_every_waiter(google_env):
+    async def scenario(client, flight, pool, base_url, hits):
+        url = f"{base_url}/customsearch/v1"
+        errors = await asyncio.gather(
+            *(flight.do("error", lambda: pool.request_json("GET", url)) for _ in range(20)),
+            return_exceptions=True,
+        )
+        assert all("HTTP Error 503" in str(error) for error in errors)
+        assert hits["google"] == 1
+        assert flight.in_flight() == 0
+
+    run_against_stub(scenario, LatencyProfile(UPSTREAM_DELAY_MS, UPSTREAM_DELAY_MS, error=1.0))
@@ -0,0 +1,167 @@
+import os
+import time
+import functools
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Optional, Callable
+from fastapi.routing import APIRoute
+from metrics import HTTP_REQUESTS, HTTP_ERRORS, HTTP_LATENCY, HTTP_IN_FLIGHT, STAGE_LATENCY
+
+# Optional OpenTelemetry spans (only when the SDK is installed and enabled)
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:  # pragma: no cover - optional dependency
+    otel_trace = None
+
+OTEL_ENABLED = otel_trace is not None and os.getenv("OTEL_TRACING", "0") == "1"
+_tracer = otel_trace.get_tracer("aiva.backend") if OTEL_ENABLED else None
+
+
+class RequestTrace:
+    """Per-request accumulator of stage durations (in seconds)."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.route: Optional[str] = None
+        self.stages: Dict[str, float] = {}
+        self.route_start = self.start
+        self.endpoint_end: Optional[float] = None
+        # Set when the endpoint answered with an error envelope (success=False)
+        self.error = False
+
+    def add(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def server_timing(self) -> str:
+        """Render the stages as a Server-Timing header value."""
+        parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages.items()]
+        parts.append(f"total;dur={(time.perf_counter() - self.start) * 1000:.1f}")
+        return ", ".join(parts)
+
+
+_current_trace: contextvars.ContextVar[Optional[RequestTrace]] = contextvars.ContextVar("request_trace", default=None)
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Time a block as a named stage of the current request.
+
+    Stages with the same name add up (e.g. several upstream calls). Outside
+    a request this is a no-op apart from the optional OpenTelemetry span.
+    """
+    span = _tracer.start_as_current_span(name) if _tracer is not None else None
+    if span is not None:
+        span.__enter__()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(name, time.perf_counter() - start)
+        if span is not None:
+            span.__exit__(None, None, None)
+
+
+class TimedRoute(APIRoute):
+    """
+    APIRoute splitting handler time into validation, endpoint and serialization.
+
+    FastAPI parses and validates the request body before calling the endpoint
+    and serializes the response after it returns, all inside the route
+    handler; timestamps around the endpoint call separate the three.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        @functools.wraps(endpoint)
+        async def timed_endpoint(*args, **kw):
+            trace = _current_trace.get()
+            if trace is not None:
+                trace.add("validation", time.perf_counter() - trace.route_start)
+            start = time.perf_counter()
+            try:
+                result = await endpoint(*args, **kw)
+                if trace is not None and getattr(result, "success", True) is False:
+                    trace.error = True
+                return result
+            finally:
+                if trace is not None:
+                    trace.endpoint_end = time.perf_counter()
+                    trace.add("handler", trace.endpoint_end - start)
+
+        super().__init__(path, timed_endpoint, **kwargs)
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        route_path = self.path
+
+        async def timed_handler(request):
+            trace = _current_trace.get()
+            if trace is not None:
+                trace.route = route_path
+                trace.route_start = time.perf_counter()
+                trace.endpoint_end = None
+            HTTP_IN_FLIGHT.inc(route=route_path)
+            try:
+                response = await handler(request)
+            finally:
+                HTTP_IN_FLIGHT.dec(route=route_path)
+            if trace is not None and trace.endpoint_end is not None:
+                trace.add("serialization", time.perf_counter() - trace.endpoint_end)
+            return response
+
+        return timed_handler
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request metrics and the Server-Timing header.
+
+    Routes are labelled with their path template (set by TimedRoute), so
+    IDs in URLs do not blow up metric cardinality.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace()
+        token = _current_trace.set(trace)
+        method = scope["method"]
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        span = _tracer.start_as_current_span(f"{method} {scope['path']}") if _tracer is not None else None
+        if span is not None:
+            span.__enter__()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            if span is not None:
+                span.__exit__(None, None, None)
+            _current_trace.reset(token)
+            route = trace.route or "unmatched"
+            elapsed = time.perf_counter() - trace.start
+            HTTP_REQUESTS.inc(method=method, route=route, status=status)
+            HTTP_LATENCY.observe(elapsed, method=method, route=route)
+            if status >= 400 or trace.error:
+                HTTP_ERRORS.inc(method=method, route=route)
+            for name, seconds in trace.stages.items():
+                STAGE_LATENCY.observe(seconds, route=route, stage=name)
@@ -1,24 +1,52 @@
 import os
 import json
 import uuid
-import aiohttp
-from dotenv import load_dotenv
+import logging
 from typing import Dict, Any, Optional, Literal
+from http_pool import HTTPSessionPool, UpstreamHTTPError
+from cache import ResponseCache, make_cache_key
+from singleflight import SingleFlight
+from resilience import ResilientCaller
+from rate_limit import ProviderRateLimiter, RateLimitExceeded
+from deadlines import DeadlineExceeded, DEADLINE_FALLBACK_MIN, has_budget
+from tracing import stage
+from local_index import LocalIndex
+from semantic_cache import SemanticCache
+from render import Format, render, iter_answer, iter_message
 
-# Load environment variables
-load_dotenv()
+logger = logging.getLogger(__name__)
+
+# You.com API configuration (the key is read when the client is created)
+YOU_SMART_API_URL = os.getenv("YOU_SMART_API_URL", "https://chat-api.you.com/smart")
+YOU_RESEARCH_API_URL = os.getenv("YOU_RESEARCH_API_URL", "https://chat-api.you.com/research")
+
+
+class ResearchFailed(Exception):
+    """Raised when neither the Research API nor its Smart API fallback produced an answer."""
 
-# You.com API configuration
-YOU_API_KEY = os.getenv("YOU_API_KEY")
-YOU_SMART_API_URL = "https://chat-api.you.com/smart"
-YOU_RESEARCH_API_URL = "https://chat-api.you.com/research"
 
 class YouComClient:
-    def __init__(self):
-        self.api_key = YOU_API_KEY
+    def __init__(
+        self,
+        session_pool: Optional[HTTPSessionPool] = None,
+        cache: Optional[ResponseCache] = None,
+        single_flight: Optional[SingleFlight] = None,
+        resilience: Optional[ResilientCaller] = None,
+        rate_limiter: Optional[ProviderRateLimiter] = None,
+        semantic_cache: Optional[SemanticCache] = None,
+        local_index: Optional[LocalIndex] = None,
+    ):
+        self.api_key = os.getenv("YOU_API_KEY")
+        self.session_pool = session_pool or HTTPSessionPool()
+        self.cache = cache
+        self.single_flight = single_flight or SingleFlight()
+        self.resilience = resilience or ResilientCaller("you")
+        self.rate_limiter = rate_limiter
+        self.semantic_cache = semantic_cache
+        self.local_index = local_index
         self.chat_id = str(uuid.uuid4())  # Generate a unique chat ID for the session
         
-        if not self.api_key:
+        if not self.api_key and self.rate_limiter is None:
             raise ValueError("You.com API Key must be set in environment variables as YOU_API_KEY")
     
     async def smart_search(self, query: str, instructions: Optional[str] = None) -> Dict[str, Any]:
@@ -32,6 +60,33 @@ class YouComClient:
         Returns:
             A dictionary containing search results with AI-generated answers
         """
+        if self.semantic_cache is not None:
+            # Paraphrases of a recent query reuse its answer
+            return await self.semantic_cache.get_or_fetch(
+                "you-smart",
+                query,
+                lambda: self._smart_search(query, instructions),
+                scope=instructions,
+                answer_of=lambda data: data.get("answer"),
+            )
+        return await self._smart_search(query, instructions)
+
+    async def _smart_search(self, query: str, instructions: Optional[str]) -> Dict[str, Any]:
+        key = make_cache_key("you-smart", query=query, instructions=instructions)
+
+        async def fetch():
+            if self.cache is None:
+                return await self._fetch_smart_search(query, instructions)
+            return await self.cache.get_or_fetch(
+                key,
+                lambda: self._fetch_smart_search(query, instructions),
+                is_negative=lambda data: not data.get("answer"),
+            )
+
+        # Concurrent identical searches share one upstream call
+        return await self.single_flight.do(key, fetch)
+
+    async def _fetch_smart_search(self, query: str, instructions: Optional[str]) -> Dict[str, Any]:
         headers = {
             "X-API-Key": self.api_key,
             "Content-Type": "application/json"
@@ -47,21 +102,15 @@ class YouComClient:
             payload["instructions"] = instructions
         
         try:
-            print(f"Sending request to You.com Smart API: {YOU_SMART_API_URL}")
-            print(f"Headers: Content-Type: application/json, X-API-Key: [HIDDEN]")
-            print(f"Payload: {payload}")
+            logger.debug("Sending request to You.com Smart API", extra={"url": YOU_SMART_API_URL, "payload": payload})
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(YOU_SMART_API_URL, headers=headers, json=payload) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        print(f"Error response from API: {error_text}")
-                        raise Exception(f"HTTP Error {response.status}: {error_text}")
-                    
-                    response_data = await response.json()
-                    return response_data
-        except aiohttp.ClientError as e:
-            raise Exception(f"Request Error: {str(e)}")
+            headers = await self._admit(headers)
+            data = await self.resilience.call(lambda: self._post(YOU_SMART_API_URL, headers, payload))
+        except UpstreamHTTPError as e:
+            logger.warning("Error response from You.com Smart API", extra={"status": e.status, "body": e.text[:500]})
+            raise
+        self._index("you-smart", query, data)
+        return data
 
     async def research(self, query: str) -> Dict[str, Any]:
         """
@@ -73,6 +122,21 @@ class YouComClient:
         Returns:
             A dictionary containing research results
         """
+        key = make_cache_key("you-research", query=query)
+
+        async def fetch():
+            if self.cache is None:
+                return await self._fetch_research(query)
+            return await self.cache.get_or_fetch(
+                key,
+                lambda: self._fetch_research(query),
+                is_negative=lambda data: not data.get("answer"),
+            )
+
+        # Concurrent identical research requests share one upstream call
+        return await self.single_flight.do(key, fetch)
+
+    async def _fetch_research(self, query: str) -> Dict[str, Any]:
         headers = {
             "X-API-Key": self.api_key,
             "Content-Type": "application/json"
@@ -84,102 +148,107 @@ class YouComClient:
         }
         
         try:
-            print(f"Sending request to You.com Research API: {YOU_RESEARCH_API_URL}")
-            print(f"Headers: Content-Type: application/json, X-API-Key: [HIDDEN]")
-            print(f"Payload: {payload}")
+            logger.debug("Sending request to You.com Research API", extra={"url": YOU_RESEARCH_API_URL, "payload": payload})
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(YOU_RESEARCH_API_URL, headers=headers, json=payload) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        print(f"Error response from Research API: {error_text}")
-                        raise Exception(f"HTTP Error {response.status}: {error_text}")
-                    
-                    response_data = await response.json()
-                    return response_data
-        except aiohttp.ClientError as e:
-            raise Exception(f"Request Error: {str(e)}")
-
-    async def format_smart_results(self, query: str, instructions: Optional[str] = None) -> str:
+            headers = await self._admit(headers)
+            data = await self.resilience.call(lambda: self._post(YOU_RESEARCH_API_URL, headers, payload))
+        except UpstreamHTTPError as e:
+            logger.warning("Error response from You.com Research API", extra={"status": e.status, "body": e.text[:500]})
+            raise
+        self._index("you-research", query, data)
+        return data
+
+    def _index(self, source: str, query: str, data: Dict[str, Any]):
+        """Queue an answer and its sources for the local full-text index."""
+        if self.local_index is None:
+            return
+        self.local_index.add_answer(source, query, data.get("answer") or "")
+        self.local_index.add_web_results("you", query, [
+            {"title": s.get("name"), "url": s.get("url"), "snippet": s.get("snippet")}
+            for s in data.get("search_results") or []
+        ])
+
+    async def _admit(self, headers: Dict[str, str]) -> Dict[str, str]:
+        # Admitted once per call, outside the timed attempts: a token wait must not
+        # count towards attempt latency, the hedge delay or the breaker
+        if self.rate_limiter is None:
+            return headers
+        return {**headers, "X-API-Key": await self.rate_limiter.acquire()}
+
+    async def _post(self, url: str, headers: Dict[str, str], payload: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.session_pool.request_json("POST", url, headers=headers, json=payload)
+
+    async def render_smart_results(self, query: str, instructions: Optional[str] = None, fmt: Format = "markdown") -> str:
         """
-        Perform a smart search and format the results in a human-readable format.
+        Perform a smart search and format the answer, raising upstream errors.
         
         Args:
             query: The search query string
             instructions: Optional instructions to tailor the response
+            fmt: Output format ("markdown", "text" or "json")
             
         Returns:
             A formatted string with search results
         """
-        try:
-            search_data = await self.smart_search(query, instructions)
-            
-            if "answer" not in search_data or not search_data["answer"]:
-                return f"No results found for query: '{query}'"
-            
-            # Build the formatted result
-            formatted_result = f"## 🔍 Search Results: '{query}'\n\n"
-            formatted_result += search_data["answer"]
-            
-            # Add search results/sources if available
-            if "search_results" in search_data and search_data["search_results"]:
-                formatted_result += "\n\n### Sources:\n"
-                for i, source in enumerate(search_data["search_results"], 1):
-                    name = source.get("name", "No title")
-                    url = source.get("url", "#")
-                    snippet = source.get("snippet", "")
-                    
-                    formatted_result += f"{i}. [{name}]({url})\n"
-                    if snippet:
-                        formatted_result += f"   {snippet}\n\n"
+        search_data = await self.smart_search(query, instructions)
+        with stage("formatting"):
+            return render(iter_answer("smart", query, search_data, fmt))
+
+    async def format_smart_results(self, query: str, instructions: Optional[str] = None, fmt: Format = "markdown") -> str:
+        """
+        Like render_smart_results, but renders upstream errors as an error message.
+        
+        Args:
+            query: The search query string
+            instructions: Optional instructions to tailor the response
+            fmt: Output format ("markdown", "text" or "json")
             
-            return formatted_result
+        Returns:
+            A formatted string with search results or the error
+        """
+        try:
+            return await self.render_smart_results(query, instructions, fmt)
         
+        except (RateLimitExceeded, DeadlineExceeded):
+            raise
         except Exception as e:
-            print(f"Error in format_smart_results: {str(e)}")
-            return f"Error performing search: {str(e)}"
+            logger.error("Error in format_smart_results: %s", e)
+            return render(iter_message("error", f"Error performing search: {str(e)}", fmt))
             
-    async def format_research_results(self, query: str, depth: Literal["basic", "comprehensive"] = "comprehensive") -> str:
+    async def render_research_results(
+        self, query: str, depth: Literal["basic", "comprehensive"] = "comprehensive", fmt: Format = "markdown"
+    ) -> str:
         """
-        Perform a deep research and format the results in a human-readable format.
+        Perform a deep research and render the answer, raising when it cannot be produced.
+        
+        Falls back to the Smart API with research instructions when the
+        Research API fails and enough of the request's time is left.
         
         Args:
             query: The research query string
             depth: Research depth parameter (maintained for compatibility, not used with actual Research API)
+            fmt: Output format ("markdown", "text" or "json")
             
         Returns:
-            A formatted string with research results
+            A formatted string with research results. Raises ResearchFailed
+            when the Research API and the fallback both fail.
         """
         try:
             # Using the dedicated Research API
             research_data = await self.research(query)
-            
-            if "answer" not in research_data or not research_data["answer"]:
-                return f"No research results found for query: '{query}'"
-            
-            # Format the research results
-            formatted_result = f"## 🔬 Deep Research: '{query}'\n\n"
-            formatted_result += research_data["answer"]
-            
-            # Add sources if available
-            if "search_results" in research_data and research_data["search_results"]:
-                formatted_result += "\n\n### Sources:\n"
-                for i, source in enumerate(research_data["search_results"], 1):
-                    name = source.get("name", "No title")
-                    url = source.get("url", "#")
-                    snippet = source.get("snippet", "")
-                    
-                    formatted_result += f"{i}. [{name}]({url})\n"
-                    if snippet:
-                        formatted_result += f"   {snippet}\n\n"
-            
-            return formatted_result
+            with stage("formatting"):
+                return render(iter_answer("research", query, research_data, fmt))
         
+        except (RateLimitExceeded, DeadlineExceeded):
+            # The fallback would draw on the same quota (or time budget)
+            raise
         except Exception as e:
-            print(f"Error in format_research_results: {str(e)}")
+            logger.error("Error in render_research_results: %s", e)
+            if not has_budget(DEADLINE_FALLBACK_MIN, "you_research_fallback"):
+                raise ResearchFailed(f"{e}. Not enough time left for a fallback search.") from e
             # Fallback to Smart API with research instructions if Research API fails
             try:
-                print("Falling back to Smart API with research instructions...")
+                logger.info("Falling back to Smart API with research instructions")
                 # Create instructions based on the requested depth
                 if depth == "comprehensive":
                     instructions = (
@@ -197,27 +266,29 @@ class YouComClient:
                 
                 # Use smart search with research instructions as fallback
                 search_data = await self.smart_search(query, instructions)
+                with stage("formatting"):
+                    return render(iter_answer("research-fallback", query, search_data, fmt))
                 
-                if "answer" not in search_data or not search_data["answer"]:
-                    return f"No research results found for query: '{query}'"
-                
-                # Format the results from fallback method
-                formatted_result = f"## 🔬 Deep Research (Smart API Fallback): '{query}'\n\n"
-                formatted_result += search_data["answer"]
-                
-                # Add sources if available
-                if "search_results" in search_data and search_data["search_results"]:
-                    formatted_result += "\n\n### Sources:\n"
-                    for i, source in enumerate(search_data["search_results"], 1):
-                        name = source.get("name", "No title")
-                        url = source.get("url", "#")
-                        snippet = source.get("snippet", "")
-                        
-                        formatted_result += f"{i}. [{name}]({url})\n"
-                        if snippet:
-                            formatted_result += f"   {snippet}\n\n"
-                
-                return formatted_result
-                
+            except (RateLimitExceeded, DeadlineExceeded):
+                raise
             except Exception as fallback_error:
-                return f"Error performing research: {str(e)}. Fallback also failed: {str(fallback_error)}"
\ No newline at end of file
+                raise ResearchFailed(f"{e}. Fallback also failed: {fallback_error}") from fallback_error
+
+    async def format_research_results(
+        self, query: str, depth: Literal["basic", "comprehensive"] = "comprehensive", fmt: Format = "markdown"
+    ) -> str:
+        """
+        Like render_research_results, but renders a failure as an error message.
+        
+        Args:
+            query: The research query string
+            depth: Research depth parameter (maintained for compatibility, not used with actual Research API)
+            fmt: Output format ("markdown", "text" or "json")
+            
+        Returns:
+            A formatted string with research results or the error
+        """
+        try:
+            return await self.render_research_results(query, depth, fmt)
+        except ResearchFailed as e:
+            return render(iter_message("error", f"Error performing research: {e}", fmt))